@@ -9,6 +9,7 @@ from enoslib.api import (
     STATUS_SKIPPED,
     STATUS_UNREACHABLE,
     actions,
+    distribute,
     ensure_python3,
     external_pip_deps,
     gather_facts,
@@ -139,7 +140,10 @@ try:
     from enoslib.infra.enos_iotlab.objects import (
         IotlabSensor,
         IotlabSerial,
+        IotlabSerialTransport,
         IotlabSniffer,
+        flash_sensors,
+        send_cmd_sensors,
     )
     from enoslib.infra.enos_iotlab.provider import Iotlab
 except ImportError:
@@ -16,6 +16,7 @@ These function can be fed with library-level objects (see :ref:`objects
 """
 
 import copy
+import hashlib
 import json
 import logging
 import os
@@ -23,11 +24,13 @@ import signal
 import sys
 import time
 import warnings
+import zlib
 from abc import ABCMeta, abstractmethod
-from collections import defaultdict, namedtuple
+from collections import Counter, OrderedDict, namedtuple
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from enum import Enum
+from itertools import islice
 from pathlib import Path
 from tempfile import NamedTemporaryFile, TemporaryDirectory
 from typing import (
@@ -73,14 +76,15 @@ from enoslib.errors import (
     EnosSSHNotReady,
     EnosUnreachableHostsError,
 )
+from enoslib.fact_cache import FactCache, get_fact_cache
 from enoslib.html import (
     convert_to_html_table,
     html_from_dict,
     html_from_sections,
     repr_html_check,
 )
-from enoslib.objects import Host, Networks, Roles, RolesLike
-from enoslib.utils import _hostslike_to_roles
+from enoslib.objects import Host, Network, Networks, Roles, RolesLike
+from enoslib.utils import _hostslike_to_roles, get_address
 
 logger = logging.getLogger(__name__)
 
@@ -97,7 +101,16 @@ STATUS_OK = "OK"
 STATUS_FAILED = "FAILED"
 STATUS_UNREACHABLE = "UNREACHABLE"
 STATUS_SKIPPED = "SKIPPED"
+# modules whose results are stored in the fact cache
+SETUP_ACTIONS = (
+    "setup",
+    "ansible.builtin.setup",
+    "gather_facts",
+    "ansible.builtin.gather_facts",
+)
 DEFAULT_ERROR_STATUSES = {STATUS_FAILED, STATUS_UNREACHABLE}
+# port used by the hosts to serve a distributed file to their peers
+DISTRIBUTE_PORT = 8555
 # The following translate the keywords passed in the play_on tasks to
 # actual ansible keywords. We do that because async became a reserved keyword
 # in python3.7 so on can't write :
@@ -208,8 +221,28 @@ def _load_defaults(
     return inventory, variable_manager, loader
 
 
+def _skip_cached_facts(task: Dict, gather_subset: str = "all") -> Dict:
+    """Skip a fact gathering task on the hosts whose (cached) facts are known.
+
+    This is a noop if the fact cache is disabled.
+    """
+    if get_fact_cache() is None:
+        return task
+    gathered = "(ansible_facts.gather_subset | default([]))"
+    subsets = [s.strip() for s in gather_subset.split(",")]
+    return dict(
+        task,
+        when=(
+            f"'all' not in {gathered} "
+            f"and ({subsets} | difference({gathered}) | length > 0)"
+        ),
+    )
+
+
 _AnsibleExecutionRecord = namedtuple(
-    "_AnsibleExecutionRecord", ["host", "status", "task", "payload"]
+    "_AnsibleExecutionRecord",
+    ["host", "status", "task", "payload", "start", "end"],
+    defaults=[None, None],
 )
 
 
@@ -239,24 +272,60 @@ class NoopCallback(CallbackBase):
     CALLBACK_TYPE = "stdout"
 
 
+class _TaskProgress:
+    """Progress of a task on the hosts, updated incrementally."""
+
+    def __init__(self):
+        # per-host detail
+        self.hosts: Dict[str, HostStatus] = {}
+        self.counts: Counter = Counter()
+        # hosts still running the task by start date: the first are the slowest
+        self.running: "OrderedDict[str, float]" = OrderedDict()
+        self.failed: List[str] = []
+
+    def set(self, host: str, status: HostStatus):
+        previous = self.hosts.get(host)
+        if previous is not None:
+            self.counts[previous] -= 1
+        self.hosts[host] = status
+        self.counts[status] += 1
+        if status == HostStatus.NEUTRAL:
+            self.running[host] = time.time()
+            return
+        self.running.pop(host, None)
+        if status in (HostStatus.FAILED, HostStatus.UNREACHABLE):
+            self.failed.append(host)
+
+
 class SpinnerCallback(CallbackBase):
     """Spinning during tasks execution.
 
 
     Design goals:
         - compatible with linear/free execution strategy
+        - constant cost per event: the hosts are listed only when there are
+          a few of them, otherwise only the counts per status, the slowest
+          hosts and the failures are displayed. Redraws are throttled.
     """
 
     CALLBACK_VERSION = 2.0
     CALLBACK_NAME = "spinner"
     CALLBACK_TYPE = "stdout"
 
+    # above this number of hosts, only a summary of the task is displayed
+    MAX_HOSTS = 10
+    # number of slowest hosts / failures displayed in the summary
+    MAX_DISPLAYED = 3
+    # minimal interval (in seconds) between two redraws
+    REFRESH_INTERVAL = 0.1
+
     def __init__(self):
         super().__init__()
-        self.running_tasks: Dict = defaultdict(dict)
+        self.tasks: Dict[str, _TaskProgress] = {}
         self.console = Console()
         self.status = None
-        self.tasks_lst = []
+        self._current: Optional[str] = None
+        self._last_refresh = 0.0
         # keep track of all the hosts involved
         # by at least one task
         self.hosts_set = set()
@@ -271,53 +340,93 @@ class SpinnerCallback(CallbackBase):
             update the spinner
         """
         task_name = task.get_name()
-        if task_name not in self.tasks_lst:
-            self.tasks_lst.append(task_name)
-        self.running_tasks[task_name][host.name] = HostStatus.NEUTRAL
+        if task_name not in self.tasks:
+            self.tasks[task_name] = _TaskProgress()
+        self.tasks[task_name].set(host.name, HostStatus.NEUTRAL)
+        self.hosts_set.add(host.name)
         self.update(task_name)
 
-    def update(self, task_name: str):
+    def hosts_status(self, task_name: str) -> Dict[str, HostStatus]:
+        """The status of each host for a task."""
+        return dict(self.tasks[task_name].hosts)
+
+    def _render(self, task_name: str) -> str:
+        progress = self.tasks[task_name]
+        header = f"[bold blue]Running[/bold blue] [magenta]{task_name}[/magenta]"
+        if len(progress.hosts) <= self.MAX_HOSTS:
+            status_str = " ".join(
+                [status.value % host for (host, status) in progress.hosts.items()]
+            )
+            return f"{header} on {status_str}"
+        counts = " ".join(
+            status.value % f"{count} {status.name.lower()}"
+            for status, count in progress.counts.items()
+            if count > 0
+        )
+        lines = [f"{header} on {len(progress.hosts)} hosts: {counts}"]
+        if progress.running:
+            now = time.time()
+            slowest = ", ".join(
+                f"{host} ({now - start:.0f}s)"
+                for host, start in islice(progress.running.items(), self.MAX_DISPLAYED)
+            )
+            lines.append(f"  slowest: {slowest}")
+        if progress.failed:
+            failed = ", ".join(progress.failed[-self.MAX_DISPLAYED :])
+            lines.append(f"  [red]failed ({len(progress.failed)})[/red]: {failed}")
+        return "\n".join(lines)
+
+    def update(self, task_name: str, force: bool = False):
         # fire a new spinner if it doesn't exist
         if self.status is None:
             self.status = Status("", console=self.console)
             self.status.start()
-        hosts_status = self.running_tasks[task_name]
-        status_str = " ".join(
-            [status.value % host for (host, status) in hosts_status.items()]
-        )
-        self.hosts_set = self.hosts_set.union(list(hosts_status.keys()))
-        self.status.update(
-            f"[bold blue]Running[/bold blue] [magenta]{task_name}[/magenta] "
-            f"on {status_str}"
-        )
+        now = time.time()
+        if (
+            not force
+            and task_name == self._current
+            and now - self._last_refresh < self.REFRESH_INTERVAL
+        ):
+            return
+        self._current = task_name
+        self._last_refresh = now
+        self.status.update(self._render(task_name))
+
+    def _set(self, result, status: HostStatus):
+        task_name = result.task_name
+        if task_name not in self.tasks:
+            self.tasks[task_name] = _TaskProgress()
+        self.tasks[task_name].set(result._host.name, status)
+        self.update(task_name)
 
     def v2_runner_on_failed(self, result, ignore_errors: bool = False):
         if not ignore_errors:
             status = HostStatus.FAILED
         else:
             status = HostStatus.OK
-        self.running_tasks[result.task_name][result._host.name] = status
-        self.update(result.task_name)
+        self._set(result, status)
 
     def v2_runner_on_ok(self, result, ignore_errors: bool = False):
-        self.running_tasks[result.task_name][result._host.name] = HostStatus.OK
-        self.update(result.task_name)
+        self._set(result, HostStatus.OK)
 
     def v2_runner_on_unreachable(self, result):
-        self.running_tasks[result.task_name][result._host.name] = HostStatus.UNREACHABLE
-        self.update(result.task_name)
+        self._set(result, HostStatus.UNREACHABLE)
 
     def v2_runner_on_skipped(self, result):
-        self.running_tasks[result.task_name][result._host.name] = HostStatus.SKIPPED
-        self.update(result.task_name)
+        self._set(result, HostStatus.SKIPPED)
 
     def v2_playbook_on_stats(self, stats):
         if self.status:
             self.status.stop()
-        tasks_str = ",".join(self.tasks_lst)
+        tasks_str = ",".join(self.tasks)
+        hosts_str = (
+            self.hosts_set
+            if len(self.hosts_set) <= self.MAX_HOSTS
+            else f"{len(self.hosts_set)} hosts"
+        )
         self.console.print(
-            f"[bold blue]Finished {len(self.running_tasks)} tasks[/bold blue] "
-            f"[italic]({tasks_str})[/italic] on {self.hosts_set}"
+            f"[bold blue]Finished {len(self.tasks)} tasks[/bold blue] "
+            f"[italic]({tasks_str})[/italic] on {hosts_str}"
         )
         self.console.rule()
 
@@ -333,9 +442,10 @@ class _MyCallback(CallbackBase):
     CALLBACK_VERSION = 2.0
     CALLBACK_NAME = "mycallback"
 
-    def __init__(self, storage):
+    def __init__(self, storage, fact_cache: Optional[FactCache] = None):
         super().__init__()
         self.storage = storage
+        self.fact_cache = fact_cache
         self.display_ok_hosts = True
         self.display_skipped_hosts = True
         self.display_failed_stderr = True
@@ -345,13 +455,22 @@ class _MyCallback(CallbackBase):
         # Commenting this out seems ok anyway  to support ansible-core 2.17 / ansible 10
         # since 2.9
         # self.set_option("show_per_host_start", True)
+        # (host, task uuid) -> start timestamp of the running tasks
+        self._starts: Dict[Tuple[str, str], float] = {}
+
+    def v2_runner_on_start(self, host, task):
+        self._starts[(host.get_name(), task._uuid)] = time.time()
 
     def _store(self, result, status):
+        end = time.time()
+        host = result._host.get_name()
         record = _AnsibleExecutionRecord(
-            host=result._host.get_name(),
+            host=host,
             status=status,
             task=result._task.get_name(),
             payload=result._result,
+            start=self._starts.pop((host, result._task._uuid), None),
+            end=end,
         )
         self.storage.append(record)
 
@@ -365,6 +484,14 @@ class _MyCallback(CallbackBase):
     def v2_runner_on_ok(self, result):
         super().v2_runner_on_ok(result)
         self._store(result, STATUS_OK)
+        if (
+            self.fact_cache is not None
+            and result._task.action in SETUP_ACTIONS
+            and "ansible_facts" in result._result
+        ):
+            self.fact_cache.set(
+                result._host.get_name(), result._result["ansible_facts"]
+            )
 
     def v2_runner_on_skipped(self, result):
         super().v2_runner_on_skipped(result)
@@ -383,10 +510,20 @@ class BaseCommandResult:
     task: str
     status: str
     payload: Dict
+    # timestamps (seconds since the epoch) of the task execution on the host
+    start: Optional[float] = field(default=None, compare=False)
+    end: Optional[float] = field(default=None, compare=False)
 
     @abstractmethod
     def _payload_keys(self): ...
 
+    @property
+    def duration(self) -> Optional[float]:
+        """Duration (in seconds) of the task on the host (None if unknown)."""
+        if self.start is None or self.end is None:
+            return None
+        return self.end - self.start
+
     def ok(self) -> bool:
         return self.status == STATUS_OK
 
@@ -447,7 +584,14 @@ class BaseCommandResult:
         d = {name: self.payload.get(name) for name in self._payload_keys()}
         if include_payload:
             d.update(payload=self.payload)
-        return dict(host=self.host, task=self.task, status=self.status, **d)
+        return dict(
+            host=self.host,
+            task=self.task,
+            status=self.status,
+            start=self.start,
+            end=self.end,
+            **d,
+        )
 
 
 class CommandResult(BaseCommandResult):
@@ -527,6 +671,146 @@ class Results(list):
         """
         return [r.to_dict(include_payload=include_payload) for r in self]
 
+    def spans(self, by: str = "task") -> Dict[str, Tuple[float, float]]:
+        """The time span of the results grouped by an attribute.
+
+        Use case: find the slow tasks (or hosts) of a deployment.
+
+        Args:
+            by: the attribute to group the results by (e.g "task" or "host")
+
+        Returns:
+            A dict: value of the attribute -> (first start, last end).
+            Results without timestamps are ignored.
+
+        Examples:
+
+            .. code-block:: python
+
+                spans = results.spans(by="task")
+                slowest = max(spans.items(), key=lambda s: s[1][1] - s[1][0])
+        """
+        spans: Dict[str, Tuple[float, float]] = {}
+        for r in self:
+            if r.start is None or r.end is None:
+                continue
+            key = getattr(r, by)
+            if key in spans:
+                start, end = spans[key]
+                spans[key] = (min(start, r.start), max(end, r.end))
+            else:
+                spans[key] = (r.start, r.end)
+        return spans
+
+    def to_chrome_trace(self) -> List[Dict]:
+        """The results as Chrome trace events (one complete event per result).
+
+        Each host is a thread of the trace. The events can be loaded in
+        chrome://tracing or https://ui.perfetto.dev once wrapped in a list.
+
+        Returns:
+            A list of the trace events.
+        """
+        events: List[Dict] = []
+        hosts: Set[str] = set()
+        for r in self:
+            if r.start is None or r.end is None:
+                continue
+            tid = zlib.crc32(r.host.encode())
+            if r.host not in hosts:
+                hosts.add(r.host)
+                events.append(
+                    dict(
+                        name="thread_name",
+                        ph="M",
+                        pid=0,
+                        tid=tid,
+                        args=dict(name=r.host),
+                    )
+                )
+            events.append(
+                dict(
+                    name=r.task,
+                    cat=r.status,
+                    ph="X",
+                    ts=int(r.start * 1e6),
+                    dur=int((r.end - r.start) * 1e6),
+                    pid=0,
+                    tid=tid,
+                    args=dict(host=r.host, status=r.status),
+                )
+            )
+        return events
+
+    def to_otlp(
+        self,
+        name: str = "run_ansible",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Dict:
+        """The results as an OTLP/JSON trace (ExportTraceServiceRequest).
+
+        The results are children spans of a root span covering the whole
+        execution.
+
+        Args:
+            name: name of the root span
+            start: start timestamp of the root span (default to the first start)
+            end: end timestamp of the root span (default to the last end)
+
+        Returns:
+            The trace as a dict.
+        """
+        timed = [r for r in self if r.start is not None and r.end is not None]
+        if start is None:
+            start = min((r.start for r in timed), default=time.time())
+        if end is None:
+            end = max((r.end for r in timed), default=start)
+
+        def _ns(t: float) -> str:
+            return str(int(t * 1e9))
+
+        def _attrs(**kwargs) -> List[Dict]:
+            return [dict(key=k, value=dict(stringValue=v)) for k, v in kwargs.items()]
+
+        trace_id = os.urandom(16).hex()
+        root_id = os.urandom(8).hex()
+        spans = [
+            dict(
+                traceId=trace_id,
+                spanId=root_id,
+                name=name,
+                kind=1,
+                startTimeUnixNano=_ns(start),
+                endTimeUnixNano=_ns(end),
+            )
+        ]
+        for r in timed:
+            spans.append(
+                dict(
+                    traceId=trace_id,
+                    spanId=os.urandom(8).hex(),
+                    parentSpanId=root_id,
+                    name=r.task,
+                    kind=1,
+                    startTimeUnixNano=_ns(r.start),
+                    endTimeUnixNano=_ns(r.end),
+                    attributes=_attrs(
+                        **{"host.name": r.host, "enoslib.status": r.status}
+                    ),
+                    # 1: OK, 2: ERROR
+                    status=dict(code=1 if r.ok() or r.status == STATUS_SKIPPED else 2),
+                )
+            )
+        return dict(
+            resourceSpans=[
+                dict(
+                    resource=dict(attributes=_attrs(**{"service.name": "enoslib"})),
+                    scopeSpans=[dict(scope=dict(name="enoslib"), spans=spans)],
+                )
+            ]
+        )
+
     @staticmethod
     def from_ansible(results: List[_AnsibleExecutionRecord]) -> "Results":
         return Results(BaseCommandResult.from_play(r) for r in results)
@@ -624,6 +908,15 @@ def run_play(
     # This is super important to generate the file in the current directory avs
     # users often copy/sync file to remote machines using relative path on the
     # local machine. In Ansible, such path is relative to the playbook location.
+    if play_source.get("gather_facts", True) and get_fact_cache() is not None:
+        # gather the facts explicitly (Ansible gathers them by default) so
+        # that the cached facts aren't gathered again
+        play_source = dict(
+            play_source,
+            gather_facts=False,
+            tasks=[_skip_cached_facts(dict(name="Gathering Facts", setup=""))]
+            + list(play_source.get("tasks", [])),
+        )
     with NamedTemporaryFile(dir=Path.cwd()) as _tmp_file:
         play_path = Path(_tmp_file.name)
         logger.debug("Generating playbook in %s ", play_path)
@@ -773,7 +1066,7 @@ class actions:
         self._tasks: List[Mapping[Any, Any]] = []
 
         if gather_facts:
-            self._tasks.append(dict(name="Gather facts", setup=""))
+            self._tasks.append(_skip_cached_facts(dict(name="Gather facts", setup="")))
 
         if self.priors:
             for prior in self.priors:
@@ -1101,9 +1394,10 @@ def gather_facts(
         s = {r.host: r.payload.get("ansible_facts") for r in _r}
         return s
 
+    task = {"name": COMMAND_NAME, "setup": {"gather_subset": gather_subset}}
     play_source = {
         "hosts": pattern_hosts,
-        "tasks": [{"name": COMMAND_NAME, "setup": {"gather_subset": gather_subset}}],
+        "tasks": [_skip_cached_facts(task, gather_subset)],
     }
     results = run_play(
         play_source,
@@ -1113,6 +1407,11 @@ def gather_facts(
         on_error_continue=on_error_continue,
     )
     ok = filter_results(results, STATUS_OK)
+    fact_cache = get_fact_cache()
+    if fact_cache is not None:
+        # the gathering is skipped when the facts are cached
+        for host in filter_results(results, STATUS_SKIPPED):
+            ok[host] = fact_cache.get(host, gather_subset)
     failed = filter_results(results, STATUS_FAILED)
 
     return {"ok": ok, "failed": failed, "results": results}
@@ -1138,6 +1437,132 @@ def _dump_obj(obj):
             )
 
 
+def _dump_trace(results: Results, start: float, end: float):
+    """Append the spans of the results to the trace file (if any).
+
+    chrome: the file is a JSON array of trace events whose closing bracket is
+    omitted (this is allowed by the format) so that events can be appended.
+    otlp: the file has one OTLP/JSON trace per line (per call).
+
+    Args:
+        results: the results to export
+        start: start timestamp of the execution
+        end: end timestamp of the execution
+    """
+    trace = get_config().get("ansible_trace")
+    if trace is None:
+        return
+    trace = Path(trace)
+    trace_format = get_config().get("ansible_trace_format")
+    try:
+        if trace_format == "otlp":
+            content = json.dumps(results.to_otlp(start=start, end=end)) + "\n"
+        elif trace_format == "chrome":
+            content = "".join(
+                f"{json.dumps(event)},\n" for event in results.to_chrome_trace()
+            )
+            if not trace.exists() or trace.stat().st_size == 0:
+                content = "[\n" + content
+        else:
+            raise ValueError(f"Unknown trace format {trace_format}")
+        with trace.open("a") as f:
+            f.write(content)
+    except (TypeError, ValueError, OSError) as err:
+        logger.error(
+            "Error while saving the trace ansible_trace=%s, exception=%s",
+            trace,
+            err,
+        )
+
+
+def _check_errors(results: List[_AnsibleExecutionRecord], on_error_continue: bool):
+    """Log the failed and unreachable hosts of a playbook and raise if needed.
+
+    Raises:
+        :py:class:`enoslib.errors.EnosFailedHostsError`: if a task returns an
+            error on a host and ``on_error_continue==False``
+        :py:class:`enoslib.errors.EnosUnreachableHostsError`: if a host is
+            unreachable (through ssh) and ``on_error_continue==False``
+    """
+    failed_hosts = []
+    unreachable_hosts = []
+    for r in results:
+        if r.status == STATUS_UNREACHABLE:
+            unreachable_hosts.append(r)
+        if r.status == STATUS_FAILED:
+            failed_hosts.append(r)
+
+    if len(failed_hosts) > 0:
+        logger.error("Failed hosts: %s", failed_hosts)
+        if not on_error_continue:
+            raise EnosFailedHostsError(failed_hosts)
+    if len(unreachable_hosts) > 0:
+        logger.error("Unreachable hosts: %s", unreachable_hosts)
+        if not on_error_continue:
+            raise EnosUnreachableHostsError(unreachable_hosts)
+
+
+class _CachedFacts(MutableMapping):
+    """The facts of the hosts, completed with the cached ones.
+
+    The cached facts of a host are loaded the first time Ansible looks for
+    the facts of this host (so not at all for the hosts a run doesn't target).
+    """
+
+    def __init__(self, facts: MutableMapping, fact_cache: FactCache):
+        self._facts = facts
+        self._fact_cache = fact_cache
+        self._loaded: Set[str] = set()
+
+    def _load(self, host: str):
+        if host in self._loaded:
+            return
+        self._loaded.add(host)
+        if host not in self._facts:
+            facts = self._fact_cache.get(host)
+            if facts is not None:
+                # Ansible updates the facts of a host in place
+                self._facts[host] = dict(facts)
+
+    def __getitem__(self, host: str):
+        self._load(host)
+        return self._facts[host]
+
+    def __setitem__(self, host: str, facts):
+        self._loaded.add(host)
+        self._facts[host] = facts
+
+    def __delitem__(self, host: str):
+        self._loaded.add(host)
+        del self._facts[host]
+
+    def __contains__(self, host):
+        self._load(host)
+        return host in self._facts
+
+    def __iter__(self):
+        return iter(self._facts)
+
+    def __len__(self):
+        return len(self._facts)
+
+
+def _use_cached_facts(variable_manager: VariableManager) -> Optional[FactCache]:
+    """Make the cached facts of the hosts available as if they had been gathered.
+
+    Returns:
+        The fact cache (None if it's disabled)
+    """
+    fact_cache = get_fact_cache()
+    if fact_cache is None:
+        return None
+    # the facts are looked up there (see VariableManager.get_vars)
+    variable_manager._fact_cache = _CachedFacts(
+        variable_manager._fact_cache, fact_cache
+    )
+    return fact_cache
+
+
 def run_ansible(
     playbooks: List[str],
     inventory_path: Optional[Union[str, List]] = None,
@@ -1165,6 +1590,7 @@ def run_ansible(
         :py:class:`enoslib.errors.EnosUnreachableHostsError`: if a host is
             unreachable (through ssh) and ``on_error_continue==False``
     """
+    started = time.time()
     if extra_vars is None:
         extra_vars = {}
     roles = _hostslike_to_roles(roles)
@@ -1177,52 +1603,39 @@ def run_ansible(
         basedir=basedir,
         forks=forks,
     )
+    fact_cache = _use_cached_facts(variable_manager)
     results: List[_AnsibleExecutionRecord] = []
     passwords: Dict = {}
-    for path in playbooks:
-        logger.debug("Running playbook %s with vars:\n%s", path, extra_vars)
-        _results: List[_AnsibleExecutionRecord] = []
-        callback = _MyCallback(_results)
-        pbex = PlaybookExecutor(
-            playbooks=[path],
-            inventory=inventory,
-            variable_manager=variable_manager,
-            loader=loader,
-            passwords=passwords,
-        )
-        # hack ahead
-        pbex._tqm._callback_plugins.append(callback)
+    try:
+        for path in playbooks:
+            logger.debug("Running playbook %s with vars:\n%s", path, extra_vars)
+            _results: List[_AnsibleExecutionRecord] = []
+            callback = _MyCallback(_results, fact_cache=fact_cache)
+            pbex = PlaybookExecutor(
+                playbooks=[path],
+                inventory=inventory,
+                variable_manager=variable_manager,
+                loader=loader,
+                passwords=passwords,
+            )
+            # hack ahead
+            pbex._tqm._callback_plugins.append(callback)
 
-        if get_config()["ansible_stdout"] == "noop":
-            pbex._tqm._stdout_callback = NoopCallback()
-        elif get_config()["ansible_stdout"] == "spinner":
-            pbex._tqm._stdout_callback = SpinnerCallback()
-        else:
-            # let the ansible.cfg governs this
-            pass
-        _ = pbex.run()
-
-        results += _results
-
-        # Handling errors
-        failed_hosts = []
-        unreachable_hosts = []
-        for r in _results:
-            if r.status == STATUS_UNREACHABLE:
-                unreachable_hosts.append(r)
-            if r.status == STATUS_FAILED:
-                failed_hosts.append(r)
-
-        if len(failed_hosts) > 0:
-            logger.error("Failed hosts: %s", failed_hosts)
-            if not on_error_continue:
-                raise EnosFailedHostsError(failed_hosts)
-        if len(unreachable_hosts) > 0:
-            logger.error("Unreachable hosts: %s", unreachable_hosts)
-            if not on_error_continue:
-                raise EnosUnreachableHostsError(unreachable_hosts)
-
-    final_results: Results = Results.from_ansible(results)
+            if get_config()["ansible_stdout"] == "noop":
+                pbex._tqm._stdout_callback = NoopCallback()
+            elif get_config()["ansible_stdout"] == "spinner":
+                pbex._tqm._stdout_callback = SpinnerCallback()
+            else:
+                # let the ansible.cfg governs this
+                pass
+            _ = pbex.run()
+
+            results += _results
+            _check_errors(_results, on_error_continue)
+    finally:
+        final_results: Results = Results.from_ansible(results)
+        # the trace is written on failures too (that's when it's needed)
+        _dump_trace(final_results, started, time.time())
     # dump if needed
     _dump_obj(final_results.to_dict(include_payload=True))
     return final_results
@@ -1413,6 +1826,165 @@ def wait_for(roles: RolesLike, retries: int = 100, interval: int = 30, **kwargs)
         raise EnosSSHNotReady("Maximum retries reached")
 
 
+def _url_host(address: str) -> str:
+    """The host part of a URL (IPv6 addresses are enclosed in brackets)."""
+    return f"[{address}]" if ":" in address else address
+
+
+def _fanout_rounds(
+    have: List[Host], missing: List[Host], fanout: int
+) -> List[Dict[Host, Host]]:
+    """Plan the distribution of a file along a tree.
+
+    At each round every host having the file serves it to (at most) fanout
+    other hosts: the number of hosts having the file is multiplied by
+    fanout + 1 at each round.
+
+    Returns:
+        The rounds (each round maps a host to its source).
+    """
+    have, missing = list(have), list(missing)
+    rounds = []
+    while missing:
+        current: Dict[Host, Host] = {}
+        for source in have:
+            for _ in range(fanout):
+                if not missing:
+                    break
+                current[missing.pop(0)] = source
+        have.extend(current)
+        rounds.append(current)
+    return rounds
+
+
+def _sha256(path: Union[Path, str]) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def distribute(
+    src: Union[Path, str],
+    dest: str,
+    roles: RolesLike,
+    pattern_hosts: str = "all",
+    seeds: int = 1,
+    fanout: int = 4,
+    port: int = DISTRIBUTE_PORT,
+    networks: Optional[Iterable[Network]] = None,
+    **kwargs: Any,
+) -> List[Host]:
+    """Copy a (large) local file to many hosts, relaying it between the hosts.
+
+    The control node sends the file only to a few seeds. Then, round after
+    round, every host having the file serves it (over HTTP, with python3) to
+    at most fanout peers: the number of transfers from the control node
+    doesn't depend on the number of hosts and the number of rounds grows
+    logarithmically.
+
+    The hosts whose dest has already the same content (sha256) are skipped
+    and serve the file to the others (no seed is used if there's any).
+
+    Args:
+        src: path to the local file
+        dest: absolute path of the file on the hosts
+        roles: the hosts to copy the file to
+        pattern_hosts: pattern to describe ansible hosts to target.
+            see https://docs.ansible.com/ansible/latest/intro_patterns.html
+        seeds: number of hosts the control node sends the file to
+        fanout: number of peers a host serves the file to at each round
+        port: port used by the hosts to serve the file
+        networks: the hosts reach their peers on these networks (default
+            to the addresses used by the control node)
+        kwargs: keyword arguments passed to :py:func:`enoslib.api.run_ansible`
+            (facts are never gathered)
+
+    Returns:
+        The hosts that received the file.
+
+    Examples:
+
+        .. code-block:: python
+
+            en.distribute("dataset.tar.gz", "/tmp/dataset.tar.gz", roles)
+    """
+    digest = _sha256(src)
+    kwargs.pop("gather_facts", None)
+    extra_vars = dict(kwargs.pop("extra_vars", None) or {})
+    _roles = _hostslike_to_roles(roles)
+    assert _roles is not None
+    hosts = sorted(get_hosts(_roles, pattern_hosts), key=lambda h: str(h.alias))
+    results = run_command(
+        f"sha256sum {dest} 2> /dev/null || true",
+        roles=hosts,
+        task_name="Checking the distributed file",
+        extra_vars=extra_vars,
+        **kwargs,
+    )
+    up_to_date = {r.host for r in results if r.stdout.split(" ", 1)[0] == digest}
+    have = [h for h in hosts if h.alias in up_to_date]
+    missing = [h for h in hosts if h.alias not in up_to_date]
+    if not missing:
+        return []
+
+    # the file is served from a dedicated directory (and only this file)
+    stage = f"/tmp/enoslib_distribute/{digest}"
+    serve = f"python3 -m http.server {port} --directory {stage}"
+
+    def _serve(p):
+        p.file(path=stage, state="directory")
+        p.file(src=dest, dest=f"{stage}/{digest}", state="link", force=True)
+        p.shell(serve, background=True, task_name="Serving the distributed file")
+        p.wait_for(port=port, timeout=30)
+
+    try:
+        if not have:
+            have, missing = missing[:seeds], missing[seeds:]
+            with actions(
+                roles=have, gather_facts=False, extra_vars=extra_vars, **kwargs
+            ) as p:
+                p.file(path=os.path.dirname(dest), state="directory")
+                p.copy(src=str(src), dest=dest, task_name="Copying to the seeds")
+        with actions(
+            roles=have, gather_facts=False, extra_vars=extra_vars, **kwargs
+        ) as p:
+            _serve(p)
+        for current in _fanout_rounds(have, missing, fanout):
+            sources = {
+                h.alias: _url_host(get_address(s, networks)) for h, s in current.items()
+            }
+            with actions(
+                roles=list(current),
+                gather_facts=False,
+                extra_vars=dict(extra_vars, enoslib_distribute_sources=sources),
+                **kwargs,
+            ) as p:
+                p.file(path=os.path.dirname(dest), state="directory")
+                p.get_url(
+                    url=(
+                        "http://{{ enoslib_distribute_sources[inventory_hostname] }}"
+                        f":{port}/{digest}"
+                    ),
+                    dest=dest,
+                    checksum=f"sha256:{digest}",
+                    task_name="Getting the distributed file from a peer",
+                )
+                _serve(p)
+    finally:
+        with actions(
+            roles=hosts, gather_facts=False, extra_vars=extra_vars, **kwargs
+        ) as p:
+            # the brackets prevent pkill from matching its own shell
+            p.shell(
+                f"pkill -f '[p]{serve[1:]}' || true",
+                task_name="Stop serving the distributed file",
+            )
+            p.file(path=stage, state="absent")
+    return [h for h in hosts if h.alias not in up_to_date]
+
+
 def bg_start(key: str, cmd: str) -> str:
     """Put a command in the background.
 
@@ -2,36 +2,67 @@
 Manage a configuration for EnOSlib.
 """
 
-import copy
 import logging
+import threading
 from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any, Dict, Optional, Union
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Union
 
 logger = logging.getLogger(__name__)
 
-_config = dict(
-    g5k_cache="lru",
-    g5k_auto_jump=None,
-    display="html",
-    dump_results=None,
-    ansible_stdout="spinner",
-    ansible_forks=5,
+# The config is an immutable snapshot: reading it doesn't copy anything and
+# changing it swaps the snapshot.
+# The global snapshot is shared by all threads (set_config) while
+# config_context only changes the snapshot of the current context (thread or
+# asyncio task).
+_global_config: Mapping[str, Any] = MappingProxyType(
+    dict(
+        g5k_cache="lru",
+        g5k_auto_jump=None,
+        display="html",
+        dump_results=None,
+        ansible_stdout="spinner",
+        ansible_forks=5,
+        env_store="pickle",
+        ssh_multiplexing=False,
+        ansible_trace=None,
+        ansible_trace_format="chrome",
+        fact_cache=None,
+        fact_cache_ttl=86400,
+    )
 )
+_context_config: ContextVar[Optional[Mapping[str, Any]]] = ContextVar(
+    "enoslib_config", default=None
+)
+_lock = threading.Lock()
 
 
-def get_config() -> Dict:
-    """Get (a copy of) the current config."""
-    return copy.deepcopy(_config)
+def get_config() -> Mapping[str, Any]:
+    """Get the current config (a read-only snapshot)."""
+    config = _context_config.get()
+    if config is None:
+        return _global_config
+    return config
 
 
-def _set(key: str, value: Optional[Any]):
-    if value is not None:
-        _config[key] = value
+def _update(values: Dict[str, Any]):
+    """Swap the current snapshot with an updated one (None values are ignored)."""
+    global _global_config
+    values = {k: v for k, v in values.items() if v is not None}
+    if not values:
+        return
+    config = _context_config.get()
+    if config is not None:
+        _context_config.set(MappingProxyType({**config, **values}))
+        return
+    with _lock:
+        _global_config = MappingProxyType({**_global_config, **values})
 
 
-def _set_dump_results(dump_results: Optional[Union[Path, str]]):
-    """Prechecks and set the dump_results key
+def _dump_results_path(dump_results: Optional[Union[Path, str]]) -> Optional[Path]:
+    """Prechecks the dump_results key
 
     If the dump_results file exists, don't override it.
     Instead, add a suffix (.1 or .2 ...).
@@ -42,9 +73,7 @@ def _set_dump_results(dump_results: Optional[Union[Path, str]]):
 
     """
     if dump_results is None:
-        _set("dump_results", dump_results)
-        return
-    assert dump_results is not None
+        return None
 
     candidate = str(dump_results)
     i = 1
@@ -52,7 +81,7 @@ def _set_dump_results(dump_results: Optional[Union[Path, str]]):
         candidate = f"{dump_results}.{i}"
         i += 1
     # we found a candidate, use it
-    _set("dump_results", Path(candidate))
+    return Path(candidate)
 
 
 def set_config(
@@ -62,6 +91,12 @@ def set_config(
     dump_results: Optional[Union[Path, str]] = None,
     ansible_stdout: Optional[str] = None,
     ansible_forks: Optional[int] = None,
+    env_store: Optional[str] = None,
+    ssh_multiplexing: Optional[bool] = None,
+    ansible_trace: Optional[Union[Path, str]] = None,
+    ansible_trace_format: Optional[str] = None,
+    fact_cache: Optional[Union[Path, str]] = None,
+    fact_cache_ttl: Optional[float] = None,
 ):
     """Set a specific config value.
 
@@ -77,15 +112,44 @@ def set_config(
         dump_results: dump the command result in a file
         ansible_stdout: stdout Ansible callback to use
         ansible_forks: change Ansible's "forks" parameter (level of parallelization)
+        env_store: how new environments of the tasks are stored
+            pickle: the whole environment is pickled in a single file
+            lazy: each key is pickled in its own file, values are loaded on
+            first access and only the modified ones are written back
+            (objects shared between keys are no longer shared once reloaded)
+        ssh_multiplexing: reuse the SSH connections to the hosts and to
+            the gateways across the Ansible tasks (ControlMaster) and enable
+            Ansible pipelining. The connections are closed when the python
+            process exits.
+        ansible_trace: append the timing of the Ansible tasks (one span per
+            host and task) to this file
+        ansible_trace_format: format of the trace file
+            chrome: Chrome trace events (chrome://tracing, Perfetto)
+            otlp: one OpenTelemetry (OTLP/JSON) trace per line
+        fact_cache: directory where the facts of the hosts are cached (see
+            :py:mod:`enoslib.fact_cache`). The cached facts are used instead of
+            gathering them again.
+        fact_cache_ttl: validity of the cached facts in seconds (0: no
+            expiration)
     """
-    _set("g5k_cache", g5k_cache)
-    _set("g5k_auto_jump", g5k_auto_jump)
-    _set("display", display)
-    _set("ansible_stdout", ansible_stdout)
-    _set("ansible_forks", ansible_forks)
-    _set_dump_results(dump_results)
-
-    logger.debug("config = %s", get_config())
+    _update(
+        dict(
+            g5k_cache=g5k_cache,
+            g5k_auto_jump=g5k_auto_jump,
+            display=display,
+            ansible_stdout=ansible_stdout,
+            ansible_forks=ansible_forks,
+            env_store=env_store,
+            ssh_multiplexing=ssh_multiplexing,
+            ansible_trace=ansible_trace,
+            ansible_trace_format=ansible_trace_format,
+            fact_cache=fact_cache,
+            fact_cache_ttl=fact_cache_ttl,
+            dump_results=_dump_results_path(dump_results),
+        )
+    )
+
+    logger.debug("config = %s", dict(get_config()))
 
 
 @contextmanager
@@ -93,6 +157,8 @@ def config_context(**new_config):
     """A context manager to manage a config specific to a portion of code.
 
     The original config is restored when exiting the context manager.
+    The config is local to the current thread (or asyncio task): other
+    threads don't see it.
 
     Args:
         new_config: any keyword argument supported by
@@ -111,9 +177,9 @@ def config_context(**new_config):
 
             # the config goes back to its previous state here
     """
-    old_config = get_config()
-    set_config(**new_config)
+    token = _context_config.set(get_config())
     try:
+        set_config(**new_config)
         yield
     finally:
-        set_config(**old_config)
+        _context_config.reset(token)
@@ -9,6 +9,11 @@ PROVIDER_DIR = os.path.join(ENOS_PATH, "provider")
 ANSIBLE_DIR = os.path.join(ENOS_PATH, "ansible")
 SYMLINK_NAME = Path("current")
 ENV_FILENAME = "env"
+# per-key storage of a lazy environment
+ENV_STORE_DIRNAME = "env.d"
 TMP_DIRNAME = "_tmp_enos_"
+# How long the multiplexed SSH connections stay open when idle
+# (see the ssh_multiplexing configuration key)
+SSH_CONTROL_PERSIST = "10m"
 
 CGROUP_PREFIX = "/sys/fs/cgroup"
@@ -42,7 +42,7 @@ Example:
 import json
 from typing import List, Mapping, Optional
 
-from enoslib.api import get_hosts, run_command
+from enoslib.api import run_command
 from enoslib.objects import Host, Roles
 
 
@@ -124,18 +124,22 @@ def get_dockers(
         List of DockerHost matching the passed container_name
     """
     docker_hosts = []
+    # xargs -r: don't call docker inspect when there's no container
     result = run_command(
-        f"docker ps -q --filter name={container_name} | xargs docker inspect",
+        f"docker ps -q --filter name={container_name} | xargs -r docker inspect",
         pattern_hosts=pattern_hosts,
         roles=roles,
         on_error_continue=True,
         gather_facts=False,
     )
+    # the results refer to the hosts by their alias
+    hosts = {h.alias: h for _hosts in roles.values() for h in _hosts}
     # parsing the results
     for r in result:
-        dockers = json.loads(r.stdout)
-        host = get_hosts(roles, r.host)[0]
-        for docker in dockers:
+        if not r.ok() or not r.stdout:
+            continue
+        host = hosts[r.host]
+        for docker in json.loads(r.stdout):
             docker_host = DockerHost.from_state(docker, host)
             docker_hosts.append(docker_host)
     return docker_hosts
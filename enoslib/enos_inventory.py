@@ -1,3 +1,8 @@
+import atexit
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
 from typing import List, Mapping, Optional, Union
 
 import ansible
@@ -5,11 +10,43 @@ from ansible.inventory.manager import InventoryManager as Inventory
 from ansible.parsing.dataloader import DataLoader
 from packaging import version
 
+from enoslib.config import get_config
+from enoslib.constants import SSH_CONTROL_PERSIST
 from enoslib.objects import Host
-from enoslib.utils import generate_ssh_option_gateway
+from enoslib.utils import generate_ssh_option_gateway, host_gateways
 
 ANSIBLE_VERSION = version.parse(ansible.__version__)
 
+_SSH_CONTROL_DIR: Optional[str] = None
+
+
+def _close_ssh_control_dir(control_dir: str):
+    """Closes the master connections and removes their sockets."""
+    for socket in Path(control_dir).iterdir():
+        try:
+            subprocess.run(
+                ["ssh", "-o", f"ControlPath={socket}", "-O", "exit", "enoslib"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=5,
+            )
+        except (OSError, subprocess.SubprocessError):
+            pass
+    shutil.rmtree(control_dir, ignore_errors=True)
+
+
+def ssh_control_dir() -> str:
+    """Directory of the sockets of the multiplexed SSH connections.
+
+    It is created on first use (in /tmp, as the socket paths are length
+    limited) and removed (connections closed) when the process exits.
+    """
+    global _SSH_CONTROL_DIR
+    if _SSH_CONTROL_DIR is None:
+        _SSH_CONTROL_DIR = tempfile.mkdtemp(prefix="enoslib-ssh-", dir="/tmp")
+        atexit.register(_close_ssh_control_dir, _SSH_CONTROL_DIR)
+    return _SSH_CONTROL_DIR
+
 
 class EnosInventory(Inventory):
     def __init__(
@@ -47,6 +84,9 @@ class EnosInventory(Inventory):
         self._populate_with_roles(roles)
 
     def _populate_with_roles(self, roles: Mapping):  # noqa: C901
+        control_dir = None
+        if get_config()["ssh_multiplexing"]:
+            control_dir = ssh_control_dir()
         for role, machines in roles.items():
             self.add_group(role)
             for machine in machines:
@@ -75,29 +115,24 @@ class EnosInventory(Inventory):
                 if forward_agent:
                     common_args.append("-o ForwardAgent=yes")
 
-                gateway = machine.extra.get("gateway", None)
-                gateway_user = machine.extra.get("gateway_user", machine.user)
-                gateway_port = machine.extra.get("gateway_port", None)
-                internal_gateway = machine.extra.get("internal_gateway", None)
-                internal_gateway_user = machine.extra.get(
-                    "internal_gateway_user", machine.user
-                )
-                internal_gateway_port = machine.extra.get("internal_gateway_port", None)
-                gateways = []
                 # Order is important, outermost gateway goes first
-                if gateway is not None:
-                    gateways.append((gateway, gateway_user, gateway_port))
-                if internal_gateway is not None:
-                    gateways.append(
-                        (internal_gateway, internal_gateway_user, internal_gateway_port)
-                    )
-
-                proxy_args = generate_ssh_option_gateway(gateways)
+                proxy_args = generate_ssh_option_gateway(
+                    host_gateways(machine), control_path_dir=control_dir
+                )
                 if proxy_args != "":
                     common_args.append(proxy_args)
 
                 final_common_args = " ".join(common_args)
                 host.set_variable("ansible_ssh_common_args", f"{final_common_args}")
+                if control_dir is not None:
+                    # Ansible adds the ControlPath (in control_dir)
+                    host.set_variable(
+                        "ansible_ssh_args",
+                        "-C -o ControlMaster=auto "
+                        f"-o ControlPersist={SSH_CONTROL_PERSIST}",
+                    )
+                    host.set_variable("ansible_control_path_dir", control_dir)
+                    host.set_variable("ansible_ssh_pipelining", True)
 
                 for k, v in machine.extra.items():
                     if k not in [
@@ -0,0 +1,144 @@
+"""
+Cache of the Ansible facts of the hosts.
+
+The facts are stored with the layout of the Ansible's ``jsonfile`` cache
+plugin: one json file per host (named after the host alias) in a directory.
+An entry is valid for ``ttl`` seconds after it was written (0 means forever).
+
+The cache is enabled with :py:func:`~enoslib.config.set_config`:
+
+.. code-block:: python
+
+    en.set_config(fact_cache="facts", fact_cache_ttl=3600)
+
+The cached facts of a host are then used by the Ansible executions that look
+them up (they are loaded at this time) and the fact gathering tasks
+(``gather_facts``, ``sync_info``, ``run_command(..., gather_facts=True)``,
+...) are skipped for the hosts whose cached facts cover the requested subset.
+
+The entries are read from the disk once and then kept in memory: the facts
+written by another process in the meantime are ignored.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from enoslib.config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+def _subsets(gather_subset: Union[str, List[str]]) -> List[str]:
+    if isinstance(gather_subset, str):
+        return [s.strip() for s in gather_subset.split(",") if s.strip()]
+    return list(gather_subset)
+
+
+def covers(facts: Dict, gather_subset: Union[str, List[str]] = "all") -> bool:
+    """Whether some facts have been gathered with (at least) gather_subset."""
+    gathered = facts.get("gather_subset", [])
+    if "all" in gathered:
+        return True
+    return set(_subsets(gather_subset)) <= set(gathered)
+
+
+class FactCache:
+    """Facts of the hosts stored on disk, keyed by host alias.
+
+    Args:
+        path: directory where the facts are stored (created if needed)
+        ttl: validity (in seconds) of an entry, 0 means no expiration
+    """
+
+    def __init__(self, path: Union[Path, str], ttl: float = 86400):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.path.mkdir(parents=True, exist_ok=True)
+        # alias -> (write date, facts), facts are None if there's no entry
+        self._memory: Dict[str, Tuple[float, Optional[Dict]]] = {}
+
+    def _file(self, alias: str) -> Path:
+        return self.path / alias
+
+    def _load(self, alias: str) -> Tuple[float, Optional[Dict]]:
+        if alias not in self._memory:
+            f = self._file(alias)
+            try:
+                self._memory[alias] = (f.stat().st_mtime, json.loads(f.read_text()))
+            except (OSError, ValueError):
+                self._memory[alias] = (0, None)
+        return self._memory[alias]
+
+    def get(
+        self, alias: str, gather_subset: Optional[Union[str, List[str]]] = None
+    ) -> Optional[Dict]:
+        """The cached facts of a host.
+
+        Args:
+            alias: alias of the host
+            gather_subset: if set, the facts must cover this subset
+
+        Returns:
+            The facts or None if they are missing, expired or don't cover the
+            subset.
+        """
+        written, facts = self._load(alias)
+        if facts is None:
+            return None
+        if self.ttl > 0 and time.time() - written > self.ttl:
+            return None
+        if gather_subset is not None and not covers(facts, gather_subset):
+            return None
+        return facts
+
+    def set(self, alias: str, facts: Dict):
+        """Stores the facts of a host (replaces the previous ones)."""
+        self._memory[alias] = (time.time(), facts)
+        f = self._file(alias)
+        tmp = f.with_name(f".{f.name}.tmp")
+        try:
+            tmp.write_text(json.dumps(facts))
+            os.replace(tmp, f)
+        except (OSError, TypeError, ValueError) as err:
+            logger.error("Unable to cache the facts of %s: %s", alias, err)
+
+    def invalidate(
+        self,
+        aliases: Optional[Iterable[str]] = None,
+        gather_subset: Optional[Union[str, List[str]]] = None,
+    ):
+        """Removes entries from the cache.
+
+        Args:
+            aliases: the hosts to invalidate (default to all the hosts)
+            gather_subset: only invalidate the entries covering this subset
+                (they would be used for this subset otherwise)
+        """
+        if aliases is None:
+            aliases = {
+                f.name for f in self.path.iterdir() if not f.name.startswith(".")
+            } | set(self._memory)
+        for alias in aliases:
+            if gather_subset is not None and self.get(alias, gather_subset) is None:
+                continue
+            self._memory[alias] = (0, None)
+            self._file(alias).unlink(missing_ok=True)
+
+
+# the fact caches in use, they are kept (in memory) between the executions
+_FACT_CACHES: Dict[Tuple[Path, float], FactCache] = {}
+
+
+def get_fact_cache() -> Optional[FactCache]:
+    """The fact cache of the current config (None if it's disabled)."""
+    path = get_config().get("fact_cache")
+    if path is None:
+        return None
+    key = (Path(path).resolve(), get_config()["fact_cache_ttl"])
+    if key not in _FACT_CACHES:
+        _FACT_CACHES[key] = FactCache(*key)
+    return _FACT_CACHES[key]
@@ -1,7 +1,9 @@
+import hashlib
 import json
 import logging
 import warnings
-from typing import Any, Callable, Dict, List, Mapping, Optional, Type
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple, Type
 
 import jsonschema
 
@@ -10,6 +12,70 @@ from enoslib.html import html_from_dict, repr_html_check
 logger = logging.getLogger(__name__)
 STATIC_FILES = "html/style.css"
 
+# Number of (already) valid dictionaries remembered per validator
+VALID_CACHE_SIZE = 256
+
+
+class _CachedValidator:
+    """A validator compiled once for a schema.
+
+    It remembers the dictionaries it has already validated (by content) so
+    that validating the same content again is only a matter of hashing it.
+    """
+
+    def __init__(self, schema: Dict, validator_func: Optional[Callable]):
+        if validator_func is None:
+            cls = jsonschema.validators.validator_for(schema)
+            cls.check_schema(schema)
+            self.validator = cls(schema)
+            # same error as jsonschema.validate
+            self._best_match = True
+        else:
+            self.validator = validator_func(schema)
+            self._best_match = False
+        self._valid: "OrderedDict[str, None]" = OrderedDict()
+
+    @staticmethod
+    def _digest(dictionary: Mapping) -> Optional[str]:
+        try:
+            blob = json.dumps(dictionary, sort_keys=True)
+        except (TypeError, ValueError):
+            # not a plain json document, don't cache
+            return None
+        return hashlib.sha1(blob.encode()).hexdigest()
+
+    def validate(self, dictionary: Mapping):
+        digest = self._digest(dictionary)
+        if digest is not None and digest in self._valid:
+            self._valid.move_to_end(digest)
+            return
+        if self._best_match:
+            error = jsonschema.exceptions.best_match(
+                self.validator.iter_errors(dictionary)
+            )
+            if error is not None:
+                raise error
+        else:
+            self.validator.validate(dictionary)
+        if digest is not None:
+            self._valid[digest] = None
+            if len(self._valid) > VALID_CACHE_SIZE:
+                self._valid.popitem(last=False)
+
+
+# (validator function, schema id) -> (schema, validator)
+_VALIDATORS: Dict[Tuple[Optional[Callable], int], Tuple[Dict, _CachedValidator]] = {}
+
+
+def _get_validator(schema: Dict, validator_func: Optional[Callable]):
+    key = (validator_func, id(schema))
+    cached = _VALIDATORS.get(key)
+    # the schema is kept in the cache so its id can't be reused
+    if cached is None or cached[0] is not schema:
+        cached = (schema, _CachedValidator(schema, validator_func))
+        _VALIDATORS[key] = cached
+    return cached[1]
+
 
 class BaseConfiguration:
     """Base class for all the provider configuration object.
@@ -56,13 +122,15 @@ class BaseConfiguration:
 
     @classmethod
     def validate(cls, dictionary: Mapping, schema: Optional[Dict] = None):
+        """Validate the dictionary against the schema.
+
+        The validator is built once per schema and the dictionaries already
+        validated (same content) aren't validated again.
+        """
         if schema is None:
             schema = cls._SCHEMA
-        if cls._VALIDATOR_FUNC is None:
-            jsonschema.validate(dictionary, schema)
-        else:
-            # pylint: disable-next=not-callable
-            cls._VALIDATOR_FUNC(schema).validate(dictionary)
+        assert schema is not None
+        _get_validator(schema, cls._VALIDATOR_FUNC).validate(dictionary)
 
     def to_dict(self) -> Dict:
         return {}
@@ -32,3 +32,6 @@ DEFAULT_FORCE_DEPLOY = False
 PATH_DISTEMD_LOGS = "/var/log/distem"
 FILE_DISTEMD_LOGS = os.path.join(PATH_DISTEMD_LOGS, "distemd-coord.log")
 SUBNET_NAME = "enoslib_distem_network"
+#: Maximum number of concurrent requests sent to the coordinator
+#: (vnodes are created in bulk per physical machine)
+MAX_WORKERS = 16
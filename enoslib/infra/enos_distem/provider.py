@@ -2,8 +2,9 @@ import copy
 import itertools
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from zoneinfo import ZoneInfo
 
 import distem as d
@@ -21,7 +22,12 @@ from enoslib.objects import Host, Network, Networks, Roles
 
 from ..provider import Provider
 from ..utils import offset_from_format
-from .constants import DEFAULT_ENV_NAME, PATH_DISTEMD_LOGS, SUBNET_NAME
+from .constants import (
+    DEFAULT_ENV_NAME,
+    MAX_WORKERS,
+    PATH_DISTEMD_LOGS,
+    SUBNET_NAME,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -141,6 +147,10 @@ def _start_containers(provider_conf, g5k_subnet, distem, path_sshkeys):
     extra = {"gateway": distem.serveraddr, "gateway_user": "root"}
 
     distem.vnetwork_create(SUBNET_NAME, g5k_subnet.network.with_prefixlen)
+    # (vnode name, roles) in creation order
+    vnodes: List[Tuple[str, List[str]]] = []
+    # physical machine -> vnode names
+    vnodes_by_pm: Dict[str, List[str]] = {}
     total = 0
     for machine in provider_conf.machines:
         pms = machine.undercloud
@@ -148,28 +158,75 @@ def _start_containers(provider_conf, g5k_subnet, distem, path_sshkeys):
         for idx in range(machine.number):
             pm = next(pms_it)
             name = "vnode-%s" % total
-            distem.vnode_create(name, {"host": pm.address}, sshkeys)
-            distem.vfilesystem_create(name, {"image": FSIMG})
-            network = distem.viface_create(
-                name, "if0", {"vnetwork": SUBNET_NAME, "default": "true"}
-            )
-            distem.vnode_start(name)
-            for role in machine.roles:
-                # We have to remove the cidr suffix ...
-                roles.setdefault(role, [])
-                roles[role].append(
-                    Host(
-                        network["address"].split("/")[0],
-                        user="root",
-                        keyfile=path_sshkeys["private"],
-                        extra=extra,
-                    )
-                )
+            vnodes.append((name, machine.roles))
+            vnodes_by_pm.setdefault(pm.address, []).append(name)
             total = total + 1
 
+    desc = {
+        "vfilesystem": {"image": FSIMG},
+        "vifaces": [{"name": "if0", "vnetwork": SUBNET_NAME, "default": "true"}],
+    }
+    addresses = _create_vnodes(distem, vnodes_by_pm, desc, sshkeys)
+    distem.vnodes_start([name for name, _ in vnodes])
+
+    for name, vnode_roles in vnodes:
+        host = Host(
+            addresses[name], user="root", keyfile=path_sshkeys["private"], extra=extra
+        )
+        roles.add_one(host, vnode_roles)
+
     return roles
 
 
+def _vnode_address(distem, vnode: Dict) -> str:
+    """Address of the default interface of a vnode (without the cidr suffix)."""
+    vifaces = vnode.get("vifaces") or []
+    address = vifaces[0].get("address") if vifaces else None
+    if address is None:
+        address = distem.viface_info(vnode["name"], "if0")["address"]
+    return address.split("/")[0]
+
+
+def _create_vnodes(
+    distem, vnodes_by_pm: Dict[str, List[str]], desc: Dict, sshkeys: Dict
+) -> Dict[str, str]:
+    """Create the vnodes in bulk (one request per physical machine).
+
+    The requests for the different physical machines are sent concurrently.
+
+    Returns:
+        The address of each vnode.
+
+    Raises:
+        Exception: if some vnodes couldn't be created (all of them are
+            reported)
+    """
+
+    def _create(pm: str, names: List[str]) -> List[Dict]:
+        return distem.vnodes_create(names, dict(desc, host=pm), sshkeys)
+
+    addresses: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    if not vnodes_by_pm:
+        return addresses
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(vnodes_by_pm))) as pool:
+        futures = {
+            pm: pool.submit(_create, pm, names) for pm, names in vnodes_by_pm.items()
+        }
+    for pm, future in futures.items():
+        try:
+            for vnode in future.result():
+                addresses[vnode["name"]] = _vnode_address(distem, vnode)
+        except Exception as e:
+            for name in vnodes_by_pm[pm]:
+                errors[name] = f"{pm}: {e}"
+    for name, error in errors.items():
+        logger.error("Unable to create %s on %s", name, error)
+    if errors:
+        raise Exception(f"Unable to create the vnodes {sorted(errors)}")
+    return addresses
+
+
 def _get_all_hosts(roles):
     all_hosts = set()
     for _, machines in roles.items():
@@ -37,6 +37,7 @@ class Configuration(BaseConfiguration):
         super().__init__()
         self.dhcp: bool = True
         self.force_deploy: bool = False
+        self.pipelined_deploy: bool = False
         self.env_name: Optional[str] = None
         self.env_version: Optional[int] = None
         self.job_name: str = DEFAULT_JOB_NAME
@@ -1087,6 +1087,80 @@ def available_kwollect_metrics(nodes: Iterable[str]) -> Dict[str, List[Dict]]:
     return result
 
 
+def create_deployment(site: str, config: Dict):
+    """Create a deployment (kadeploy3) on a site without waiting for it.
+
+    Args:
+        site: the site where the nodes to deploy are
+        config: the deployment description (environment, nodes...)
+
+    Returns:
+        The deployment object (see python-grid5000)
+    """
+    gk = get_api_client()
+    logger.info(f"Deploying {config['nodes']} on {site}")
+    deployment = gk.sites[site].deployments.create(config)
+    logger.info("Preparing deployment on %s with config: %s", site, config)
+    return deployment
+
+
+def deployment_result(
+    deployment, config: Dict
+) -> Optional[Tuple[List[str], List[str]]]:
+    """Get the result of a deployment if it's finished.
+
+    The deployment state is refreshed if it is still running.
+
+    Args:
+        deployment: the deployment object (see python-grid5000)
+        config: the config used to create the deployment
+
+    Returns:
+        None if the deployment is still running, the (deployed, undeployed)
+        fqdns otherwise.
+    """
+    if deployment.status not in ["terminated", "error"]:
+        deployment.refresh()
+        logger.info(
+            "Waiting for the end of deployment [%s](processing on %s)",
+            deployment.uid,
+            deployment.site,
+        )
+    if deployment.status == "terminated":
+        _deploy = [node for node, v in deployment.result.items() if v["state"] == "OK"]
+        _undeploy = [
+            node for node, v in deployment.result.items() if v["state"] == "KO"
+        ]
+        logger.info(
+            "Waiting for the end of deployment [%s](terminated on %s)",
+            deployment.uid,
+            deployment.site,
+        )
+        return _deploy, _undeploy
+    if deployment.status == "error":
+        logger.info(
+            "Waiting for the end of deployment [%s](error on %s)",
+            deployment.uid,
+            deployment.site,
+        )
+        return [], list(config["nodes"])
+    return None
+
+
+def cancel_deployment(site: str, deployment):
+    """Cancel a deployment (best effort, errors are only logged).
+
+    Args:
+        site: the site of the deployment
+        deployment: the deployment object (see python-grid5000)
+    """
+    logger.info("Cancelling deployment [%s] on %s", deployment.uid, site)
+    try:
+        get_api_client().sites[site].deployments.delete(deployment.uid)
+    except Exception as e:
+        logger.warning("Unable to cancel deployment [%s]: %s", deployment.uid, e)
+
+
 def grid_deploy(configs):
     # fqdns
     terminated = 0
@@ -1094,14 +1168,11 @@ def grid_deploy(configs):
     deployed_fqdns: List[str] = []
     undeployed_fqdns: List[str] = []
 
-    gk = get_api_client()
     deployments = []
     # create all the deployments
     for config in configs:
         site = config.pop("site")
-        logger.info(f"Deploying {config['nodes']} on {site}")
-        deployments.append((gk.sites[site].deployments.create(config), config))
-        logger.info("Preparing deployment on %s with config: %s", site, config)
+        deployments.append((create_deployment(site, config), config))
 
     while terminated != len(deployments):
         # reset previous iteration state
@@ -1112,36 +1183,11 @@ def grid_deploy(configs):
         time.sleep(10)
 
         for deployment, config in deployments:
-            if deployment.status not in ["terminated", "error"]:
-                deployment.refresh()
-                logger.info(
-                    "Waiting for the end of deployment [%s](processing on %s)",
-                    deployment.uid,
-                    deployment.site,
-                )
-            _deploy = []
-            _undeploy = []
-            if deployment.status == "terminated":
-                terminated = terminated + 1
-                _deploy = [
-                    node for node, v in deployment.result.items() if v["state"] == "OK"
-                ]
-                _undeploy = [
-                    node for node, v in deployment.result.items() if v["state"] == "KO"
-                ]
-                logger.info(
-                    "Waiting for the end of deployment [%s](terminated on %s)",
-                    deployment.uid,
-                    deployment.site,
-                )
-            elif deployment.status == "error":
-                terminated = terminated + 1
-                _undeploy = config["nodes"]
-                logger.info(
-                    "Waiting for the end of deployment [%s](error on %s)",
-                    deployment.uid,
-                    deployment.site,
-                )
+            result = deployment_result(deployment, config)
+            if result is None:
+                continue
+            terminated = terminated + 1
+            _deploy, _undeploy = result
             deployed_fqdns += _deploy
             undeployed_fqdns += _undeploy
     return deployed_fqdns, undeployed_fqdns
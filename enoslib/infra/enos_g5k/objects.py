@@ -1,11 +1,20 @@
+import bisect
 import ipaddress
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, Generator, Iterable, List, Optional, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 from grid5000.base import RESTObject
 from grid5000.objects import Node, Vlan
 from netaddr.ip import IPNetwork
-from netaddr.ip.sets import IPSet
 
 from enoslib.config import get_config
 from enoslib.infra.enos_g5k.constants import G5KMACPREFIX, KAVLAN_LOCAL_IDS
@@ -818,18 +827,21 @@ class G5kEnosVlan4Network(DefaultNetwork):
         # dedicated to g5k machines, and (ii) drops the last one
         # because some of ips are used for specific stuff such as
         # gateway, kavlan server...
-        subnets = IPNetwork(str(self.network))
+        #
+        # The selected subnetworks are contiguous so the range of available
+        # ips is computed arithmetically instead of enumerating the subnets.
         if self.vlan_id in KAVLAN_LOCAL_IDS:
             # vlan local
-            subnets = list(subnets.subnet(24))
-            subnets = subnets[4:7]
+            prefix, first, last = 24, 4, 7
         else:
-            subnets = list(subnets.subnet(23))
-            subnets = subnets[13:31]
-
-        # Finally, compute the range of available ips
-        # and yield in the standard ipaddress world
-        for addr in IPSet(subnets).iprange():
+            prefix, first, last = 23, 13, 31
+        size = 1 << (self.network.max_prefixlen - prefix)
+        start = int(self.network.network_address) + first * size
+        end = int(self.network.network_address) + last * size
+
+        # Finally, yield the range of available ips
+        # in the standard ipaddress world
+        for addr in range(start, end):
             yield ipaddress.ip_address(addr)
 
 
@@ -859,12 +871,112 @@ class G5kEnosVlan6Network(G5kEnosVlan4Network):
         return None
 
 
+def _ipmac(value: int) -> Tuple[str, str]:
+    """Get the (ip, mac) pair of an IPv4 address given as an integer.
+
+    On G5k subnets the mac address is the G5k prefix followed by the last
+    three bytes of the ip address.
+    """
+    x, y, z = (value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF
+    return (
+        str(ipaddress.IPv4Address(value)),
+        G5KMACPREFIX + f":{x:02X}:{y:02X}:{z:02X}",
+    )
+
+
 def build_ipmac(subnet) -> Generator[Tuple[str, str], None, None]:
     network = IPNetwork(subnet)
-    for ip in list(network[1:-1]):
-        _, x, y, z = ip.words
-        ip, mac = (str(ip), G5KMACPREFIX + f":{x:02X}:{y:02X}:{z:02X}")
-        yield ip, mac
+    # network and broadcast addresses are excluded
+    for value in range(network.first + 1, network.last):
+        yield _ipmac(value)
+
+
+class IPMacPool:
+    """Arithmetic pool of (ip, mac) pairs over some G5k subnets.
+
+    Addresses are never enumerated: the i-th pair of the pool is computed
+    from i, the network address of the subnets and their size.
+    The network and broadcast addresses of each subnet are excluded
+    (as in :py:func:`build_ipmac`).
+
+    Args:
+        subnets: the subnets (cidr) to draw addresses from.
+            They are sorted by network address.
+        skip: number of addresses to skip at the beginning of the pool
+        step: step as in built-in range method
+
+    Examples:
+
+        .. code-block:: python
+
+            pool = IPMacPool(["10.158.0.0/22", "10.158.4.0/22"], skip=1)
+            ip, mac = pool[0]
+            assert "10.158.0.2" in pool
+    """
+
+    def __init__(self, subnets: Iterable[str], skip: int = 0, step: int = 1):
+        if skip < 0 or step < 1:
+            raise ValueError(f"Invalid skip={skip} or step={step}")
+        networks = sorted(IPNetwork(str(s)) for s in subnets)
+        # first usable address and number of usable addresses of each subnet
+        self._firsts: List[int] = []
+        self._offsets: List[int] = []
+        total = 0
+        for network in networks:
+            self._firsts.append(network.first + 1)
+            self._offsets.append(total)
+            total += max(network.size - 2, 0)
+        self._total = total
+        self.skip = skip
+        self.step = step
+        self._length = max(-(-(total - skip) // step), 0)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _value(self, index: int) -> int:
+        """Get the integer value of the ip at index."""
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError(f"{index} is out of the pool")
+        absolute = self.skip + index * self.step
+        i = bisect.bisect_right(self._offsets, absolute) - 1
+        return self._firsts[i] + absolute - self._offsets[i]
+
+    def _index(self, ip: str) -> int:
+        """Get the index of an ip in the pool."""
+        value = int(ipaddress.IPv4Address(ip))
+        i = bisect.bisect_right(self._firsts, value) - 1
+        if i >= 0:
+            end = self._offsets[i + 1] if i + 1 < len(self._offsets) else self._total
+            absolute = self._offsets[i] + value - self._firsts[i]
+            if absolute < end and absolute >= self.skip:
+                index, remainder = divmod(absolute - self.skip, self.step)
+                if remainder == 0:
+                    return index
+        raise ValueError(f"{ip} isn't part of the pool")
+
+    def __getitem__(self, index: int) -> Tuple[str, str]:
+        return _ipmac(self._value(index))
+
+    def __iter__(self) -> Iterator[Tuple[str, str]]:
+        for index in range(self._length):
+            yield self[index]
+
+    def __contains__(self, ip) -> bool:
+        try:
+            self._index(str(ip))
+        except ValueError:
+            return False
+        return True
+
+    def __repr__(self) -> str:
+        return (
+            "<IPMacPool("
+            f"subnets={len(self._firsts)}, "
+            f"size={len(self)})>"
+        )
 
 
 class G5kEnosSubnetNetwork(DefaultNetwork):
@@ -1,14 +1,18 @@
+import contextvars
 import copy
 import datetime as dt
 import logging
 import operator
 import re
+import time
 from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
 from itertools import groupby
 from pathlib import Path
 from typing import (
     Any,
+    Callable,
     Dict,
     Iterable,
     List,
@@ -52,6 +56,9 @@ from enoslib.infra.enos_g5k.error import MissingNetworkError
 from enoslib.infra.enos_g5k.g5k_api_utils import (
     OarNetwork,
     _test_slot,
+    cancel_deployment,
+    create_deployment,
+    deployment_result,
     get_api_client,
     get_api_username,
     get_clusters_status,
@@ -70,6 +77,7 @@ from enoslib.infra.providers import Providers
 from enoslib.infra.utils import mk_pools, pick_things
 from enoslib.log import DisableLogging, getLogger
 from enoslib.objects import Host, Networks, Roles
+from enoslib.utils import POOL, Forward
 
 from .configuration import (
     ClusterConfiguration,
@@ -125,17 +133,16 @@ def _check_deployed_nodes(
             undeployed.append(r.host)
 
     # leave the fqdn world and work with G5kHost again
+    by_fqdn = {n.fqdn: n for n in nodes}
     deployed = [
-        n
-        for n in nodes
+        by_fqdn[fqdn]
         for _, fqdn in net.translate(deployed, reverse=True)
-        if fqdn == n.fqdn
+        if fqdn in by_fqdn
     ]
     undeployed = [
-        n
-        for n in nodes
+        by_fqdn[fqdn]
         for _, fqdn in net.translate(undeployed, reverse=True)
-        if fqdn == n.fqdn
+        if fqdn in by_fqdn
     ]
 
     return deployed, undeployed
@@ -194,10 +201,9 @@ def _deploy_attempt(hosts: List[G5kHost], force_deploy: bool, options: Dict):
     deployed_fqdns += [h.fqdn for h in already_deployed]
 
     # go back the the EnOSlib object
-    deployed = [host for host in hosts for fqdn in deployed_fqdns if host.fqdn == fqdn]
-    undeployed = [
-        host for host in hosts for fqdn in undeployed_fqdns if host.fqdn == fqdn
-    ]
+    by_fqdn = {host.fqdn: host for host in hosts}
+    deployed = [by_fqdn[fqdn] for fqdn in deployed_fqdns if fqdn in by_fqdn]
+    undeployed = [by_fqdn[fqdn] for fqdn in undeployed_fqdns if fqdn in by_fqdn]
 
     return deployed, undeployed
 
@@ -215,6 +221,141 @@ def deploy_with_retries(hosts: List[G5kHost], force_deploy, options):
     return deployed_hosts, undeployed_hosts
 
 
+def _split_undeployed(
+    undeployed_fqdns: Iterable[str],
+    by_fqdn: Dict[str, G5kHost],
+    attempts: Dict[str, int],
+) -> Tuple[List[str], List[G5kHost]]:
+    """The (fqdns to redeploy, hosts out of attempts) of a deployment."""
+    retry, failed = [], []
+    for fqdn in undeployed_fqdns:
+        if fqdn not in by_fqdn:
+            continue
+        if attempts[fqdn] < MAX_DEPLOY:
+            retry.append(fqdn)
+        else:
+            failed.append(by_fqdn[fqdn])
+    return retry, failed
+
+
+def _poll_deployments(
+    running: List[Tuple[Any, str, Dict]],
+    by_fqdn: Dict[str, G5kHost],
+    attempts: Dict[str, int],
+) -> Tuple[List[Tuple[Any, str, Dict]], List[List[G5kHost]], List[G5kHost]]:
+    """One polling round of the running deployments (see deploy_pipelined).
+
+    Returns:
+        The deployments still running (including the new attempts), the
+        batches of deployed hosts and the hosts out of attempts.
+    """
+    still_running = []
+    batches = []
+    undeployed: List[G5kHost] = []
+    for deployment, site, config in running:
+        result = deployment_result(deployment, config)
+        if result is None:
+            still_running.append((deployment, site, config))
+            continue
+        deployed_fqdns, undeployed_fqdns = result
+        for fqdn in config["nodes"]:
+            attempts[fqdn] += 1
+        retry, failed = _split_undeployed(undeployed_fqdns, by_fqdn, attempts)
+        undeployed += failed
+        if retry:
+            # the new attempt overlaps with the other running deployments
+            retry_config = dict(config, nodes=retry)
+            still_running.append(
+                (create_deployment(site, retry_config), site, retry_config)
+            )
+        batch = [by_fqdn[fqdn] for fqdn in deployed_fqdns if fqdn in by_fqdn]
+        if batch:
+            batches.append(batch)
+    return still_running, batches, undeployed
+
+
+def _cancel_pipeline(post_deploys: List[Future], running: List[Tuple[Any, str, Dict]]):
+    """Stop the rest of a pipelined deployment (see deploy_pipelined)."""
+    for future in post_deploys:
+        future.cancel()
+    for deployment, site, _ in running:
+        cancel_deployment(site, deployment)
+
+
+def deploy_pipelined(
+    hosts: List[G5kHost],
+    force_deploy: bool,
+    options: Dict,
+    on_deployed: Callable[[List[G5kHost]], None],
+) -> Tuple[List[G5kHost], List[G5kHost]]:
+    """Deploy the hosts and hand them over as soon as their deployment ends.
+
+    Unlike :py:func:`deploy_with_retries` which waits for all the deployments
+    (one per site and primary network) to end before going further, the hosts
+    of a deployment are passed to ``on_deployed`` as soon as this deployment
+    terminates. The failed hosts of a deployment are redeployed right away
+    (up to MAX_DEPLOY attempts) while the other deployments are still
+    running.
+
+    ``on_deployed`` runs in a background thread (one batch at a time, in the
+    current context, e.g. the one of :py:func:`~enoslib.config.config_context`)
+    so that it doesn't delay the polling of the other deployments nor the
+    retries. If it fails, the pending batches and the running deployments are
+    cancelled and the error is raised.
+
+    Args:
+        hosts: the hosts to deploy
+        force_deploy: True iff the environment must be redeployed
+        options: the deployment options (environment, key...)
+        on_deployed: called on each batch of deployed hosts
+            (e.g. to run the post-deployment steps)
+
+    Returns:
+        The (deployed, undeployed) hosts
+    """
+    by_fqdn = {host.fqdn: host for host in hosts}
+    attempts = {host.fqdn: 0 for host in hosts}
+    deployed: List[G5kHost] = []
+    undeployed: List[G5kHost] = []
+
+    already_deployed, configs = check_deployments(hosts, force_deploy, options)
+    post_deploys: List[Future] = []
+    running: List[Tuple[Any, str, Dict]] = []
+    with ThreadPoolExecutor(max_workers=1) as post_deploy:
+
+        def _submit(batch: List[G5kHost]):
+            # the config is a ContextVar, it must follow the batch
+            context = contextvars.copy_context()
+            post_deploys.append(post_deploy.submit(context.run, on_deployed, batch))
+            deployed.extend(batch)
+
+        try:
+            if already_deployed:
+                _submit(already_deployed)
+            for config in configs:
+                site = config.pop("site")
+                running.append((create_deployment(site, config), site, config))
+
+            while running:
+                time.sleep(10)
+                # fail early if a post-deployment failed
+                for future in post_deploys:
+                    if future.done():
+                        future.result()
+                running, batches, failed = _poll_deployments(running, by_fqdn, attempts)
+                undeployed += failed
+                for batch in batches:
+                    _submit(batch)
+
+            for future in post_deploys:
+                future.result()
+        except BaseException:
+            _cancel_pipeline(post_deploys, running)
+            raise
+
+    return deployed, undeployed
+
+
 def _run_dhcp(sshable_hosts: Sequence[G5kHost]):
     logger.debug("Configuring network interfaces on the nodes")
     hosts = [
@@ -422,18 +563,28 @@ class G5kTunnel:
     Args:
         address: The ip address/fqdn of the targetted service
         port: The port of the targetted service
+        local_port: The local port to bind (0 picks a free one)
+        pooled: if True, the tunnel is a port forward on an SSH connection
+            shared with the other pooled tunnels (the connection is closed
+            with the last of them). In this case the tunnel object returned
+            is a :py:class:`~enoslib.utils.Forward`.
     """
 
-    def __init__(self, address: str, port: int, local_port: int = 0):
+    def __init__(
+        self, address: str, port: int, local_port: int = 0, pooled: bool = False
+    ):
         """"""
         self.address = address
         self.port = port
         self.local_port = local_port
+        self.pooled = pooled
 
         # computed
-        self.tunnel: Optional[SSHTunnelForwarder] = None
+        self.tunnel: Optional[Union[SSHTunnelForwarder, Forward]] = None
 
-    def start(self) -> Tuple[str, int, Optional[SSHTunnelForwarder]]:
+    def start(
+        self,
+    ) -> Tuple[str, int, Optional[Union[SSHTunnelForwarder, Forward]]]:
         """Start the tunnel.
 
         Returns:
@@ -444,16 +595,27 @@ class G5kTunnel:
 
         if "grid5000.fr" not in socket.getfqdn():
             logging.debug("Creating a tunnel to %s:%s", self.address, self.port)
-            self.tunnel = SSHTunnelForwarder(
+            if self.pooled:
+                forward = POOL.add(
+                    "access.grid5000.fr",
+                    get_api_username(),
+                    (self.address, self.port),
+                    local=("127.0.0.1", self.local_port),
+                )
+                self.tunnel = forward
+                local_address, local_port = forward.local_bind_address
+                return local_address, local_port, forward
+            tunnel = SSHTunnelForwarder(
                 "access.grid5000.fr",
                 ssh_username=get_api_username(),
                 remote_bind_address=(self.address, self.port),
                 local_bind_address=("127.0.0.1", self.local_port),
             )
-            if self.tunnel is not None:
-                self.tunnel.start()
-                local_address, local_port = self.tunnel.local_bind_address
-                return local_address, local_port, self.tunnel
+            self.tunnel = tunnel
+            if tunnel is not None:
+                tunnel.start()
+                local_address, local_port = tunnel.local_bind_address
+                return local_address, local_port, tunnel
         return self.address, self.port, None
 
     def close(self):
@@ -462,7 +624,11 @@ class G5kTunnel:
         Note that this won't wait for any connection to finish first."""
         if self.tunnel is not None:
             logging.debug("Closing the tunnel to %s:%s", self.address, self.port)
-            self.tunnel.stop(force=True)
+            if isinstance(self.tunnel, Forward):
+                self.tunnel.stop()
+            else:
+                self.tunnel.stop(force=True)
+            self.tunnel = None
 
     def __enter__(self):
         return self.start()
@@ -676,8 +842,11 @@ class G5kBase(Provider):
 
         if JOB_TYPE_DEPLOY in self.provider_conf.job_type:
             self.deploy()
-            self.wait_nodes()
-            self.dhcp_networks()
+            if not self.provider_conf.pipelined_deploy:
+                # in pipelined mode, this is done by deploy for each batch of
+                # deployed hosts
+                self.wait_nodes()
+                self.dhcp_networks()
         else:
             # TODO: let user opt out of this
             # even if they won't do much with enoslib in this case.
@@ -1029,16 +1198,32 @@ class G5k(G5kBase):
                 "to remote hosts."
             )
 
+        if self.provider_conf.pipelined_deploy:
+            self.deployed, self.undeployed = deploy_pipelined(
+                self.hosts, force_deploy, options, self._post_deploy
+            )
+            return
+
         self.deployed, self.undeployed = deploy_with_retries(
             self.hosts, force_deploy, options
         )
 
         # update sshable_hosts
-        for deployed in self.deployed:
+        self._add_sshable_hosts(self.deployed)
+
+    def _add_sshable_hosts(self, deployed_hosts: List[G5kHost]):
+        for deployed in deployed_hosts:
             _, t_fqdn = deployed.primary_network.translate([deployed.fqdn])[0]
             deployed.ssh_address = t_fqdn
             self.sshable_hosts += [deployed]
 
+    def _post_deploy(self, deployed_hosts: List[G5kHost]):
+        """Post-deployment steps run on a batch of deployed hosts."""
+        self._add_sshable_hosts(deployed_hosts)
+        wait_for([h.to_enoslib() for h in deployed_hosts])
+        if self.provider_conf.dhcp:
+            _run_dhcp(deployed_hosts)
+
 
 def _lookup_networks(network_id: str, networks: Iterable[G5kNetwork]) -> G5kNetwork:
     """What is the concrete network corresponding the network declared in the conf.
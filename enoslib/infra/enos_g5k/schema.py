@@ -28,6 +28,12 @@ SCHEMA_USER = {
             "(default: False)",
             "type": "boolean",
         },
+        "pipelined_deploy": {
+            "description": "Run the post-deployment steps (e.g. dhcp) on the nodes "
+            "of a site as soon as their deployment ends, instead of waiting for "
+            "all the deployments (deploy only) (default: False)",
+            "type": "boolean",
+        },
         "env_name": {
             "description": "The kadeploy3 environment to use (deploy only)",
             "type": "string",
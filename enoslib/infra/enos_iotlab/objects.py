@@ -1,7 +1,10 @@
+import asyncio
 import socket
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import iotlabcli.auth
+import paramiko
 import sshtunnel
 
 from enoslib.api import play_on
@@ -88,7 +91,8 @@ class IotlabSensor(Sensor):
         self.image: str = image
         self.iotlab_client: IotlabAPI = iotlab_client
 
-        self.user, self.passwd = iotlabcli.auth.get_user_credentials()
+        # the client already read the credentials
+        self.user, self.passwd = self.iotlab_client.user, self.iotlab_client.password
         self.exp_id = self.iotlab_client.get_job_id()
 
     def __repr__(self) -> str:
@@ -131,6 +135,65 @@ class IotlabSensor(Sensor):
         return d
 
 
+def _group_sensors(
+    sensors: Iterable[IotlabSensor], image: bool = False
+) -> List[Tuple[IotlabAPI, Optional[str], List[str]]]:
+    """Group the sensors by experiment and site (and image if set).
+
+    Returns:
+        A list of (client, image, addresses) (image is None if not grouped
+        by image).
+    """
+    groups: Dict[Tuple, Tuple[IotlabAPI, Optional[str], List[str]]] = {}
+    seen = set()
+    for sensor in sensors:
+        if sensor.address in seen:
+            continue
+        seen.add(sensor.address)
+        _image = sensor.image if image else None
+        key = (id(sensor.iotlab_client), sensor.exp_id, sensor.site, _image)
+        groups.setdefault(key, (sensor.iotlab_client, _image, []))[2].append(
+            sensor.address
+        )
+    return list(groups.values())
+
+
+def send_cmd_sensors(sensors: Iterable[IotlabSensor], cmd: str):
+    """
+    Sends the same command to many sensors at once
+
+    A single request is sent per experiment and site, instead of one per
+    sensor.
+
+    Args:
+        sensors: the sensors (e.g. ``roles["sensor"]``)
+        cmd: Command (start, stop, reset)
+    """
+    for client, _, addresses in _group_sensors(sensors):
+        client.send_cmd_node(cmd=cmd, nodes=addresses)
+
+
+def flash_sensors(sensors: Iterable[IotlabSensor], image: Optional[str] = None):
+    """
+    Flashes many sensors at once
+
+    A single request is sent per experiment, site and image, instead of one
+    per sensor.
+
+    Args:
+        sensors: the sensors (e.g. ``roles["sensor"]``)
+        image: Image filename, if None the image of each sensor is used
+            (sensors without image are skipped)
+    """
+    if image is not None:
+        for client, _, addresses in _group_sensors(sensors):
+            client.flash_nodes(image, addresses)
+        return
+    for client, _image, addresses in _group_sensors(sensors, image=True):
+        if _image is not None:
+            client.flash_nodes(_image, addresses)
+
+
 class IotlabNetwork(DefaultNetwork):
     """Iotlab network class."""
 
@@ -139,6 +202,187 @@ class IotlabNetwork(DefaultNetwork):
         self.roles = roles
 
 
+class _SerialBuffer:
+    """Bytes received on a serial connection, waiting to be read."""
+
+    def __init__(self):
+        self._data = bytearray()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def feed(self, data: bytes):
+        with self._cond:
+            self._data.extend(data)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def _wait_for(self, predicate, timeout: Optional[float]):
+        with self._cond:
+            self._cond.wait_for(lambda: predicate() or self._closed, timeout=timeout)
+
+    def read(self, size: int, timeout: Optional[float]) -> bytes:
+        self._wait_for(lambda: len(self._data) > 0, timeout)
+        with self._cond:
+            data = bytes(self._data[:size])
+            del self._data[:size]
+        return data
+
+    def readline(self, timeout: Optional[float]) -> bytes:
+        self._wait_for(lambda: b"\n" in self._data, timeout)
+        with self._cond:
+            end = self._data.find(b"\n") + 1
+            if end == 0:
+                # no complete line (timeout or closed), return what we have
+                end = len(self._data)
+            data = bytes(self._data[:end])
+            del self._data[:end]
+        return data
+
+
+class IotlabSerialTransport:
+    def __init__(
+        self,
+        site: str,
+        user: Optional[str] = None,
+        passwd: Optional[str] = None,
+        timeout: int = 5,
+    ):
+        """
+        A single SSH connection to a site frontend shared by many serial connections
+
+        Each serial connection is a channel of the SSH connection (instead of an
+        SSH tunnel per sensor). A single thread running an asyncio loop reads all
+        the channels and dispatches the received bytes to a buffer per sensor.
+        Opening the serial connection of 500 sensors thus costs a single SSH
+        handshake.
+
+        Args:
+            site: IoT-LAB site of the sensors (e.g. grenoble)
+            user: IoT-LAB user (read from the IoT-LAB credentials if None)
+            passwd: IoT-LAB password (read from the IoT-LAB credentials if None)
+            timeout: Timeout for the SSH connection
+
+        Examples:
+
+            .. code-block:: python
+
+                with IotlabSerialTransport("grenoble") as transport:
+                    serials = [transport.serial(s) for s in sensors]
+                    for serial in serials:
+                        serial.open_serial_conn()
+                    print([serial.readline() for serial in serials])
+                    for serial in serials:
+                        serial.close_serial_conn()
+        """
+        if user is None:
+            user, passwd = iotlabcli.auth.get_user_credentials()
+        self.site = site
+        self.user = user
+        self.passwd = passwd
+        self.timeout = timeout
+        self._client: Optional[paramiko.SSHClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def open(self):
+        """Opens the SSH connection and starts the reader thread."""
+        if self._client is not None:
+            return
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            f"{self.site}.iot-lab.info",
+            username=self.user,
+            password=self.passwd,
+            timeout=self.timeout,
+        )
+        self._client = client
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        logger.info("IotlabSerialTransport(%s): SSH connection opened", self.site)
+
+    def close(self):
+        """Stops the reader thread and closes the SSH connection."""
+        if self._loop is not None and self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+        if self._client is not None:
+            self._client.close()
+        self._client = None
+        self._loop = None
+        self._thread = None
+
+    def _call(self, fn, *args):
+        """Runs fn in the loop thread and waits for its result."""
+
+        async def _run():
+            return fn(*args)
+
+        assert self._loop is not None
+        return asyncio.run_coroutine_threadsafe(_run(), self._loop).result()
+
+    def _on_readable(self, channel, buffer: _SerialBuffer):
+        data = channel.recv(4096)
+        if data:
+            buffer.feed(data)
+        else:
+            # EOF
+            assert self._loop is not None
+            self._loop.remove_reader(channel.fileno())
+            buffer.close()
+
+    def open_channel(
+        self, address: str, port: int
+    ) -> Tuple[paramiko.Channel, _SerialBuffer]:
+        """Opens a channel to address:port (as seen from the frontend).
+
+        Returns:
+            The channel (for writing) and the buffer filled with the bytes
+            received on this channel.
+        """
+        self.open()
+        assert self._client is not None
+        transport = self._client.get_transport()
+        assert transport is not None
+        channel = transport.open_channel(
+            "direct-tcpip", (address, port), ("127.0.0.1", 0)
+        )
+        buffer = _SerialBuffer()
+        assert self._loop is not None
+        self._call(
+            self._loop.add_reader,
+            channel.fileno(),
+            self._on_readable,
+            channel,
+            buffer,
+        )
+        return channel, buffer
+
+    def close_channel(self, channel: paramiko.Channel, buffer: _SerialBuffer):
+        """Closes a channel opened with open_channel."""
+        if self._loop is not None:
+            self._call(self._loop.remove_reader, channel.fileno())
+        channel.close()
+        buffer.close()
+
+    def serial(self, sensor: IotlabSensor, **kwargs) -> "IotlabSerial":
+        """An interactive serial connection to sensor using this transport."""
+        return IotlabSerial(sensor, interactive=True, transport=self, **kwargs)
+
+    def __enter__(self) -> "IotlabSerialTransport":
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+
 class IotlabSerial:
     def __init__(
         self,
@@ -146,6 +390,7 @@ class IotlabSerial:
         serial_port: int = 20000,
         interactive: bool = False,
         timeout: int = 5,
+        transport: Optional[IotlabSerialTransport] = None,
     ):
         """
         Create a serial connection to a sensor in IoT-LAB testbed
@@ -164,13 +409,18 @@ class IotlabSerial:
             serial_port: serial port to connect to sensor
             interactive: set to true to use write/read methods
             timeout: Timeout for socket connection
+            transport: a transport shared with the other serial connections of
+                the site. If None, a dedicated SSH tunnel is used.
         """
         self.sensor = sensor
         self.interactive = interactive
         self.serial_port = serial_port
         self.timeout = timeout
+        self.transport = transport
         self._serial_tunnel: Optional[sshtunnel.SSHTunnelForwarder] = None
         self._serial_socket: Optional[socket.socket] = None
+        self._serial_channel: Optional[paramiko.Channel] = None
+        self._serial_buffer: Optional[_SerialBuffer] = None
         self._filename = f"~/.iot-lab/{self.sensor.exp_id}/log/{self.sensor.alias}_serial.log"  # noqa
 
     def open_serial_conn(self):
@@ -182,10 +432,26 @@ class IotlabSerial:
 
         The sshtunnel library will create a thread to do process the forwarded packets.
 
+        If a transport is set, a channel of the shared SSH connection is used
+        instead.
+
         Note:
             Remember to call close_serial_conn, in order to stop
             the thread and close the connection properly.
         """
+        if self.transport is not None:
+            self._serial_channel, self._serial_buffer = self.transport.open_channel(
+                self.sensor.address, self.serial_port
+            )
+            logger.info(
+                "IotlabSensor(%s): Opening channel for serial connection: "
+                "server (%s) remote (%s:%s)",
+                self.sensor.alias,
+                self.sensor.site,
+                self.sensor.address,
+                self.serial_port,
+            )
+            return
 
         self._serial_tunnel = sshtunnel.SSHTunnelForwarder(
             self.sensor.site + ".iot-lab.info",
@@ -218,6 +484,12 @@ class IotlabSerial:
 
         Stops thread created by sshtunnel library.
         """
+        if self._serial_channel is not None and self.transport is not None:
+            assert self._serial_buffer is not None
+            self.transport.close_channel(self._serial_channel, self._serial_buffer)
+            self._serial_channel = None
+            self._serial_buffer = None
+
         if self._serial_socket:
             self._serial_socket.close()
             self._serial_socket = None
@@ -298,7 +570,9 @@ class IotlabSerial:
             return
 
         logger.info("IotlabSerial(%s): Writing: %s", self.sensor.alias, content)
-        if self._serial_socket is not None:
+        if self._serial_channel is not None:
+            self._serial_channel.sendall(content.encode())
+        elif self._serial_socket is not None:
             self._serial_socket.sendall(content.encode())
         else:
             logger.error("Serial Socket is closed.")
@@ -319,13 +593,30 @@ class IotlabSerial:
             logger.error("Not in interactive mode, impossible to read serial")
             return data.decode()
 
-        if self._serial_socket is not None:
+        if self._serial_buffer is not None:
+            data = self._serial_buffer.read(size, self.timeout)
+        elif self._serial_socket is not None:
             try:
                 data = self._serial_socket.recv(size)
             except socket.timeout:
                 pass
         return data.decode()
 
+    def readline(self) -> str:
+        """
+        Reads a line from serial interface
+
+        Only available when using a shared transport.
+
+        Returns:
+            str: The line received (with its trailing newline) or what was
+            received before the timeout.
+        """
+        if self._serial_buffer is None:
+            logger.error("No shared transport, impossible to read a line")
+            return ""
+        return self._serial_buffer.readline(self.timeout).decode()
+
 
 class IotlabSniffer:
     def __init__(self, sensor: IotlabSensor, timeout: int = -1):
@@ -21,6 +21,7 @@ from enoslib.infra.enos_iotlab.objects import (
     IotlabHost,
     IotlabNetwork,
     IotlabSensor,
+    flash_sensors,
     ssh_enabled,
 )
 from enoslib.infra.provider import Provider
@@ -193,12 +194,7 @@ class Iotlab(Provider):
 
     def reset(self):
         """Reset all sensors."""
-        image_dict: Dict = {}
-        for sensor in self.sensors:
-            if sensor.image is not None:
-                image_dict.setdefault(sensor.image, []).append(sensor.address)
-        for image, sensors in image_dict.items():
-            self.client.flash_nodes(image, sensors)
+        flash_sensors(self.sensors)
 
     def _assert_clear_pool(self, pool_nodes):
         """Auxiliary method to verify that all nodes from the pool were used"""
@@ -8,6 +8,15 @@ NEUTRON_VERSION = "2"
 NOVA_VERSION = "2.1"
 
 DEFAULT_PREFIX = "enos"
+
+# Maximum number of servers created concurrently
+MAX_WORKERS = 16
+# Polling of the servers status (exponential backoff, in seconds)
+POLL_INTERVAL_MIN = 2
+POLL_INTERVAL_MAX = 30
+# Servers still missing from the listing after this time (in seconds) are
+# considered undeployed (newly created servers may be listed a bit later)
+MISSING_SERVER_TIMEOUT = 300
 # These are private resources
 NETWORK_NAME = f"{DEFAULT_PREFIX}-network"
 ROUTER_NAME = f"{DEFAULT_PREFIX}-router"
@@ -24,6 +24,7 @@ import logging
 import os
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
 from operator import itemgetter
 from typing import (
@@ -55,7 +56,11 @@ from .configuration import Configuration, MachineConfiguration
 from .constants import (
     DEFAULT_PREFIX,
     GLANCE_VERSION,
+    MAX_WORKERS,
+    MISSING_SERVER_TIMEOUT,
     NOVA_VERSION,
+    POLL_INTERVAL_MAX,
+    POLL_INTERVAL_MIN,
     ROUTER_NAME,
     SECGROUP_NAME,
 )
@@ -284,26 +289,46 @@ def set_free_floating_ip(env: Mapping, server_id):
 def wait_for_servers(session, servers: Collection) -> Tuple[List, List]:
     """Wait for the servers to be ready.
 
+    The status of all the servers is polled with a single request (with an
+    exponential backoff between two polls). A server in ERROR is undeployed.
+    A server missing from the listing is polled again, during at most
+    MISSING_SERVER_TIMEOUT seconds.
+
     Note(msimonin): we don't guarantee the SSH connection to be ready.
     """
     nclient = nova.Client(
         NOVA_VERSION, session=session, region_name=os.environ["OS_REGION_NAME"]
     )
+    ids = {server.id for server in servers}
+    interval = POLL_INTERVAL_MIN
+    start = time.monotonic()
     while True:
         deployed = []
         undeployed = []
+        # NOTE: the name is a regex in nova, this matches all our servers
+        current = {
+            s.id: s
+            for s in nclient.servers.list(search_opts={"name": DEFAULT_PREFIX})
+            if s.id in ids
+        }
+        # the listing is eventually consistent
+        timed_out = time.monotonic() - start >= MISSING_SERVER_TIMEOUT
         for server in servers:
-            c = nclient.servers.get(server.id)
-            if c.addresses != {} and c.status == "ACTIVE":
-                deployed.append(server)
-            if c.status == "ERROR":
+            c = current.get(server.id)
+            if c is None:
+                if timed_out:
+                    undeployed.append(server)
+            elif c.status == "ERROR":
                 undeployed.append(server)
+            elif c.addresses != {} and c.status == "ACTIVE":
+                deployed.append(c)
         logger.info("[nova]: Polling the Deployment")
         logger.info("[nova]: %s deployed servers", len(deployed))
         logger.info("[nova]: %s undeployed servers", len(undeployed))
         if len(deployed) + len(undeployed) >= len(servers):
             break
-        time.sleep(3)
+        time.sleep(interval)
+        interval = min(2 * interval, POLL_INTERVAL_MAX)
     return deployed, undeployed
 
 
@@ -350,6 +375,21 @@ def check_servers(
         raise Exception(f"Only {len(servers)}/{wanted} servers found")
 
     # starting the servers
+    # resolve the images and flavors once
+    images = {m.image: check_glance(session, m.image) for m in machines}
+    flavor_ids: Dict[str, Any] = {}
+
+    def _flavor(machine: MachineConfiguration):
+        if isinstance(flavors, str):
+            name = flavors
+        else:
+            flavor_to_id, _ = flavors
+            name = flavor_to_id[machine.flavour]
+        if name not in flavor_ids:
+            flavor_ids[name] = nclient.flavors.find(name=name)
+        return flavor_ids[name]
+
+    to_create = []
     total = 0
     for machine in machines:
         number = machine.number
@@ -358,29 +398,31 @@ def check_servers(
         logger.info("[nova]: for roles %s", roles)
         logger.info("[nova]: with extra hints %s", scheduler_hints)
         for _ in range(number):
-            flavor = machine.flavour
-            if isinstance(flavors, str):
-                flavor = flavors
-            else:
-                flavor_to_id, _ = flavors
-                flavor = flavor_to_id[flavor]
-
             if scheduler_hints:
                 _scheduler_hints = scheduler_hints[total % len(scheduler_hints)]
             else:
                 _scheduler_hints = []
 
-            server = nclient.servers.create(
-                name="-".join([DEFAULT_PREFIX, extra_prefix, str(total)]),
-                image=check_glance(session, machine.image),
-                flavor=nclient.flavors.find(name=flavor),
-                nics=[{"net-id": network["id"]}] if network is not None else None,
-                key_name=key_name,
-                security_groups=[SECGROUP_NAME],
-                scheduler_hints=_scheduler_hints,
+            to_create.append(
+                dict(
+                    name="-".join([DEFAULT_PREFIX, extra_prefix, str(total)]),
+                    image=images[machine.image],
+                    flavor=_flavor(machine),
+                    nics=[{"net-id": network["id"]}] if network is not None else None,
+                    key_name=key_name,
+                    security_groups=[SECGROUP_NAME],
+                    scheduler_hints=_scheduler_hints,
+                )
             )
-            servers.append(server)
             total = total + 1
+
+    if not to_create:
+        return servers
+    # the requests are sent concurrently, the servers are kept in order
+    with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(to_create))) as pool:
+        servers.extend(
+            pool.map(lambda kwargs: nclient.servers.create(**kwargs), to_create)
+        )
     return servers
 
 
@@ -15,7 +15,7 @@ import enoslib.infra.enos_g5k.provider as g5kprovider
 from enoslib.api import run_ansible
 from enoslib.config import get_config
 from enoslib.infra.enos_g5k import g5k_api_utils
-from enoslib.infra.enos_g5k.objects import G5kEnosSubnetNetwork
+from enoslib.infra.enos_g5k.objects import G5kEnosSubnetNetwork, IPMacPool
 from enoslib.infra.enos_g5k.utils import inside_g5k
 from enoslib.objects import Host, Roles
 
@@ -97,17 +97,18 @@ def mac_range(
     to_skip = skip
     _g5k_subnets = sorted(g5k_subnets, key=operator.attrgetter("network"))
     for g5k_subnet in _g5k_subnets:
-        it_mac = g5k_subnet.free_macs
+        # macs are computed arithmetically from the subnet (the pool is only
+        # an index over it), so skipping doesn't enumerate the addresses
         # we always skip the first one as this could not be a regular address
         # e.g 10.158.0.0
-        next(iter(it_mac))
-        emitted = False
-        for mac in itertools.islice(it_mac, to_skip, None, step):
+        pool = IPMacPool([str(g5k_subnet.network)], skip=1)
+        if to_skip >= len(pool):
+            to_skip -= len(pool) + 1
+            continue
+        for index in range(to_skip, len(pool), step):
             # yield EUI(mac, dialect=mac_unix_expanded)
+            _, mac = pool[index]
             yield mac
-            emitted = True
-        if not emitted:
-            to_skip -= len(list(g5k_subnet.free_macs))
     return
 
 
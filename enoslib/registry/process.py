@@ -1,3 +1,4 @@
+import json
 import logging
 import random
 import signal
@@ -27,7 +28,13 @@ from enoslib.log import DisableLogging
 from enoslib.objects import Host, Roles, RolesLike
 from enoslib.utils import _hostslike_to_roles
 
-from .utils import State, check_args, check_cron_date
+from .utils import (
+    REMOTE_TIMELINE_DIR,
+    TIMELINE_AGENT_PATH,
+    State,
+    check_args,
+    check_cron_date,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -180,6 +187,122 @@ def _build_hosts_with_extra(processes: List[ProcessGroup]) -> List[Host]:
     return list(hosts)
 
 
+def start_timelines(timelines: Dict[Host, List[Dict]], key: str) -> str:
+    """Ship some timelines of commands and start executing them on the hosts.
+
+    The timeline of each host is run by an on-node executor (see
+    :py:mod:`enoslib.registry.timeline_agent`) that starts every command at its
+    date. All the timelines are shipped and started in one single play.
+
+    Args:
+        timelines: for each host the list of events to run there. An event is a
+            dict with at least the date (``at``, a timestamp) and the shell
+            command (``cmd``) to run.
+        key: identifier of the timelines (used to name the remote files)
+
+    Returns:
+        The remote path of the report written by the executors
+    """
+    # the hosts are left untouched, their timeline is given by alias
+    extra_vars = dict(
+        enoslib_timelines={host.alias: timeline for host, timeline in timelines.items()}
+    )
+    first = min(
+        (event["at"] for timeline in timelines.values() for event in timeline),
+        default=None,
+    )
+    timeline_path = f"{REMOTE_TIMELINE_DIR}/{key}.json"
+    report_path = f"{REMOTE_TIMELINE_DIR}/{key}.report.json"
+    agent_path = f"{REMOTE_TIMELINE_DIR}/{TIMELINE_AGENT_PATH.name}"
+    with actions(roles=list(timelines.keys()), extra_vars=extra_vars) as p:
+        p.file(
+            path=REMOTE_TIMELINE_DIR,
+            state="directory",
+            task_name="Creating the timeline directory",
+        )
+        p.copy(
+            src=str(TIMELINE_AGENT_PATH),
+            dest=agent_path,
+            task_name="Shipping the timeline executor",
+        )
+        p.copy(
+            content="{{ enoslib_timelines[inventory_hostname] | to_json }}",
+            dest=timeline_path,
+            task_name="Shipping the timeline",
+        )
+        p.shell(
+            f"python3 {agent_path} {timeline_path} {report_path}",
+            background=True,
+            task_name="Starting the timeline executor",
+        )
+    if first is not None and time.time() > first:
+        logger.warning(
+            "The timelines were started %.1fs after their first event, "
+            "the first events are late",
+            time.time() - first,
+        )
+    return report_path
+
+
+def collect_timeline_reports(
+    hosts: List[Host], report_path: str, wait: bool = False, timeout: float = 60
+) -> List[Dict]:
+    """Collect the reports of the on-node executors.
+
+    A warning is logged for the hosts whose report can't be read (or, when
+    waiting, isn't finished at the deadline): their events are missing.
+
+    Args:
+        hosts: the hosts to collect the reports from
+        report_path: the remote path of the report (see
+            :py:func:`start_timelines`)
+        wait: wait until all the commands of the timelines have ended.
+            Otherwise, the current state of the reports is returned.
+        timeout: maximal time to wait for the reports (in seconds, when
+            waiting)
+
+    Returns:
+        The events of the timelines (sorted by date) augmented with the host
+        alias, the actual start/end dates and return code of the commands.
+    """
+    reports: List[Dict] = []
+    deadline = time.time() + timeout
+    while hosts:
+        with DisableLogging(level=logging.ERROR):
+            with config_context(ansible_stdout="noop"):
+                results = run_command(
+                    f"cat {report_path}",
+                    task_name="Collecting the timeline reports",
+                    roles=hosts,
+                    gather_facts=False,
+                    on_error_continue=True,
+                )
+        # hosts without any result (e.g unreachable) are missing as well
+        pending = {h.alias for h in hosts}
+        for r in results:
+            if r.status == "FAILED" or r.rc != 0 or r.stdout == "":
+                continue
+            report = json.loads(r.stdout)
+            if wait and not report["finished"]:
+                continue
+            pending.discard(r.host)
+            for event in report["events"]:
+                event.pop("cmd", None)
+                event.update(host=r.host)
+                reports.append(event)
+        hosts = [h for h in hosts if h.alias in pending]
+        if not wait or time.time() >= deadline:
+            break
+        if hosts:
+            time.sleep(1)
+    if hosts:
+        logger.warning(
+            "No (complete) timeline report from %s",
+            ", ".join(str(h.alias) for h in hosts),
+        )
+    return sorted(reports, key=lambda event: event["at"])
+
+
 class ProcessRegistry:
     def __init__(
         self,
@@ -192,6 +315,8 @@ class ProcessRegistry:
         self.roles = roles if roles else None
         # computed
         self.size = 0
+        # last schedule handed to the on-node executors (see kill_incr_on_node)
+        self._kill_schedule: Optional[Dict] = None
 
     def __str__(self) -> str:
         """
@@ -271,8 +396,9 @@ class ProcessRegistry:
 
         # if in self.processes but not in the refreshed one,
         # than the process is dead
+        alive_keys = {(p.group, p.host) for p in alive_processes}
         for p in self.processes:
-            if p not in alive_processes:
+            if (p.group, p.host) not in alive_keys:
                 p.set_dead()
                 refreshed_registry.append(p)
 
@@ -286,9 +412,11 @@ class ProcessRegistry:
         registry = ProcessRegistry()
         registry.glob = self.glob
         registry.roles = hosts
+        processes_by_host: Dict[Host, List[ProcessGroup]] = {}
+        for p in self.processes:
+            processes_by_host.setdefault(p.host, []).append(p)
         for h in hosts:
-            plist = [p for p in self.processes if p.host == h]
-            registry.append(plist)
+            registry.append(processes_by_host.get(h, []))
 
         registry.size = len(registry.processes)
 
@@ -303,6 +431,9 @@ class ProcessRegistry:
         _roles = _hostslike_to_roles(roles)
 
         assert _roles is not None
+        hosts_by_address = {
+            item.address: item for key in _roles.keys() for item in _roles[key]
+        }
         processes = []
         # retreive all processes following a regexp and format
         # the ouput such that we obtain the pid, the command and the name
@@ -346,11 +477,7 @@ class ProcessRegistry:
                 group = Path(path).stem.replace(_enoslib_cgroup(""), "")
                 address = r.host
                 # find the host back
-                for key in _roles.keys():
-                    for item in _roles[key]:
-                        if address == item.address:
-                            host = item
-                            break
+                host = hosts_by_address[address]
                 # set to alive by default
                 s = State.DEAD
                 if pids:
@@ -414,6 +541,106 @@ class ProcessRegistry:
             if _n != _nkill - 1:
                 time.sleep(interval.total_seconds())
 
+    def kill_incr_on_node(
+        self,
+        signum: int = signal.SIGINT,
+        number: int = sys.maxsize,
+        interval: timedelta = timedelta(seconds=0),
+        start_in: timedelta = timedelta(seconds=10),
+    ) -> List[Dict]:
+        """
+        Kills incrementally and randomly n process(es) using an on-node executor.
+
+        Unlike :py:meth:`kill_incr`, the whole kill schedule is computed
+        beforehand and shipped in one batch to each involved host. A small
+        executor running on the hosts then stops the process groups at the
+        scheduled dates. Hence intervals shorter than an Ansible round trip
+        are honored. The actual kill dates can be retrieved afterwards using
+        :py:meth:`collect_kill_reports`.
+
+        Args:
+            signum : the signal constant to send with the kills
+            number : the number of processes to kill (>0)
+            interval : a datetime.timedelta object to specify the time
+                       between the kills (>=0sec)
+            start_in : a datetime.timedelta object to specify the delay before
+                       the first kill. It must leave enough time to ship the
+                       schedule to the hosts.
+
+        Returns:
+            The schedule as a list of dict (group, host alias, date as a
+            timestamp).
+        """
+        check_args(
+            signum=signum,
+            number=number,
+            interval=interval,
+            start_in=start_in,
+        )
+
+        alive_registry = self.get_alive_processes()
+        _processes = alive_registry.processes
+        _nkill = min(number, len(_processes))
+        victims = random.sample(_processes, _nkill)
+
+        start = time.time() + start_in.total_seconds()
+        key = f"kill_{int(start * 1000)}"
+        schedule = []
+        timelines: Dict[Host, List[Dict]] = {}
+        for _n, _p in enumerate(victims):
+            at = start + _n * interval.total_seconds()
+            schedule.append(dict(group=_p.group, host=_p.host.alias, at=at))
+            timelines.setdefault(_p.host, []).append(
+                dict(group=_p.group, at=at, cmd=cg_stop(_p.group))
+            )
+        if not victims:
+            return schedule
+
+        report_path = start_timelines(timelines, key)
+        self._kill_schedule = dict(
+            report=report_path,
+            hosts=list(timelines.keys()),
+            end=schedule[-1]["at"],
+        )
+        return schedule
+
+    def collect_kill_reports(
+        self, wait: bool = True, timeout: float = 60
+    ) -> List[Dict]:
+        """
+        Collects the reports of the last :py:meth:`kill_incr_on_node`.
+
+        The killed processes are set to State.DEAD.
+
+        Args:
+            wait : wait for the end of the schedule before collecting the
+                   reports. Otherwise, only the kills already done are
+                   reported.
+            timeout : maximal time to wait for the reports after the end of
+                      the schedule (in seconds)
+
+        Returns:
+            The kills done as a list of dict (group, host alias, scheduled
+            date, actual start/end dates and return code of the kill).
+        """
+        if self._kill_schedule is None:
+            raise ValueError("No kill schedule to collect the reports from")
+        if wait:
+            time.sleep(max(self._kill_schedule["end"] - time.time(), 0))
+        reports = collect_timeline_reports(
+            self._kill_schedule["hosts"],
+            self._kill_schedule["report"],
+            wait=wait,
+            timeout=timeout,
+        )
+
+        processes = {(p.group, p.host.alias): p for p in self.processes}
+        for event in reports:
+            _p = processes.get((event["group"], event["host"]))
+            if _p is not None and event["rc"] == 0:
+                _p.set_dead()
+        return reports
+
     def kill_async(
         self,
         signum: int = signal.SIGINT,
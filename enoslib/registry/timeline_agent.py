@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""On-node executor of a timeline of shell commands.
+
+This file is shipped as is on the remote nodes and must only depend on the
+python3 standard library.
+
+Usage::
+
+    python3 timeline_agent.py <timeline> <report>
+
+The timeline is a json list of events, each event being a dictionary with at
+least the following keys:
+
+- ``at``: the date (unix timestamp) at which the command must be started
+- ``cmd``: the shell command to run
+
+Each command is started at its date (regardless of the duration of the
+previous ones) and the report (a json document) is updated after each start
+and termination. Its format is ``{"done": bool, "finished": bool, "events":
+[...]}`` where each event is the original event augmented with the actual
+``start`` and ``end`` dates and the return code ``rc`` of the command.
+``done`` is set once all the commands are started and ``finished`` once
+they all have ended.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def _dump(report_path, done, events, finished=False):
+    tmp = report_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(dict(done=done, finished=finished, events=events), f)
+    # atomic, a reader never sees a partial report
+    os.replace(tmp, report_path)
+
+
+def main(timeline_path, report_path):
+    with open(timeline_path) as f:
+        timeline = sorted(json.load(f), key=lambda event: event["at"])
+
+    events: list = []
+    running: list = []
+    _dump(report_path, False, events)
+    for event in timeline:
+        delay = event["at"] - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        start = time.time()
+        process = subprocess.Popen(
+            event["cmd"],
+            shell=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        record = dict(event, start=start, end=None, rc=None)
+        events.append(record)
+        running.append((process, record))
+        # collect the commands that already ended
+        for _process, _record in list(running):
+            rc = _process.poll()
+            if rc is not None:
+                _record.update(end=time.time(), rc=rc)
+                running.remove((_process, _record))
+        _dump(report_path, False, events)
+
+    _dump(report_path, True, events)
+    for process, record in running:
+        rc = process.wait()
+        record.update(end=time.time(), rc=rc)
+        _dump(report_path, True, events)
+    _dump(report_path, True, events, finished=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1], sys.argv[2])
@@ -1,9 +1,14 @@
 import logging
 from datetime import datetime, timedelta
 from enum import Enum
+from pathlib import Path
 from typing import Optional
 
 MAX_CRONJOB_LENGTH = 998
+# on-node executor of timed commands (standalone script)
+TIMELINE_AGENT_PATH = Path(__file__).parent / "timeline_agent.py"
+# where the timelines and their reports are stored on the remote nodes
+REMOTE_TIMELINE_DIR = "/tmp/__enoslib_timelines__"
 logger = logging.getLogger(__name__)
 
 
@@ -1,11 +1,28 @@
-from typing import Iterable, List
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import quote
 
+import requests
 from packaging.version import Version
 
-from enoslib.api import actions, run
+from enoslib.api import actions, distribute, run
+from enoslib.config import config_context, get_config
 from enoslib.objects import Host, Roles
 
 from ..service import Service
+from ..utils import _set_dir
+
+K3S_INSTALL_SCRIPT = "https://get.k3s.io"
+K3S_RELEASES = "https://github.com/k3s-io/k3s/releases/download"
+K3S_STABLE_CHANNEL = "https://update.k3s.io/v1-release/channels/stable"
+# timeout (in seconds) of the requests to the release servers
+# (for a download, it bounds the wait for each chunk)
+REQUEST_TIMEOUT = 60
+
+LOCAL_ARTIFACTS_DIR = Path("__enoslib_k3s__")
+# where the air-gap artifacts are stored on the nodes
+REMOTE_ARTIFACTS_DIR = "/opt/enoslib_k3s"
 
 GUARD_DASHBOARD = "k3s kubectl get service -n kubernetes-dashboard kubernetes-dashboard"
 
@@ -57,6 +74,11 @@ class K3s(Service):
         version: str = "latest",
         data_dir="/var/lib/rancher/k3s",
         dashboard=True,
+        airgap: bool = False,
+        artifacts_dir: Optional[str] = None,
+        arch: str = "amd64",
+        fanout: int = 4,
+        join_wave: int = 50,
     ):
         """Deploy a single K3s cluster.
 
@@ -97,6 +119,28 @@ class K3s(Service):
             dashboard : bool, optional (default: True)
                 Deploy the kubernetes dashboard. See:
                 https://github.com/kubernetes/dashboard/
+                (the manifest is downloaded by the master)
+            airgap : bool, optional (default: False)
+                Air-gapped installation (https://docs.k3s.io/installation/airgap):
+                the nodes don't download anything. The install script, the
+                k3s binary and the images are fetched once by the control
+                node and distributed along a tree: the first node receives
+                them from the control node then each node serves them (over
+                HTTP, see :py:func:`~enoslib.api.distribute`) to ``fanout``
+                peers.
+            artifacts_dir : str, optional
+                Local directory of the air-gap artifacts (``install.sh``,
+                ``k3s`` and ``k3s-airgap-images-<arch>.tar.zst``). The missing
+                ones are downloaded there (default to
+                ``__enoslib_k3s__/<version>``, "latest" being resolved to the
+                current release).
+            arch : str, optional (default: "amd64")
+                Architecture of the nodes (air-gapped installation)
+            fanout : int, optional (default: 4)
+                Number of peers a node serves the artifacts to, at each round
+                of the distribution
+            join_wave : int, optional (default: 50)
+                Number of agents joining the cluster concurrently
 
         Examples:
 
@@ -117,6 +161,11 @@ class K3s(Service):
         else:
             self.version = f"v{version}"
         self.dashboard = dashboard
+        self.airgap = airgap
+        self.artifacts_dir = artifacts_dir
+        self.arch = arch
+        self.fanout = fanout
+        self.join_wave = join_wave
 
     def _build_k3s_exec_options(self, is_server: bool) -> List[str]:
         options = []
@@ -139,9 +188,107 @@ class K3s(Service):
 
         return " ".join(env_vars) if env_vars else ""
 
+    def _release(self) -> str:
+        """The release to install ("latest" is resolved to its tag)."""
+        if self.version != "latest":
+            return self.version
+        # the stable channel redirects to the latest release
+        r = requests.head(
+            K3S_STABLE_CHANNEL, allow_redirects=False, timeout=REQUEST_TIMEOUT
+        )
+        r.raise_for_status()
+        return r.headers["location"].rsplit("/", 1)[-1]
+
+    def _artifacts(self, version: str) -> Dict[str, str]:
+        """The air-gap artifacts of a release (local name -> download url)."""
+        release = f"{K3S_RELEASES}/{quote(version)}"
+        binary = "k3s" if self.arch == "amd64" else f"k3s-{self.arch}"
+        images = f"k3s-airgap-images-{self.arch}.tar.zst"
+        return {
+            "install.sh": K3S_INSTALL_SCRIPT,
+            "k3s": f"{release}/{binary}",
+            images: f"{release}/{images}",
+        }
+
+    def _fetch_artifacts(self) -> Path:
+        """Download (once) the air-gap artifacts on the control node."""
+        release = None
+        if self.artifacts_dir is None:
+            # cached per release: a new "latest" doesn't reuse stale binaries
+            release = self._release()
+        local_dir = _set_dir(self.artifacts_dir, LOCAL_ARTIFACTS_DIR / str(release))
+        names = ["install.sh", "k3s", f"k3s-airgap-images-{self.arch}.tar.zst"]
+        if all((local_dir / name).exists() for name in names):
+            return local_dir
+        if release is None:
+            release = self._release()
+        for name, url in self._artifacts(release).items():
+            dest = local_dir / name
+            if dest.exists():
+                continue
+            tmp = dest.with_name(f".{name}.tmp")
+            with requests.get(url, stream=True, timeout=REQUEST_TIMEOUT) as r:
+                r.raise_for_status()
+                with tmp.open("wb") as f:
+                    for chunk in r.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+            os.replace(tmp, dest)
+        return local_dir
+
+    def _distribute_artifacts(self, local_dir: Path):
+        """Push the artifacts to all the nodes along a tree."""
+        for name in sorted(os.listdir(local_dir)):
+            if name.startswith(".") or not (local_dir / name).is_file():
+                continue
+            distribute(
+                local_dir / name,
+                f"{REMOTE_ARTIFACTS_DIR}/{name}",
+                self.roles,
+                fanout=self.fanout,
+            )
+        with actions(roles=self.roles, gather_facts=False) as p:
+            p.copy(
+                src=f"{REMOTE_ARTIFACTS_DIR}/k3s",
+                dest="/usr/local/bin/k3s",
+                remote_src=True,
+                mode="0755",
+            )
+            images_dir = f"{self.data_dir.rstrip('/')}/agent/images"
+            p.file(path=images_dir, state="directory")
+            images = f"k3s-airgap-images-{self.arch}.tar.zst"
+            p.copy(
+                src=f"{REMOTE_ARTIFACTS_DIR}/{images}",
+                dest=f"{images_dir}/{images}",
+                remote_src=True,
+            )
+
+    def _install_cmd(self, env: str) -> str:
+        if self.airgap:
+            return (
+                f"INSTALL_K3S_SKIP_DOWNLOAD=true {env} "
+                f"sh {REMOTE_ARTIFACTS_DIR}/install.sh"
+            )
+        return f"curl -sfL {K3S_INSTALL_SCRIPT} | {env} sh"
+
+    def _join_agents(self, env: str):
+        """Join the agents in waves of (at most) join_wave concurrent nodes."""
+        agents = list(self.roles["agent"])
+        forks = max(get_config()["ansible_forks"], min(self.join_wave, len(agents)))
+        for i in range(0, len(agents), self.join_wave):
+            with config_context(ansible_forks=forks), actions(
+                roles=agents[i : i + self.join_wave], gather_facts=False
+            ) as p:
+                p.shell(
+                    self._install_cmd(env),
+                    task_name="[agent] Deploying K3s on agent",
+                )
+
     def deploy(self):
-        with actions(roles=self.roles) as p:
-            p.apt(name="curl", state="present")
+        if self.airgap:
+            self._distribute_artifacts(self._fetch_artifacts())
+        else:
+            with actions(roles=self.roles) as p:
+                p.apt(name="curl", state="present")
 
         server_exec_options = self._build_k3s_exec_options(is_server=True)
         extra_cmd_server = self._build_env_variables(server_exec_options)
@@ -162,7 +309,7 @@ class K3s(Service):
 
         with actions(roles=self.roles["master"], gather_facts=False) as p:
             p.shell(
-                f"curl -sfL https://get.k3s.io | {extra_cmd_server} sh",
+                self._install_cmd(extra_cmd_server),
                 task_name="[master] Deploying K3s",
             )
         # Getting the token
@@ -177,12 +324,9 @@ class K3s(Service):
         extra_cmd_agent = self._build_env_variables(k3s_agent_exec_options)
 
         token = result[0].stdout
-        with actions(roles=self.roles["agent"], gather_facts=False) as p:
-            cmd = f"{extra_cmd_agent} K3S_URL=https://{next(iter(self.master)).address}:6443 K3S_TOKEN={token} sh"  # noqa
-            p.shell(
-                f"curl -sfL https://get.k3s.io | {cmd}",
-                task_name="[agent] Deploying K3s on agent",
-            )
+        self._join_agents(
+            f"{extra_cmd_agent} K3S_URL=https://{next(iter(self.master)).address}:6443 K3S_TOKEN={token}"  # noqa
+        )
         if self.dashboard:
             with actions(roles=self.roles["master"], gather_facts=False) as p:
                 # deploy dashboard
@@ -1,9 +1,25 @@
+import csv
+import hashlib
+import logging
 import os
+import shlex
+import tarfile
+import tempfile
 import time
 from pathlib import Path
-from typing import Dict, Iterable, List, MutableMapping, Optional
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
-from enoslib.api import __python3__, actions, external_pip_deps
+from enoslib.api import __python3__, actions, external_pip_deps, run_command
+from enoslib.errors import EnosError
 from enoslib.html import (
     dict_to_html_foldable_sections,
     html_from_sections,
@@ -16,9 +32,80 @@ from enoslib.utils import get_address
 from ..service import Service
 from ..utils import _set_dir
 
+logger = logging.getLogger(__name__)
+
 CURRENT_PATH: str = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
 LOCAL_OUTPUT_DIR: Path = Path("__enoslib_locust__")
 
+# written by the master (--csv enoslib --csv-full-history)
+STATS_HISTORY = "enoslib_stats_history.csv"
+# name of the rows aggregating all the requests in the stats history
+AGGREGATED = "Aggregated"
+
+StatsRow = Dict[str, Union[str, float, None]]
+
+# marker of a complete copy of the experiment directory
+COPY_COMPLETE = ".enoslib_complete"
+# marker of the installation of the requirements of the experiment
+REQUIREMENTS_INSTALLED = ".enoslib_requirements"
+
+
+def _digest_dir(path: Path) -> str:
+    """A digest of the content (relative paths and file contents) of a dir."""
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            f = Path(root) / name
+            h.update(str(f.relative_to(path)).encode())
+            h.update(b"\0")
+            h.update(hashlib.sha256(f.read_bytes()).digest())
+    return h.hexdigest()
+
+
+def _parse_value(value: str) -> Union[str, float, None]:
+    if value == "N/A":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _parse_stats(header: str, lines: List[str]) -> List[StatsRow]:
+    """Parse some lines of the stats history (numbers are converted)."""
+    return [
+        {k: _parse_value(v) for k, v in row.items()}
+        for row in csv.DictReader([header] + lines)
+    ]
+
+
+def _exceeds(
+    row: StatsRow,
+    max_response_time: Optional[float],
+    response_time_percentile: str,
+    max_failure_ratio: Optional[float],
+) -> bool:
+    """Whether an aggregated row of the stats history exceeds the thresholds."""
+    if row.get("Name") != AGGREGATED:
+        return False
+    latency = row.get(response_time_percentile)
+    if (
+        max_response_time is not None
+        and isinstance(latency, float)
+        and latency > max_response_time
+    ):
+        return True
+    requests = row.get("Total Request Count")
+    failures = row.get("Total Failure Count")
+    return (
+        max_failure_ratio is not None
+        and isinstance(requests, float)
+        and isinstance(failures, float)
+        and requests > 0
+        and failures / requests > max_failure_ratio
+    )
+
 
 class Locust(Service):
 
@@ -72,7 +159,9 @@ class Locust(Service):
             workers: list of :py:class:`~enoslib.objects.Host` where the workers will
                     be installed
             worker_density: number of worker per node to start
-                (max 1 per CPU core seems reasonable)
+                (max 1 per CPU core seems reasonable). The workers of a node
+                are started by a single process and pinned to the CPU cores
+                (in a round-robin fashion, if taskset is available).
             networks: network role on which master, agents and targeted hosts
                      are deployed
             local_expe_dir: path to local directory containing all your Locust code.
@@ -102,6 +191,8 @@ class Locust(Service):
         # create a separated working dir for each instance of the service
         self.bench_id = str(int(time.time()))
         self.remote_working_dir = os.path.join(remote_working_dir, self.bench_id)
+        # the experiment dirs are shared by the instances (content-addressed)
+        self.remote_expe_dir = os.path.join(remote_working_dir, "expe")
         if priors is None:
             self.priors = [__python3__]
         else:
@@ -127,6 +218,10 @@ class Locust(Service):
 
         self.environment = environment if environment is not None else {}
 
+        # stats history streamed during the last headless run
+        self.history: List[StatsRow] = []
+        self.stopped_early = False
+
     def info(self) -> Dict:
         d: Dict = dict(self.__dict__)
         d.update(ui=f"{self.master_ip}:8089")
@@ -232,30 +327,46 @@ class Locust(Service):
                 task_name=f"Running locust ({locustpath}) on master...",
             )
 
-        with actions(
-            pattern_hosts="agent", roles=self.roles, extra_vars=self.extra_vars
-        ) as p:
-            for i in range(self.worker_density):
-                p.shell(
-                    (
-                        "nohup locust "
-                        f"-f {locustpath} "
-                        "--worker "
-                        f"--master-host={self.master_ip} "
-                        f"--logfile={self.remote_working_dir}/locust-worker-{i}.log &"
-                    ),
-                    environment=environment,
-                    chdir=self.remote_working_dir,
-                    task_name=(
-                        f"Running({locustpath}) on agents"
-                        f"(master at {self.master_ip})..."
-                    ),
-                )
+        self._start_workers(locustpath, environment)
 
-    def run_headless(self):
+    def run_headless(
+        self,
+        poll_interval: float = 5,
+        stop_when: Optional[Callable[[StatsRow], bool]] = None,
+        max_response_time: Optional[float] = None,
+        response_time_percentile: str = "95%",
+        max_failure_ratio: Optional[float] = None,
+    ):
         """Run locust headless
 
         see https://docs.locust.io/en/stable/running-without-web-ui.html
+
+        The stats history of the master is streamed to the local
+        ``backup_dir`` during the run (every poll_interval seconds) and is
+        available in :py:attr:`history` (see also :py:meth:`stats`).
+        The benchmark can be stopped early when the new rows of the history
+        exceed some thresholds.
+
+        Args:
+            poll_interval: seconds between two retrievals of the stats
+            stop_when: stop the benchmark as soon as this returns True for a
+                new row of the stats history (the keys are the columns of
+                the locust's ``_stats_history.csv``)
+            max_response_time: stop the benchmark as soon as the aggregated
+                response time (ms) at response_time_percentile exceeds this
+            response_time_percentile: the percentile column to use with
+                max_response_time
+            max_failure_ratio: stop the benchmark as soon as the aggregated
+                ratio of failed requests exceeds this
+
+        Examples:
+
+            .. code-block:: python
+
+                # abort if the 95th percentile goes above 500ms or 5% of the
+                # requests fail
+                locust.run_headless(max_response_time=500, max_failure_ratio=0.05)
+                df = locust.stats()
         """
 
         environment: Dict = dict(**self.environment)
@@ -275,6 +386,7 @@ class Locust(Service):
                 f"--spawn-rate {self.spawn_rate} "
                 f"--run-time {str(self.run_time)}s "
                 "--csv enoslib "
+                "--csv-full-history "
                 f"--logfile={self.remote_working_dir}/locust-master.log &"
             )
             p.shell(
@@ -286,54 +398,146 @@ class Locust(Service):
             # record the exact master command
             p.copy(dest=f"{self.remote_working_dir}/cmd", content=cmd)
 
+        self._start_workers(locustpath, environment)
+
+        def should_stop(row: StatsRow) -> bool:
+            if stop_when is not None and stop_when(row):
+                return True
+            return _exceeds(
+                row, max_response_time, response_time_percentile, max_failure_ratio
+            )
+
+        self._stream_stats(poll_interval, should_stop)
+
+    def _poll_stats(self, consumed: int) -> Tuple[bool, List[str]]:
+        """Whether the master is still running and the lines after consumed."""
+        # the brackets prevent pgrep from matching this command
+        logfile = f"{self.remote_working_dir}/locust-master.log"
+        cmd = (
+            f"if pgrep -f '[-]-logfile={logfile}' > /dev/null; "
+            "then echo running; else echo done; fi; "
+            f"tail -n +{consumed + 1} {self.remote_working_dir}/{STATS_HISTORY} "
+            "2> /dev/null || true"
+        )
+        result = run_command(
+            cmd,
+            roles=self.master,
+            extra_vars=self.extra_vars,
+            task_name="Polling the locust stats...",
+        )[0]
+        status, *lines = result.stdout.splitlines()
+        return status == "running", lines
+
+    def _stream_stats(self, poll_interval: float, should_stop: Callable):
+        self.history = []
+        self.stopped_early = False
+        local_history = self.backup_dir / self.bench_id / STATS_HISTORY
+        local_history.parent.mkdir(parents=True, exist_ok=True)
+        local_history.write_text("")
+        header: Optional[str] = None
+        consumed = 0
+        deadline = time.time() + 2 * self.run_time
+        running = True
+        while running:
+            time.sleep(poll_interval)
+            running, lines = self._poll_stats(consumed)
+            if running and lines:
+                # the last line may be partially written
+                lines = lines[:-1]
+            consumed += len(lines)
+            with local_history.open("a") as f:
+                f.writelines(f"{line}\n" for line in lines)
+            if header is None and lines:
+                header, *lines = lines
+            if header is None:
+                rows = []
+            else:
+                rows = _parse_stats(header, lines)
+            self.history.extend(rows)
+            if running and any(should_stop(row) for row in rows):
+                logger.info("Stopping the benchmark early (thresholds exceeded)")
+                self.stopped_early = True
+                self.destroy()
+                return
+            if running and time.time() > deadline:
+                raise EnosError("Timeout while waiting for the benchmark completion")
+
+    def stats(self):
+        """The stats history of the last headless run as a pandas DataFrame."""
+        import pandas
+
+        return pandas.DataFrame(self.history)
+
+    def _workers_cmd(self, locustpath: str) -> str:
+        """A command starting all the workers of a node.
+
+        A single (detached) shell forks the workers and waits for them. Each
+        worker is pinned to a CPU core (round-robin) if taskset is available.
+        """
+        script = (
+            "n=$(nproc); "
+            f"for i in $(seq 0 {self.worker_density - 1}); do "
+            "if command -v taskset > /dev/null; "
+            'then pin="taskset -c $((i % n))"; else pin=""; fi; '
+            "LOCUST_WORKER_LOCAL_ID=locust-worker-$i $pin locust "
+            f"-f {locustpath} "
+            "--worker "
+            f"--master-host={self.master_ip} "
+            f"--logfile={self.remote_working_dir}/locust-worker-$i.log & "
+            "done; wait"
+        )
+        return f"nohup setsid sh -c {shlex.quote(script)} > /dev/null 2>&1 &"
+
+    def _start_workers(self, locustpath: str, environment: MutableMapping):
         with actions(
             pattern_hosts="agent", roles=self.roles, extra_vars=self.extra_vars
         ) as p:
-            for i in range(self.worker_density):
-                worker_local_id = f"locust-worker-{i}"
-                environment.update(LOCUST_WORKER_LOCAL_ID=worker_local_id)
-                p.shell(
-                    (
-                        "nohup locust "
-                        f"-f {locustpath} "
-                        "--worker "
-                        f"--master-host={self.master_ip} "
-                        f"--logfile={self.remote_working_dir}/{worker_local_id}.log &"
-                    ),
-                    environment=environment,
-                    task_name=(
-                        f"Running locust ({locustpath})"
-                        f"on agents (master at {self.master_ip})..."
-                    ),
-                )
-        with actions(roles=self.master, extra_vars=self.extra_vars) as p:
-            # wait for the communication port between master and workers is closed
-            # don't spam the master so sleeping 5 sec between each check
-            p.wait_for(
-                host=self.master_ip,
-                port=5557,
-                state="stopped",
-                timeout=2 * self.run_time,
-                sleep=5,
-                task_name="Waiting benchmark completion...",
+            p.shell(
+                self._workers_cmd(locustpath),
+                environment=environment,
+                chdir=self.remote_working_dir,
+                task_name=(
+                    f"Running {self.worker_density} locust worker(s) ({locustpath}) "
+                    f"on agents (master at {self.master_ip})..."
+                ),
             )
 
     def __copy_experiment(self, expe_dir: str, locustfile: str) -> str:
-        src_dir = os.path.join(os.path.abspath(expe_dir), "")
-        remote_dir = os.path.join(self.remote_working_dir, expe_dir)
-        with actions(
-            pattern_hosts="all", roles=self.roles, extra_vars=self.extra_vars
-        ) as p:
-            p.copy(
-                src=src_dir,
-                dest=remote_dir,
-                mode="u=rw,g=r,o=r",
-                task_name="Copying the experiment directory into each hosts",
-            )
-            if os.path.exists(os.path.join(src_dir, "requirements.txt")):
-                p.pip(
-                    requirements=os.path.join(remote_dir, "requirements.txt"),
-                    task_name="Installing python deps",
+        """Copy the experiment directory on all the hosts.
+
+        The directory is stored under its digest: an unchanged experiment
+        isn't copied (nor are its requirements installed) again.
+        """
+        src_dir = Path(expe_dir).resolve()
+        remote_dir = os.path.join(self.remote_expe_dir, _digest_dir(src_dir))
+        with tempfile.TemporaryDirectory() as tmp:
+            archive = os.path.join(tmp, "expe.tar.gz")
+            with tarfile.open(archive, "w:gz") as tar:
+                tar.add(src_dir, arcname=".")
+            with actions(
+                pattern_hosts="all", roles=self.roles, extra_vars=self.extra_vars
+            ) as p:
+                p.file(path=remote_dir, state="directory")
+                p.unarchive(
+                    src=archive,
+                    dest=remote_dir,
+                    creates=os.path.join(remote_dir, COPY_COMPLETE),
+                    task_name="Copying the experiment directory into each hosts",
+                )
+                p.shell(
+                    f"touch {COPY_COMPLETE}",
+                    chdir=remote_dir,
+                    creates=os.path.join(remote_dir, COPY_COMPLETE),
                 )
+                if (src_dir / "requirements.txt").exists():
+                    installed = os.path.join(remote_dir, REQUIREMENTS_INSTALLED)
+                    p.stat(path=installed, register="enoslib_locust_requirements")
+                    skip = "not enoslib_locust_requirements.stat.exists"
+                    p.pip(
+                        requirements=os.path.join(remote_dir, "requirements.txt"),
+                        when=skip,
+                        task_name="Installing python deps",
+                    )
+                    p.file(path=installed, state="touch", when=skip)
         locustpath = os.path.join(remote_dir, locustfile)
         return locustpath
@@ -1,10 +1,15 @@
+import json
 import os
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Iterable, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import requests
 
 from enoslib.api import external_pip_deps, run_ansible
+from enoslib.errors import EnosError
 from enoslib.objects import Host, Network, Roles
-from enoslib.utils import get_address
+from enoslib.utils import forward_port, get_address
 
 from ..service import Service
 from ..utils import _set_dir, _to_abs
@@ -20,6 +25,27 @@ SERVICE_PATH: str = os.path.abspath(os.path.dirname(os.path.realpath(__file__)))
 LOCAL_OUTPUT_DIR_TIG: Path = Path("__enoslib_tig__")
 LOCAL_OUTPUT_DIR_TPG: Path = Path("__enoslib_tpg__")
 
+# (local) file holding the date of the last online backup of InfluxDB
+INFLUXDB_LAST_BACKUP = "influxdb-last-backup"
+# name of the task giving the date of an online backup of InfluxDB, as
+# recorded by Ansible (tasks of a role are prefixed with the role name)
+INFLUXDB_BACKUP_DATE_TASK = "influxdb : enoslib_backup_date"
+
+
+# maximal number of points per series in a Prometheus range query
+PROMETHEUS_MAX_POINTS = 10000
+# timeout (in seconds) of the requests to the collectors
+# (for a streamed response, it bounds the wait for each chunk)
+QUERY_TIMEOUT = 60
+
+Timestamp = Union[datetime, float]
+
+
+def _to_seconds(t: Timestamp) -> float:
+    if isinstance(t, datetime):
+        return t.timestamp()
+    return float(t)
+
 
 class TIGMonitoring(Service):
     def __init__(
@@ -170,28 +196,182 @@ class TIGMonitoring(Service):
         with external_pip_deps(roles=self._roles):
             run_ansible([_playbook], roles=self._roles, extra_vars=extra_vars)
 
-    def backup(self, backup_dir: Optional[str] = None):
+    def backup(self, backup_dir: Optional[str] = None, incremental: bool = False):
         """Backup the monitoring stack.
 
         Args:
             backup_dir (str): path of the backup directory to use.
                 Will be used instead of the one set in the constructor.
+            incremental: backup the database while it's running (no
+                collection gap). Only the data written since the previous
+                incremental backup is backed up and streamed (compressed) in
+                ``<backup_dir>/influxdb-<date>`` (use ``influxd restore
+                -portable`` on each of them, in order, to restore the data).
+                Otherwise the database is stopped and its whole data
+                directory is archived and fetched.
         """
         _backup_dir = _set_dir(backup_dir, self.backup_dir, mkdir=True)
-        extra_vars = {
+        extra_vars: Dict = {
             "enos_action": "backup",
             "remote_working_dir": self.remote_working_dir,
             "backup_dir": str(_backup_dir),
         }
+        last_backup = _backup_dir / INFLUXDB_LAST_BACKUP
+        if incremental:
+            since = last_backup.read_text().strip() if last_backup.exists() else ""
+            extra_vars.update(backup_incremental=True, backup_since=since)
         extra_vars.update(self.extra_vars)
         _playbook = os.path.join(SERVICE_PATH, "monitoring.yml")
 
         with external_pip_deps(roles=self._roles["influxdb"]):
-            run_ansible(
+            results = run_ansible(
                 [_playbook],
                 roles=Roles(influxdb=self._roles["influxdb"]),
                 extra_vars=extra_vars,
             )
+        if incremental:
+            # the date (of the collector) the backup started at
+            (date,) = results.filter(task=INFLUXDB_BACKUP_DATE_TASK)
+            last_backup.write_text(date.stdout)
+
+    def _influx_rows(
+        self, query: str, database: str, chunk_size: int
+    ) -> Iterator[List[Dict]]:
+        _, port = self.collector_env["INFLUXDB_HTTP_BIND_ADDRESS"].split(":")
+        address = get_address(self.collector, self.networks)
+        with forward_port(self.collector, address, int(port)) as (host, local_port):
+            r = requests.get(
+                f"http://{host}:{local_port}/query",
+                params=dict(
+                    db=database,
+                    q=query,
+                    epoch="ms",
+                    chunked="true",
+                    chunk_size=str(chunk_size),
+                ),
+                stream=True,
+                timeout=QUERY_TIMEOUT,
+            )
+            r.raise_for_status()
+            # one json document per chunk
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                for result in json.loads(line).get("results", []):
+                    if "error" in result:
+                        raise EnosError(result["error"])
+                    rows: List[Dict] = []
+                    for series in result.get("series", []):
+                        columns = series["columns"]
+                        meta = dict(series.get("tags", {}), measurement=series["name"])
+                        rows.extend(
+                            dict(meta, **dict(zip(columns, values)))
+                            for values in series["values"]
+                        )
+                    if rows:
+                        yield rows
+
+    def query(self, query: str, database: str = "telegraf", chunk_size: int = 10000):
+        """Run an InfluxQL query on the collector and stream the result.
+
+        The query runs remotely: the result is retrieved (through an SSH
+        tunnel to the collector) in chunks of at most chunk_size points.
+        Requires pandas.
+
+        Args:
+            query: the InfluxQL query
+            database: the database to query
+            chunk_size: maximal number of points per chunk
+
+        Returns:
+            An iterator of pandas DataFrames (one per chunk). Each row has the
+            columns of the query, the tags of the series and a
+            ``measurement`` column. ``time`` is a timestamp in milliseconds.
+        """
+        import pandas
+
+        for rows in self._influx_rows(query, database, chunk_size):
+            yield pandas.DataFrame(rows)
+
+    @staticmethod
+    def range_query(
+        measurement: str,
+        start: Timestamp,
+        end: Timestamp,
+        fields: Optional[List[str]] = None,
+        every: Optional[str] = None,
+        aggregate: str = "mean",
+        where: Optional[str] = None,
+    ) -> str:
+        """Build an InfluxQL range query.
+
+        Args:
+            measurement: the measurement to query (e.g. ``cpu``)
+            start: start of the range (datetime or seconds since the epoch)
+            end: end of the range (datetime or seconds since the epoch)
+            fields: the fields to retrieve (default to all)
+            every: if set, downsample the points (e.g. ``1m``) on the server
+                side using the aggregate function
+            aggregate: the aggregate function to use when downsampling
+            where: an additional condition (e.g. ``"host" = 'foo'``)
+        """
+        if fields is None:
+            projection = "*" if every is None else f"{aggregate}(*)"
+        elif every is None:
+            projection = ", ".join(f'"{f}"' for f in fields)
+        else:
+            projection = ", ".join(f'{aggregate}("{f}") AS "{f}"' for f in fields)
+        conditions = [
+            f"time >= {int(_to_seconds(start) * 1000)}ms",
+            f"time < {int(_to_seconds(end) * 1000)}ms",
+        ]
+        if where is not None:
+            conditions.append(f"({where})")
+        query = (
+            f'SELECT {projection} FROM "{measurement}" WHERE {" AND ".join(conditions)}'
+        )
+        if every is not None:
+            query += f" GROUP BY time({every}), * fill(none)"
+        return query
+
+    def query_range(
+        self,
+        measurement: str,
+        start: Timestamp,
+        end: Timestamp,
+        fields: Optional[List[str]] = None,
+        every: Optional[str] = None,
+        aggregate: str = "mean",
+        where: Optional[str] = None,
+        **kwargs,
+    ):
+        """Stream the points of a measurement in a time range.
+
+        See :py:meth:`range_query` for the parameters and :py:meth:`query`
+        for the other keyword arguments and the result.
+
+        Examples:
+
+            .. code-block:: python
+
+                # 1 minute averages of the cpu usage of the last hour
+                now = time.time()
+                df = pandas.concat(
+                    tig.query_range(
+                        "cpu", now - 3600, now, fields=["usage_user"], every="1m"
+                    )
+                )
+        """
+        query = self.range_query(
+            measurement,
+            start,
+            end,
+            fields=fields,
+            every=every,
+            aggregate=aggregate,
+            where=where,
+        )
+        return self.query(query, **kwargs)
 
     def __exit__(self, *args):
         # special case here, backup will suspend the execution of the database
@@ -304,12 +484,17 @@ class TPGMonitoring(Service):
         with external_pip_deps(roles=self._roles):
             run_ansible([_playbook], roles=self._roles, extra_vars=extra_vars)
 
-    def backup(self, backup_dir: Optional[str] = None):
+    def backup(self, backup_dir: Optional[str] = None, incremental: bool = False):
         """Backup the monitoring stack.
 
         Args:
             backup_dir (str): path of the backup directory to use.
                 Will be used instead of the one set in the constructor.
+            incremental: stream the snapshot in ``<backup_dir>/snapshots/``
+                instead of archiving it. The blocks already retrieved with the
+                previous snapshot are hardlinked instead of being transferred
+                again: each snapshot is a complete Prometheus data directory
+                but only the new data is transferred.
         """
         _backup_dir = _set_dir(backup_dir, self.backup_dir, mkdir=True)
         extra_vars = {
@@ -319,6 +504,15 @@ class TPGMonitoring(Service):
             "collector_port": self.prometheus_port,
             "backup_dir": str(_backup_dir),
         }
+        if incremental:
+            snapshots = _backup_dir / "snapshots"
+            snapshots.mkdir(exist_ok=True)
+            # snapshot names start with their date
+            previous = sorted(p for p in snapshots.iterdir() if p.is_dir())
+            extra_vars.update(
+                backup_incremental=True,
+                backup_link_dest=str(previous[-1].resolve()) if previous else "",
+            )
         extra_vars.update(self.extra_vars)
         _playbook = os.path.join(SERVICE_PATH, "monitoring.yml")
 
@@ -329,6 +523,96 @@ class TPGMonitoring(Service):
                 extra_vars=extra_vars,
             )
 
+    def _prometheus_rows(
+        self,
+        query: str,
+        start: Timestamp,
+        end: Timestamp,
+        step: float,
+        labels: Optional[List[str]],
+        aggregate: str,
+    ) -> Iterator[List[Dict]]:
+        if labels is not None:
+            # server side projection
+            query = f"{aggregate} by ({', '.join(labels)}) ({query})"
+        address = get_address(self.collector, self.networks)
+        _start, _end = _to_seconds(start), _to_seconds(end)
+        window = step * PROMETHEUS_MAX_POINTS
+        with forward_port(self.collector, address, self.prometheus_port) as (
+            host,
+            local_port,
+        ):
+            # split the range to stay under the maximal number of points
+            # (this also bounds the size of each chunk)
+            while _start <= _end:
+                chunk_end = min(_start + window, _end)
+                r = requests.get(
+                    f"http://{host}:{local_port}/api/v1/query_range",
+                    params={
+                        "query": query,
+                        "start": str(_start),
+                        "end": str(chunk_end),
+                        "step": str(step),
+                    },
+                    timeout=QUERY_TIMEOUT,
+                )
+                r.raise_for_status()
+                result = r.json()
+                if result.get("status") != "success":
+                    raise EnosError(result.get("error", result))
+                rows = [
+                    dict(series["metric"], timestamp=t, value=float(v))
+                    for series in result["data"]["result"]
+                    for t, v in series["values"]
+                ]
+                if rows:
+                    yield rows
+                _start = chunk_end + step
+
+    def query_range(
+        self,
+        query: str,
+        start: Timestamp,
+        end: Timestamp,
+        step: float = 10,
+        labels: Optional[List[str]] = None,
+        aggregate: str = "avg",
+    ):
+        """Run a PromQL range query on the collector and stream the result.
+
+        The query runs remotely: the result is retrieved (through an SSH
+        tunnel to the collector) in chunks, one per sub range of
+        ``PROMETHEUS_MAX_POINTS`` steps. Requires pandas.
+
+        Args:
+            query: the PromQL query
+            start: start of the range (datetime or seconds since the epoch)
+            end: end of the range (datetime or seconds since the epoch)
+            step: resolution of the result in seconds (downsampling)
+            labels: if set, only keep these labels: the series are aggregated
+                by these labels on the server side
+            aggregate: the aggregation operator to use with labels
+
+        Returns:
+            An iterator of pandas DataFrames (one per chunk) with the labels
+            of the series, a ``timestamp`` (seconds) and a ``value`` column.
+
+        Examples:
+
+            .. code-block:: python
+
+                now = time.time()
+                df = pandas.concat(
+                    tpg.query_range(
+                        "cpu_usage_user", now - 3600, now, step=60, labels=["host"]
+                    )
+                )
+        """
+        import pandas
+
+        for rows in self._prometheus_rows(query, start, end, step, labels, aggregate):
+            yield pandas.DataFrame(rows)
+
     def __exit__(self, *args):
         # special case here, backup will suspend the execution of the database
         # and backup can occur.  we destroy afterwards
@@ -1,12 +1,17 @@
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Type, Union
+from uuid import uuid4
 
 from enoslib.api import actions, cg_start, cg_stop, cg_write
 from enoslib.html import convert_list_to_html_table, html_from_dict, html_from_sections
 from enoslib.objects import Host
-from enoslib.registry.process import ProcessRegistry
-from enoslib.registry.utils import check_cron_cmd
+from enoslib.registry.process import (
+    ProcessRegistry,
+    collect_timeline_reports,
+    start_timelines,
+)
+from enoslib.registry.utils import REMOTE_TIMELINE_DIR, check_cron_cmd
 
 from ..service import Service
 
@@ -135,18 +140,15 @@ class Planning:
 
     @property
     def duration(self):
-        events = sorted(self.events, key=lambda e: e.date)
-        return events[-1].date - events[0].date
+        return self.end - self.start
 
     @property
     def start(self):
-        events = sorted(self.events, key=lambda e: e.date)
-        return events[0].date
+        return min(e.date for e in self.events)
 
     @property
     def end(self):
-        events = sorted(self.events, key=lambda e: e.date)
-        return events[-1].date
+        return max(e.date for e in self.events)
 
     @property
     def until_end(self):
@@ -177,10 +179,7 @@ class Planning:
         """
         d: Dict[Host, List[Event]] = {}
         for event in self.events:
-            if d.get(event.host) is not None:
-                d[event.host].append(event)
-            else:
-                d[event.host] = [event]
+            d.setdefault(event.host, []).append(event)
         return d
 
     def check(self) -> None:
@@ -194,54 +193,64 @@ class Planning:
             StartEvent: (None, KillEvent),
             KillEvent: (StartEvent,),
         }
-        checked_ps: List[Tuple[str, Host]] = []
+        # group the event(s) related to a namespace in one pass
+        ns_events: Dict[Tuple[str, Host], List[Event]] = {}
         for event in self.events:
-            ns = event.name
-            host = event.host
-
-            ps = (ns, host)
-            if ps not in checked_ps:
-                checked_ps.append(ps)
-
-                # extract all event(s) related to a namespace
-                # and sort them chronologically
-                ns_list = [
-                    event
-                    for event in self.events
-                    if event.name == ns and event.host == host
-                ]
-                ns_list.sort(key=lambda event: event.date)
-
-                # Verify first event
-                if None not in transition[ns_list[0].__class__]:
+            ns_events.setdefault((event.name, event.host), []).append(event)
+
+        for ns_list in ns_events.values():
+            # sort them chronologically
+            ns_list.sort(key=lambda event: event.date)
+
+            # Verify first event
+            if None not in transition[ns_list[0].__class__]:
+                raise Exception(
+                    f"An error may occur with {ns_list[0].name}, "
+                    "the first scheduled event may not be allowed."
+                )
+
+            # Verify all the others event(s) if any
+            for n, event in enumerate(ns_list[1:], start=1):
+                if ns_list[n - 1].__class__ not in transition[event.__class__]:
                     raise Exception(
                         f"An error may occur with {event.name}, "
-                        "the first scheduled event may not be allowed."
+                        "please check the timeline of its event(s).\n"
+                        f"An event of type {event.__class__} can't come after "
+                        f"an event of type {ns_list[n - 1].__class__}."
                     )
 
-                # Verify all the others event(s) if any
-                for n, event in enumerate(ns_list[1:], start=1):
-                    if ns_list[n - 1].__class__ not in transition[event.__class__]:
-                        raise Exception(
-                            f"An error may occur with {event.name}, "
-                            "please check the timeline of its event(s).\n"
-                            f"An event of type {event.__class__} can't come after "
-                            f"an event of type {ns_list[n - 1].__class__}."
-                        )
+
+BACKENDS = ["cron", "agent"]
 
 
 class PlanningService(Service):
     """Execute and control processes according to a planning.
 
-    Scheduling of events use cronjobs on each of the target nodes.
+    Two backends are available to schedule the events on the target nodes:
+
+    - ``cron``: each event is a cronjob (minute granularity, the seconds are
+      handled with a ``sleep``). One task is run per event.
+    - ``agent``: the whole timeline of each node is uploaded in one file and a
+      lightweight executor running on the node starts each event at its date
+      (sub-second precision). The actual start date of each event is logged
+      and can be retrieved with :py:meth:`report`.
 
     Args:
         planning: optional.
             The planning to use
+        backend: the scheduling backend (``cron`` or ``agent``)
     """
 
-    def __init__(self, planning: Optional[Planning] = None) -> None:
+    def __init__(
+        self, planning: Optional[Planning] = None, backend: str = "cron"
+    ) -> None:
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, must be one of {BACKENDS}")
         self.planning = planning if planning is not None else Planning()
+        self.backend = backend
+        # identify the timelines of this service on the nodes (agent backend)
+        self._key = f"planning_{uuid4().hex[:8]}"
+        self._report_path: Optional[str] = None
 
     def add_event(self, e: Event) -> "PlanningService":
         """Schedule an event.
@@ -257,7 +266,7 @@ class PlanningService(Service):
 
     def _build_hosts_cmds(self) -> List[Host]:
         """Inject all the cron command descriptor in the host extra vars."""
-        hosts: List[Host] = []
+        hosts: Dict[Host, List[Dict]] = {}
 
         for event in self.planning.events:
             event_dict = event.to_dict()
@@ -265,20 +274,38 @@ class PlanningService(Service):
             check_cron_cmd(cmd=event_dict["cmd"])
 
             if event.host in hosts:
-                _index = hosts.index(event.host)
-                hosts[_index].extra["cmds"].append(event_dict)
+                hosts[event.host].append(event_dict)
             else:
-                hosts.append(event.host)
                 # cleanning to have at the end only the current cmds
-                hosts[-1].reset_extra()
-                hosts[-1].extra["cmds"] = [event_dict]
+                event.host.reset_extra()
+                event.host.extra["cmds"] = [event_dict]
+                hosts[event.host] = event.host.extra["cmds"]
 
-        return hosts
+        return list(hosts.keys())
+
+    def _build_hosts_timelines(self) -> Dict[Host, List[Dict]]:
+        """Build the timeline of each host (agent backend)."""
+        timelines: Dict[Host, List[Dict]] = {}
+        for event in self.planning.events:
+            timelines.setdefault(event.host, []).append(
+                dict(
+                    name=event.name,
+                    type=event.__class__.__name__,
+                    at=event.date.timestamp(),
+                    cmd=event.cmd,
+                )
+            )
+        return timelines
 
     def deploy(self) -> None:
         """
         Set all events / cronjobs of a planning.
         """
+        if self.backend == "agent":
+            self._report_path = start_timelines(
+                self._build_hosts_timelines(), self._key
+            )
+            return
         hosts = self._build_hosts_cmds()
         with actions(roles=hosts) as p:
             p.cron(
@@ -297,14 +324,26 @@ class PlanningService(Service):
         """
         Remove all events / cronjobs of a planning.
         """
-        # first remove all crons
-        hosts = self._build_hosts_cmds()
-        with actions(roles=hosts) as p:
-            p.cron(
-                name="Running specified command for {{ item.name }} at {{ item.date }}",
-                loop="{{ cmds }}",
-                state="absent",
-            )
+        if self.backend == "agent":
+            # first stop the executors
+            hosts = list(self._build_hosts_timelines().keys())
+            timeline_path = f"{REMOTE_TIMELINE_DIR}/{self._key}.json"
+            with actions(roles=hosts) as p:
+                # the brackets prevent pkill from matching its own shell
+                p.shell(
+                    f"pkill -f '[{timeline_path[0]}]{timeline_path[1:]}' || true",
+                    task_name="Stopping the timeline executor",
+                )
+        else:
+            # first remove all crons
+            hosts = self._build_hosts_cmds()
+            with actions(roles=hosts) as p:
+                p.cron(
+                    name="Running specified command for {{ item.name }} "
+                    "at {{ item.date }}",
+                    loop="{{ cmds }}",
+                    state="absent",
+                )
 
         # then build the status registry and kill the registry
         registry = self.status()
@@ -328,6 +367,24 @@ class PlanningService(Service):
         r = ProcessRegistry.build(f"{names_str}", roles=hosts)
         return r
 
+    def report(self) -> List[Dict]:
+        """Actual start dates of the events (agent backend only).
+
+        Returns:
+            The events already started as a list of dict (name, type, host
+            alias, scheduled date ``at``, actual ``start`` date and the
+            corresponding ``delay`` in seconds), sorted by date.
+        """
+        if self.backend != "agent":
+            raise ValueError("Reports are only available with the agent backend")
+        if self._report_path is None:
+            raise ValueError("The planning hasn't been deployed yet")
+        hosts = list(self._build_hosts_timelines().keys())
+        reports = collect_timeline_reports(hosts, self._report_path)
+        for event in reports:
+            event.update(delay=event["start"] - event["at"])
+        return reports
+
     def check(self) -> None:
         """Check for inconsistencies in the planning"""
         self.planning.check()
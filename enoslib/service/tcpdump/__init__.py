@@ -19,6 +19,9 @@ class TCPDump(Service):
         networks: Optional[Iterable[Network]] = None,
         options: str = "",
         backup_dir: Optional[Union[Path, str]] = None,
+        rotate_size: Optional[int] = None,
+        rotate_seconds: Optional[int] = None,
+        rotate_count: Optional[int] = None,
     ):
         """
         Monitor network traffic using tcpdump.
@@ -32,6 +35,13 @@ class TCPDump(Service):
         retrieved automatically when exiting and all the remaining tcpdump
         processes are killed.
 
+        The capture can be split in several files (segments) using the
+        ``rotate_*`` options. The pcap files can be streamed to the backup
+        directory with rsync (see :py:meth:`backup`, ``stream=True``): only the
+        new (or modified) files are transferred on each backup and
+        ``backup(stream=True, completed_only=True)`` retrieves the finished
+        segments while the capture goes on.
+
         Note that if networks is used, :py:func:`~enoslib.api.sync_info` must
         have been called before.
 
@@ -42,6 +52,15 @@ class TCPDump(Service):
             networks: monitor all interfaces that belong to one of those networks
             options: extra options to pass to tcpdump command line.
             backup_dir: path to a local directory where the pcap files will be saved
+            rotate_size: start a new file when the current one is larger
+                than this size (in millions of bytes, tcpdump's ``-C``)
+            rotate_seconds: start a new file every rotate_seconds seconds
+                (tcpdump's ``-G``, the files are timestamped)
+            rotate_count: limit the number of files per interface (tcpdump's
+                ``-W``). With rotate_size only, the files form a ring buffer:
+                the oldest ones are overwritten (also in the backup directory
+                when streaming). With rotate_seconds, tcpdump stops after
+                rotate_count files.
 
         Examples:
 
@@ -56,6 +75,9 @@ class TCPDump(Service):
         self._tmux_sessions_maps = [(s, s) for s in self.ifnames]
         self.backup_dir = _set_dir(backup_dir, LOCAL_OUTPUT_DIR)
         self.options = options
+        self.rotate_size = rotate_size
+        self.rotate_seconds = rotate_seconds
+        self.rotate_count = rotate_count
 
         # handle networks
         for host in hosts:
@@ -64,12 +86,31 @@ class TCPDump(Service):
                 ifs = host.filter_interfaces(self.networks)
             host.extra.update(tcpdump_ifs=ifs)
 
+    def _tcpdump_cmd(self, ifname: str) -> str:
+        """The tcpdump command line for an interface (templates are allowed)."""
+        # all the files of an interface match {ifname}.pcap*
+        output = f"{REMOTE_OUTPUT_DIR}/{ifname}.pcap"
+        rotate = []
+        if self.rotate_seconds is not None:
+            output += ".%Y%m%d-%H%M%S"
+            rotate.append(f"-G {self.rotate_seconds}")
+        if self.rotate_size is not None:
+            rotate.append(f"-C {self.rotate_size}")
+        if self.rotate_count is not None:
+            rotate.append(f"-W {self.rotate_count}")
+        if rotate:
+            # tcpdump drops its privileges before opening the next files
+            rotate.append("-Z root")
+        return " ".join(
+            [f"tcpdump -w {output} -i {ifname}"] + rotate + [self.options]
+        ).strip()
+
     def deploy(self, force: bool = False):
         with play_on(roles=self.roles, gather_facts=True) as p:
             p.apt(
-                name=["tcpdump", "tmux"],
+                name=["tcpdump", "tmux", "rsync"],
                 state="present",
-                task_name="Install dependencies (tcpdump, tmux ...)",
+                task_name="Install dependencies (tcpdump, tmux, rsync ...)",
                 when="ansible_os_family == 'Debian'",
             )
             p.file(
@@ -80,33 +121,77 @@ class TCPDump(Service):
             # explicit ifnames has been given
             for session, ifname in self._tmux_sessions_maps:
                 p.shell(
-                    bg_start(
-                        session,
-                        (
-                            f"tcpdump -w {REMOTE_OUTPUT_DIR}/{ifname}.pcap"
-                            f" -i {ifname} {self.options}"
-                        ),
-                    ),
+                    bg_start(session, self._tcpdump_cmd(ifname)),
                     task_name=f"tcpdump for {ifname}",
                 )
             p.debug(var="tcpdump_ifs")
-            cmd = bg_start(
-                "{{ item }}",
-                "tcpdump -w %s/{{ item }}.pcap -i {{ item }} %s"
-                % (REMOTE_OUTPUT_DIR, self.options),
-            )
+            cmd = bg_start("{{ item }}", self._tcpdump_cmd("{{ item }}"))
             # add some debug
             # p.debug(msg=cmd, loop="{{ tcpdump_ifs }}")
             p.shell(
                 cmd, loop="{{ tcpdump_ifs }}", task_name="tcpdump on some interfaces"
             )
 
-    def backup(self, backup_dir: Optional[Path] = None):
+    def backup(
+        self,
+        backup_dir: Optional[Path] = None,
+        completed_only: bool = False,
+        stream: bool = False,
+    ):
+        """Retrieve the pcap files.
+
+        The files of each host are saved in ``<backup_dir>/<host alias>/``.
+
+        Args:
+            backup_dir: local directory where the pcap files are saved
+                (default to the one given to the constructor)
+            completed_only: only retrieve the files tcpdump has finished to
+                write (i.e. leave out the current file of each interface). This
+                allows to backup the segments of a rotating capture while it
+                goes on. Requires stream.
+            stream: transfer the files with rsync (from the control node). Only
+                the files that are new (or have changed) since the last backup
+                are transferred and the transfer doesn't go through Ansible.
+                rsync must be installed on the control node (it's installed on
+                the hosts by :py:meth:`deploy`).
+                Otherwise, the capture directory is archived on each host and
+                the archive is fetched with Ansible (in
+                ``<backup_dir>/<host alias>/tcpdump.tar.gz``).
+        """
+        if completed_only and not stream:
+            raise ValueError("completed_only requires stream=True")
         _backup_dir = _set_dir(backup_dir, self.backup_dir)
+        if not stream:
+            with play_on(roles=self.roles) as p:
+                # zip the tcpdump directory
+                p.shell(f"tar -czf tcpdump.tar.gz {REMOTE_OUTPUT_DIR}")
+                p.fetch(src="tcpdump.tar.gz", dest=f"{str(_backup_dir)}")
+            return
+
+        excludes: Union[str, List[str]] = []
         with play_on(roles=self.roles) as p:
-            # zip the tcpdump directory
-            p.shell(f"tar -czf tcpdump.tar.gz {REMOTE_OUTPUT_DIR}")
-            p.fetch(src="tcpdump.tar.gz", dest=f"{str(_backup_dir)}")
+            if completed_only:
+                ifnames = " ".join(self.ifnames + ["{{ tcpdump_ifs | join(' ') }}"])
+                # the most recent file of each interface is still being written
+                p.shell(
+                    f"for i in {ifnames}; do "
+                    f"ls -t {REMOTE_OUTPUT_DIR}/$i.pcap* 2>/dev/null | head -n 1; "
+                    "done",
+                    task_name="Find the files being written",
+                    register="tcpdump_current",
+                )
+                excludes = (
+                    "{{ tcpdump_current.stdout_lines | map('basename')"
+                    " | map('regex_replace', '^', '--exclude=') | list }}"
+                )
+            p.ansible.posix.synchronize(
+                mode="pull",
+                src=f"{REMOTE_OUTPUT_DIR}/",
+                dest=f"{str(_backup_dir)}/{{{{ inventory_hostname }}}}/",
+                rsync_opts=excludes,
+                use_ssh_args=True,
+                task_name="Stream the pcap files",
+            )
 
     def destroy(self):
         with play_on(roles=self.roles) as p:
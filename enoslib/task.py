@@ -13,19 +13,27 @@ argument. Environment is a dict-like data structure that is restored (resp.
 saved) at the beginning of a task (resp. at the end of a task).
 
 These operations rely on pickling the object stored in the environment.
+By default, the whole environment is pickled in a single file. A lazy
+environment (see :py:class:`LazyEnvironment`) stores each key in its own file
+instead, so that only the keys used by a task are unpickled and only the
+modified ones are written back.
 """
 
+import hashlib
 import logging
+import os
 import pickle
 from collections import UserDict
+from collections.abc import MutableMapping
 from datetime import datetime
 from functools import wraps
 from pathlib import Path
-from typing import Optional, Union
+from typing import Any, Dict, Iterator, Mapping, Optional, Set, Tuple, Union
 
 import yaml
 
-from enoslib.constants import ENV_FILENAME, SYMLINK_NAME
+from enoslib.config import get_config
+from enoslib.constants import ENV_FILENAME, ENV_STORE_DIRNAME, SYMLINK_NAME
 from enoslib.errors import EnosFilePathError
 
 logger = logging.getLogger(__name__)
@@ -44,6 +52,16 @@ def _symlink_to(env_dir: Path):
         logger.info("Symlink %s to %s failed", env_dir, SYMLINK_NAME)
 
 
+def _atomic_write(path: Path, content: bytes):
+    """Write a file atomically (readers never see a partial content)."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("wb") as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
 def _create_env_dir(env_dir: Path):
     """Create the env_dir
 
@@ -106,10 +124,13 @@ class Environment(UserDict):
         with env_file.open(mode="rb") as f:
             self = pickle.load(f)
             # fix path to the environment
-            self.env_name = env_file.parent.resolve()
+            self._relocate(env_file.parent.resolve())
             logger.debug("Loaded environment %s", env_file)
         return self
 
+    def _relocate(self, env_name: Path):
+        self.env_name = env_name
+
     def dumps(self):
         """Return the dumped object of the environment."""
         return pickle.dumps(self)
@@ -118,8 +139,7 @@ class Environment(UserDict):
         """Dump the environment in a file (env_name)."""
         self.env_name.mkdir(parents=True, exist_ok=True)
         env_file = self.env_name.joinpath(ENV_FILENAME)
-        with env_file.open("wb") as f:
-            f.write(self.dumps())
+        _atomic_write(env_file, self.dumps())
 
     def reload_config(self):
         """Reload a config file if any in the store."""
@@ -132,6 +152,127 @@ class Environment(UserDict):
                     logger.debug("Reloaded config %s", self["config"])
 
 
+def _key_filename(key: Any) -> str:
+    return f"{hashlib.sha1(pickle.dumps(key)).hexdigest()}.pickle"
+
+
+class _LazyStore(MutableMapping):
+    """Per-key storage of a lazy environment.
+
+    Each value is pickled in its own file in ``directory``. Values are
+    unpickled on first access. On flush, only the values whose pickled form
+    changed are written back (so in-place mutations are detected too).
+    Only the index (key -> file, digest) is pickled with the environment.
+    """
+
+    def __init__(self, data: Optional[Mapping] = None):
+        self.directory: Optional[Path] = None
+        # key -> (filename, digest of the stored value)
+        self.index: Dict[Any, Tuple[str, Optional[str]]] = {}
+        # values loaded or set during this session
+        self.cache: Dict[Any, Any] = {}
+        self.deleted: Set[str] = set()
+        if data is not None:
+            self.update(data)
+
+    def __getitem__(self, key):
+        if key not in self.cache:
+            filename, _ = self.index[key]
+            assert self.directory is not None
+            with self.directory.joinpath(filename).open(mode="rb") as f:
+                self.cache[key] = pickle.load(f)
+        return self.cache[key]
+
+    def __setitem__(self, key, value):
+        if key not in self.index:
+            self.index[key] = (_key_filename(key), None)
+        self.cache[key] = value
+
+    def __delitem__(self, key):
+        filename, _ = self.index.pop(key)
+        self.cache.pop(key, None)
+        self.deleted.add(filename)
+
+    def __iter__(self) -> Iterator:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, key) -> bool:
+        return key in self.index
+
+    def flush(self):
+        """Write back the new or modified values."""
+        assert self.directory is not None
+        self.directory.mkdir(parents=True, exist_ok=True)
+        filenames = {filename for filename, _ in self.index.values()}
+        for filename in self.deleted - filenames:
+            self.directory.joinpath(filename).unlink(missing_ok=True)
+        self.deleted = set()
+        for key, value in self.cache.items():
+            filename, digest = self.index[key]
+            blob = pickle.dumps(value)
+            new_digest = hashlib.sha1(blob).hexdigest()
+            if new_digest != digest:
+                _atomic_write(self.directory.joinpath(filename), blob)
+                self.index[key] = (filename, new_digest)
+
+    def __getstate__(self):
+        return dict(index=self.index)
+
+    def __setstate__(self, state):
+        self.directory = None
+        self.index = state["index"]
+        self.cache = {}
+        self.deleted = set()
+
+
+class LazyEnvironment(Environment):
+    """An environment whose keys are stored (and loaded) independently.
+
+    The environment file only holds the index of the keys, each value being
+    pickled in its own file (in the ``env.d`` directory next to it).
+
+    - a value is unpickled only when it's accessed for the first time
+    - dumping the environment writes back only the values that were added or
+      modified (in place or not) since they were loaded
+    - all the writes are atomic
+
+    Since the values are pickled separately, the objects shared by several
+    keys (e.g. the hosts of ``env["roles"]`` and of ``env["provider"]``) are
+    distinct copies once the environment is reloaded: a later modification
+    made through a key isn't seen through the others. Store such objects
+    under a single key (e.g. in a tuple) to keep them shared.
+
+    Use ``set_config(env_store="lazy")`` to create lazy environments in
+    :py:func:`enostask`. Environments previously stored in a single pickle file
+    remain readable whatever the configuration is.
+    """
+
+    data: _LazyStore  # type: ignore[assignment]
+
+    def __init__(self, env_name: Path):
+        super().__init__(env_name)
+        self.data = _LazyStore(self.data)
+        self.data.directory = self.env_name.joinpath(ENV_STORE_DIRNAME)
+
+    def _relocate(self, env_name: Path):
+        super()._relocate(env_name)
+        self.data.directory = self.env_name.joinpath(ENV_STORE_DIRNAME)
+
+    def dumps(self):
+        """Return the dumped object of the environment.
+
+        New and modified values are written back in their own file first.
+        """
+        self.data.flush()
+        return super().dumps()
+
+
+_ENV_STORES = {"pickle": Environment, "lazy": LazyEnvironment}
+
+
 def get_or_create_env(
     new: bool, env_name: Optional[Union[Environment, Path, str]], symlink: bool = True
 ) -> Environment:
@@ -150,7 +291,12 @@ def get_or_create_env(
     def _create_new_env(env_file: Path) -> Environment:
         _create_env_dir(env_file.parent)
         # Create a new env
-        env = Environment(env_file.parent)
+        env_store = get_config()["env_store"]
+        if env_store not in _ENV_STORES:
+            raise ValueError(
+                f"Unknown env_store {env_store}, must be one of {list(_ENV_STORES)}"
+            )
+        env = _ENV_STORES[env_store](env_file.parent)
         # dump this new (empty) env
         env.dump()
         if symlink:
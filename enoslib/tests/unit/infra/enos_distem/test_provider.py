@@ -0,0 +1,81 @@
+import ipaddress
+import tempfile
+from pathlib import Path
+from unittest.mock import Mock
+
+from enoslib.infra.enos_distem.configuration import Configuration, MachineConfiguration
+from enoslib.infra.enos_distem.provider import _start_containers
+from enoslib.objects import Host
+
+from ... import EnosTest
+
+
+class FakeCoordinator:
+    """Allocates the addresses of the vnodes like a distem coordinator."""
+
+    def __init__(self, fail_on=None):
+        self.serveraddr = "coordinator"
+        self.fail_on = fail_on
+        self.created = {}
+        self.started = []
+        self.ips = (f"10.0.0.{i}/22" for i in range(1, 255))
+
+    def vnetwork_create(self, name, address):
+        pass
+
+    def vnodes_create(self, names, desc, ssh_key):
+        if desc["host"] == self.fail_on:
+            raise Exception("boom")
+        vnodes = []
+        for name in names:
+            self.created[name] = desc["host"]
+            vifaces = [dict(desc["vifaces"][0], address=next(self.ips))]
+            vnodes.append(dict(name=name, vifaces=vifaces))
+        return vnodes
+
+    def vnodes_start(self, names):
+        self.started.extend(names)
+
+
+class TestStartContainers(EnosTest):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        keys = {}
+        for k, f in [("public", "id_rsa.pub"), ("private", "id_rsa")]:
+            keys[k] = str(Path(self.tmp_dir.name) / f)
+            Path(keys[k]).write_text(k)
+        self.keys = keys
+        self.pms = [Host("pm-1"), Host("pm-2")]
+        machine = MachineConfiguration(
+            roles=["r1"], cluster="paravance", number=5, undercloud=self.pms
+        )
+        self.conf = (
+            Configuration.from_settings(image="file:///distem.tgz")
+            .add_machine_conf(machine)
+            .finalize()
+        )
+        self.subnet = Mock(network=ipaddress.ip_network("10.0.0.0/22"))
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_start_containers(self):
+        distem = Mock(wraps=FakeCoordinator())
+        distem.serveraddr = "coordinator"
+        roles = _start_containers(self.conf, self.subnet, distem, self.keys)
+
+        # one bulk creation per physical machine, one bulk start
+        self.assertEqual(2, distem.vnodes_create.call_count)
+        distem.vnodes_start.assert_called_once_with([f"vnode-{i}" for i in range(5)])
+        self.assertEqual(5, len(roles["r1"]))
+        self.assertEqual(5, len({h.address for h in roles["r1"]}))
+        created = distem._mock_wraps.created
+        self.assertEqual(
+            ["pm-1", "pm-2", "pm-1"], [created[f"vnode-{i}"] for i in (0, 1, 2)]
+        )
+
+    def test_start_containers_errors(self):
+        distem = FakeCoordinator(fail_on="pm-2")
+        with self.assertRaisesRegex(Exception, "vnode-1.*vnode-3"):
+            _start_containers(self.conf, self.subnet, distem, self.keys)
+        self.assertEqual([], distem.started)
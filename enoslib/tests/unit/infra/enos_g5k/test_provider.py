@@ -1,10 +1,13 @@
 import ipaddress
-from typing import List
+import threading
+from typing import Dict, List
 from unittest import mock
 
 from enoslib.api import STATUS_FAILED, STATUS_OK, CommandResult, Results
+from enoslib.config import config_context, get_config
 from enoslib.errors import NegativeWalltime
 from enoslib.infra.enos_g5k.configuration import Configuration
+from enoslib.infra.enos_g5k.constants import MAX_DEPLOY
 from enoslib.infra.enos_g5k.error import (
     EnosG5kInvalidArgumentsError,
     EnosG5kKavlanNodesError,
@@ -16,6 +19,8 @@ from enoslib.infra.enos_g5k.objects import (
     G5kEnosSubnetNetwork,
     G5kEnosVlan4Network,
     G5kEnosVlan6Network,
+    IPMacPool,
+    build_ipmac,
 )
 from enoslib.infra.enos_g5k.provider import (
     G5k,
@@ -25,6 +30,7 @@ from enoslib.infra.enos_g5k.provider import (
     G5kVlanNetwork,
     _check_deployed_nodes,
     check_deployments,
+    deploy_pipelined,
 )
 from enoslib.tests.unit import EnosTest
 from enoslib.tests.unit.infra.enos_g5k.utils import get_offline_client
@@ -99,6 +105,40 @@ class TestG5kEnos(EnosTest):
         self.assertTrue(enos_subnet.has_free_macs)
         self.assertEqual(1022, len(list(enos_subnet.free_macs)))
 
+    def test_kavlan_range(self):
+        enos_kavlan_net_type = ipaddress.ip_network("10.24.0.0/18")
+        enos_kavlan: G5kEnosVlan4Network = G5kEnosVlan4Network(
+            enos_kavlan_net_type, "4", "172.16.0.254", "172.16.0.25"
+        )
+        ips = list(enos_kavlan.free_ips)
+        # 18 /23 starting from the 13th one
+        self.assertEqual(18 * 512, len(ips))
+        self.assertEqual(ipaddress.ip_address("10.24.26.0"), ips[0])
+        self.assertEqual(ipaddress.ip_address("10.24.61.255"), ips[-1])
+
+    def test_ipmac_pool(self):
+        subnets = ["10.140.4.0/22", "10.140.0.0/22"]
+        pool = IPMacPool(subnets)
+        expected = list(build_ipmac("10.140.0.0/22")) + list(
+            build_ipmac("10.140.4.0/22")
+        )
+        self.assertEqual(2044, len(pool))
+        self.assertEqual(expected, list(pool))
+        self.assertEqual(("10.140.0.1", "00:16:3E:8C:00:01"), pool[0])
+        self.assertEqual(("10.140.7.254", "00:16:3E:8C:07:FE"), pool[-1])
+        with self.assertRaises(IndexError):
+            pool[2044]
+
+    def test_ipmac_pool_skip_step(self):
+        subnets = ["10.140.0.0/22", "10.140.4.0/22"]
+        pool = IPMacPool(subnets, skip=1020, step=3)
+        expected = list(IPMacPool(subnets))[1020::3]
+        self.assertEqual(len(expected), len(pool))
+        self.assertEqual(expected, list(pool))
+        self.assertIn("10.140.4.2", pool)
+        self.assertNotIn("10.140.4.3", pool)
+        self.assertNotIn("10.140.0.1", pool)
+
     def test_offset_walltime(self):
         conf = Configuration()
         conf.walltime = "02:00:00"
@@ -354,6 +394,153 @@ class TestCheckDeployments(EnosTest):
         self.assertEqual([node2.fqdn], configs[1]["nodes"])
 
 
+class TestDeployPipelined(EnosTest):
+    def setUp(self):
+        self.net1 = G5kProdNetwork(["tag1"], "id1", "siteA")
+        self.net2 = G5kProdNetwork(["tag1"], "id2", "siteB")
+        self.node1 = G5kHost("plip-1.siteA.grid5000.fr", [], self.net1)
+        self.node2 = G5kHost("plip-2.siteB.grid5000.fr", [], self.net2)
+        self.node3 = G5kHost("plip-3.siteB.grid5000.fr", [], self.net2)
+
+    @mock.patch("enoslib.infra.enos_g5k.provider.time.sleep")
+    @mock.patch("enoslib.infra.enos_g5k.provider.deployment_result")
+    @mock.patch("enoslib.infra.enos_g5k.provider.create_deployment")
+    @mock.patch("enoslib.infra.enos_g5k.provider._check_deployed_nodes")
+    def test_deploy_pipelined(self, mock_check, mock_create, mock_result, mock_sleep):
+        mock_check.side_effect = [([], [self.node1]), ([], [self.node2, self.node3])]
+        deployment_a, deployment_b, deployment_b2 = "a", "b", "b2"
+        mock_create.side_effect = [deployment_a, deployment_b, deployment_b2]
+        results: Dict[str, List] = {
+            # siteA ends at the second round, siteB at the first round
+            # but plip-3 must be redeployed
+            deployment_a: [None, ([self.node1.fqdn], [])],
+            deployment_b: [([self.node2.fqdn], [self.node3.fqdn])],
+            deployment_b2: [([self.node3.fqdn], [])],
+        }
+        mock_result.side_effect = lambda deployment, _: results[deployment].pop(0)
+        batches: List = []
+
+        deployed, undeployed = deploy_pipelined(
+            [self.node1, self.node2, self.node3], False, {}, batches.append
+        )
+
+        self.assertEqual([[self.node2], [self.node1], [self.node3]], batches)
+        self.assertCountEqual([self.node1, self.node2, self.node3], deployed)
+        self.assertEqual([], undeployed)
+        # the retry on siteB is created before siteA ends
+        self.assertEqual(
+            mock.call("siteB", {"nodes": [self.node3.fqdn]}),
+            mock_create.call_args_list[2],
+        )
+        self.assertEqual(2, mock_sleep.call_count)
+
+    @mock.patch("enoslib.infra.enos_g5k.provider.time.sleep")
+    @mock.patch("enoslib.infra.enos_g5k.provider.deployment_result")
+    @mock.patch("enoslib.infra.enos_g5k.provider.create_deployment")
+    @mock.patch("enoslib.infra.enos_g5k.provider._check_deployed_nodes")
+    def test_deploy_pipelined_max_attempts(
+        self, mock_check, mock_create, mock_result, mock_sleep
+    ):
+        mock_check.return_value = ([], [self.node1])
+        mock_result.return_value = ([], [self.node1.fqdn])
+        batches: List = []
+
+        deployed, undeployed = deploy_pipelined([self.node1], False, {}, batches.append)
+
+        self.assertEqual([], batches)
+        self.assertEqual([], deployed)
+        self.assertEqual([self.node1], undeployed)
+        self.assertEqual(MAX_DEPLOY, mock_create.call_count)
+
+    @mock.patch("enoslib.infra.enos_g5k.provider.time.sleep")
+    @mock.patch("enoslib.infra.enos_g5k.provider.deployment_result")
+    @mock.patch("enoslib.infra.enos_g5k.provider.create_deployment")
+    @mock.patch("enoslib.infra.enos_g5k.provider._check_deployed_nodes")
+    def test_deploy_pipelined_background(
+        self, mock_check, mock_create, mock_result, mock_sleep
+    ):
+        mock_check.side_effect = [([], [self.node1]), ([], [self.node2])]
+        mock_create.side_effect = ["a", "b"]
+        results: Dict[str, List] = {
+            "a": [None, ([self.node1.fqdn], [])],
+            "b": [([self.node2.fqdn], [])],
+        }
+        mock_result.side_effect = lambda deployment, _: results[deployment].pop(0)
+        polled = threading.Event()
+
+        def sleep(_):
+            # the second poll happens while the post-deployment of siteB runs
+            if mock_sleep.call_count == 2:
+                polled.set()
+
+        mock_sleep.side_effect = sleep
+        unblocked: List[bool] = []
+
+        def on_deployed(batch):
+            if batch == [self.node2]:
+                unblocked.append(polled.wait(5))
+
+        deployed, _ = deploy_pipelined([self.node1, self.node2], False, {}, on_deployed)
+        self.assertEqual([True], unblocked)
+        self.assertCountEqual([self.node1, self.node2], deployed)
+
+    @mock.patch("enoslib.infra.enos_g5k.provider.time.sleep")
+    @mock.patch("enoslib.infra.enos_g5k.provider.deployment_result")
+    @mock.patch("enoslib.infra.enos_g5k.provider.create_deployment")
+    @mock.patch("enoslib.infra.enos_g5k.provider._check_deployed_nodes")
+    def test_deploy_pipelined_post_deploy_error(
+        self, mock_check, mock_create, mock_result, mock_sleep
+    ):
+        mock_check.return_value = ([], [self.node1])
+        mock_result.return_value = ([self.node1.fqdn], [])
+
+        def on_deployed(batch):
+            raise RuntimeError("unreachable")
+
+        with self.assertRaisesRegex(RuntimeError, "unreachable"):
+            deploy_pipelined([self.node1], False, {}, on_deployed)
+
+    @mock.patch("enoslib.infra.enos_g5k.provider.cancel_deployment")
+    @mock.patch("enoslib.infra.enos_g5k.provider.time.sleep")
+    @mock.patch("enoslib.infra.enos_g5k.provider.deployment_result")
+    @mock.patch("enoslib.infra.enos_g5k.provider.create_deployment")
+    @mock.patch("enoslib.infra.enos_g5k.provider._check_deployed_nodes")
+    def test_deploy_pipelined_cancel(
+        self, mock_check, mock_create, mock_result, mock_sleep, mock_cancel
+    ):
+        # siteA is deployed, siteB never ends
+        mock_check.side_effect = [([], [self.node1]), ([], [self.node2])]
+        mock_create.side_effect = ["a", "b"]
+        mock_result.side_effect = lambda deployment, _: (
+            ([self.node1.fqdn], []) if deployment == "a" else None
+        )
+
+        def on_deployed(batch):
+            raise RuntimeError("unreachable")
+
+        with self.assertRaisesRegex(RuntimeError, "unreachable"):
+            deploy_pipelined([self.node1, self.node2], False, {}, on_deployed)
+        mock_cancel.assert_called_once_with("siteB", "b")
+
+    @mock.patch("enoslib.infra.enos_g5k.provider.time.sleep")
+    @mock.patch("enoslib.infra.enos_g5k.provider.deployment_result")
+    @mock.patch("enoslib.infra.enos_g5k.provider.create_deployment")
+    @mock.patch("enoslib.infra.enos_g5k.provider._check_deployed_nodes")
+    def test_deploy_pipelined_context(
+        self, mock_check, mock_create, mock_result, mock_sleep
+    ):
+        mock_check.return_value = ([self.node1], [])
+        forks: List = []
+
+        def on_deployed(batch):
+            forks.append(get_config()["ansible_forks"])
+
+        with config_context(ansible_forks=42):
+            deploy_pipelined([self.node1], False, {}, on_deployed)
+        # the post-deployment runs with the config of the caller
+        self.assertEqual([42], forks)
+
+
 class TestToEnoslib(EnosTest):
     @mock.patch("enoslib.infra.enos_g5k.g5k_api_utils.get_api_client")
     def test_non_duplicated_hosts(self, mock_api):
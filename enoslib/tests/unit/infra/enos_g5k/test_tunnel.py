@@ -0,0 +1,31 @@
+from unittest import mock
+
+from enoslib.infra.enos_g5k.provider import G5kTunnel
+from enoslib.tests.unit import EnosTest
+from enoslib.utils import TunnelPool
+
+
+class TestG5kTunnel(EnosTest):
+    def setUp(self):
+        self.client = mock.Mock()
+        self.pool = TunnelPool()
+        self.connect = mock.patch.object(
+            self.pool, "_connect", return_value=self.client
+        ).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    @mock.patch("enoslib.infra.enos_g5k.provider.get_api_username")
+    @mock.patch("socket.getfqdn", return_value="laptop")
+    def test_g5k_tunnel_pooled(self, mock_fqdn, mock_username):
+        mock_username.return_value = "user"
+        with mock.patch("enoslib.infra.enos_g5k.provider.POOL", self.pool):
+            with G5kTunnel("10.0.0.1", 80, pooled=True) as (address, port, _):
+                with G5kTunnel("10.0.0.2", 80, pooled=True):
+                    self.assertEqual("127.0.0.1", address)
+                    self.assertNotEqual(0, port)
+            self.connect.assert_called_once_with(
+                "access.grid5000.fr", "user", None, None, ()
+            )
+            self.client.close.assert_called_once()
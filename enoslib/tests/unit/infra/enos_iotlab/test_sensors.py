@@ -1,8 +1,16 @@
+import socket
 from unittest import mock
 from unittest.mock import patch
 
 from enoslib.infra.enos_iotlab.iotlab_api import IotlabAPI
-from enoslib.infra.enos_iotlab.objects import IotlabSensor, IotlabSerial, IotlabSniffer
+from enoslib.infra.enos_iotlab.objects import (
+    IotlabSensor,
+    IotlabSerial,
+    IotlabSerialTransport,
+    IotlabSniffer,
+    flash_sensors,
+    send_cmd_sensors,
+)
 from enoslib.tests.unit import EnosTest
 
 
@@ -70,6 +78,43 @@ class TestSensors(EnosTest):
             api=mock.ANY, command="stop", exp_id=666, nodes_list=[node_addr]
         )
 
+    @patch("iotlabcli.node.node_command")
+    def test_batch(self, mock_node):
+        sensors = [
+            IotlabSensor(
+                address=f"m3-{i}.{site}.iot-lab.info",
+                roles=["sensor"],
+                site=site,
+                uid="b413",
+                archi="m3:at86rf231",
+                image=f"{i % 2}.elf",
+                iotlab_client=self.client,
+            )
+            for site in ["grenoble", "lille"]
+            for i in range(4)
+        ]
+        send_cmd_sensors(sensors + sensors[:1], "reset")
+        # one call per site
+        self.assertEqual(2, mock_node.call_count)
+        mock_node.assert_any_call(
+            api=mock.ANY,
+            command="reset",
+            exp_id=666,
+            nodes_list=[s.address for s in sensors[:4]],
+        )
+
+        mock_node.reset_mock()
+        flash_sensors(sensors)
+        # one call per site and image
+        self.assertEqual(4, mock_node.call_count)
+        mock_node.assert_any_call(
+            api=mock.ANY,
+            command="flash",
+            exp_id=666,
+            nodes_list=["m3-1.lille.iot-lab.info", "m3-3.lille.iot-lab.info"],
+            cmd_opt="1.elf",
+        )
+
 
 class TestSerial(EnosTest):
     def setUp(self):
@@ -274,3 +319,61 @@ class TestSniffer(EnosTest):
         my_m.command.assert_called_with(
             'pkill -f "~/.iot-lab/666/sniffer/m3-1.pcap"', task_name=mock.ANY
         )
+
+
+class TestSerialTransport(EnosTest):
+    def setUp(self):
+        mock_auth = mock.patch("iotlabcli.auth.get_user_credentials").start()
+        mock_auth.return_value = ["test", "test"]
+
+        self.client = IotlabAPI()
+        self.client.job_id = 666
+        self.client.walltime = 10
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def sensor(self, i):
+        return IotlabSensor(
+            address=f"m3-{i}.grenoble.iot-lab.info",
+            roles=["sensor"],
+            site="grenoble",
+            uid="b413",
+            archi="m3:at86rf231",
+            image="",
+            iotlab_client=self.client,
+        )
+
+    @patch("paramiko.SSHClient")
+    def test_multiplexed(self, mock_client):
+        # a socket pair per sensor stands for its SSH channel
+        pairs = [socket.socketpair() for _ in range(3)]
+        open_channel = mock_client.return_value.get_transport.return_value.open_channel
+        open_channel.side_effect = [channel for channel, _ in pairs]
+
+        with IotlabSerialTransport("grenoble", timeout=1) as transport:
+            serials = [transport.serial(self.sensor(i)) for i in range(3)]
+            for serial in serials:
+                serial.open_serial_conn()
+            # one single SSH connection
+            mock_client.return_value.connect.assert_called_once_with(
+                "grenoble.iot-lab.info", username="test", password="test", timeout=1
+            )
+            open_channel.assert_called_with(
+                "direct-tcpip", ("m3-2.grenoble.iot-lab.info", 20000), mock.ANY
+            )
+
+            for i, (_, remote) in enumerate(pairs):
+                remote.sendall(f"hello {i}\nbye".encode())
+            for i, serial in enumerate(serials):
+                self.assertEqual(f"hello {i}\n", serial.readline())
+                self.assertEqual("bye", serial.read())
+
+            serials[0].write("test")
+            self.assertEqual(b"test", pairs[0][1].recv(32))
+
+            for serial in serials:
+                serial.close_serial_conn()
+        mock_client.return_value.close.assert_called_once()
+        for _, remote in pairs:
+            remote.close()
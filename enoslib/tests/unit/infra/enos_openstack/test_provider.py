@@ -0,0 +1,117 @@
+import os
+from unittest import mock
+from unittest.mock import Mock, patch
+
+from keystoneauth1.session import Session
+
+from enoslib.infra.enos_openstack.configuration import MachineConfiguration
+from enoslib.infra.enos_openstack.constants import MISSING_SERVER_TIMEOUT
+from enoslib.infra.enos_openstack.provider import check_servers, wait_for_servers
+
+from ... import EnosTest
+
+
+class TestServers(EnosTest):
+    def setUp(self):
+        patch.dict(os.environ, {"OS_REGION_NAME": "region"}).start()
+        self.nclient = Mock()
+        patch(
+            "enoslib.infra.enos_openstack.provider.nova.Client",
+            return_value=self.nclient,
+        ).start()
+        patch(
+            "enoslib.infra.enos_openstack.provider.check_glance",
+            side_effect=lambda session, image: f"id-{image}",
+        ).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_check_servers(self):
+        self.nclient.servers.list.return_value = []
+        self.nclient.servers.create.side_effect = lambda **kwargs: Mock(
+            name=kwargs["name"]
+        )
+        machines = [
+            MachineConfiguration(roles=["r1"], flavour="m1.tiny", number=3),
+            MachineConfiguration(roles=["r2"], flavour="m1.small", number=2),
+        ]
+        servers = check_servers(
+            Mock(spec=Session),
+            machines,
+            extra_prefix="xp",
+            flavors="baremetal",
+            image_id="i",
+        )
+        self.assertEqual(5, len(servers))
+        # the flavor is resolved once
+        self.nclient.flavors.find.assert_called_once_with(name="baremetal")
+        names = sorted(c.kwargs["name"] for c in self.nclient.servers.create.mock_calls)
+        self.assertEqual([f"enos-xp-{i}" for i in range(5)], names)
+
+    def test_check_servers_flavor_ids(self):
+        self.nclient.servers.list.return_value = []
+        machines = [
+            MachineConfiguration(roles=["r1"], flavour="m1.tiny", number=2),
+            MachineConfiguration(roles=["r2"], flavour="m1.tiny", number=1),
+        ]
+        check_servers(
+            Mock(spec=Session),
+            machines,
+            flavors=({"m1.tiny": "flavor-id"}, {}),
+            image_id="i",
+        )
+        # the flavor is still looked up (once)
+        self.nclient.flavors.find.assert_called_once_with(name="flavor-id")
+        self.nclient.servers.create.assert_called_with(
+            name=mock.ANY,
+            image=mock.ANY,
+            flavor=self.nclient.flavors.find.return_value,
+            nics=None,
+            key_name=None,
+            security_groups=mock.ANY,
+            scheduler_hints=[],
+        )
+
+    @patch("enoslib.infra.enos_openstack.provider.time.sleep")
+    def test_wait_for_servers(self, mock_sleep):
+        servers = [Mock(id=i) for i in range(3)]
+
+        def _listing(statuses):
+            return [
+                Mock(id=i, status=status, addresses={"net": []})
+                for i, status in enumerate(statuses)
+            ]
+
+        self.nclient.servers.list.side_effect = [
+            _listing(["BUILD", "BUILD", "BUILD"]),
+            _listing(["ACTIVE", "BUILD", "BUILD"]),
+            _listing(["ACTIVE", "ERROR", "ACTIVE"]),
+        ]
+        deployed, undeployed = wait_for_servers(Mock(spec=Session), servers)
+        self.assertEqual([0, 2], [s.id for s in deployed])
+        self.assertEqual([1], [s.id for s in undeployed])
+        # a single request per poll, no per server request
+        self.assertEqual(3, self.nclient.servers.list.call_count)
+        self.nclient.servers.get.assert_not_called()
+        # exponential backoff
+        self.assertEqual([2, 4], [c.args[0] for c in mock_sleep.mock_calls])
+
+    @patch("enoslib.infra.enos_openstack.provider.time.monotonic")
+    @patch("enoslib.infra.enos_openstack.provider.time.sleep")
+    def test_wait_for_missing_servers(self, _, monotonic):
+        servers = [Mock(id=i) for i in range(2)]
+        monotonic.side_effect = [0, 0, 10, 20, MISSING_SERVER_TIMEOUT]
+        active = Mock(id=0, status="ACTIVE", addresses={"net": []})
+        # server 1 isn't listed yet, then shows up, then disappears
+        self.nclient.servers.list.side_effect = [
+            [active],
+            [active, Mock(id=1, status="BUILD", addresses={})],
+            [active],
+            [active],
+        ]
+        deployed, undeployed = wait_for_servers(Mock(spec=Session), servers)
+        self.assertEqual([0], [s.id for s in deployed])
+        # only given up once the timeout is reached
+        self.assertEqual([1], [s.id for s in undeployed])
+        self.assertEqual(4, self.nclient.servers.list.call_count)
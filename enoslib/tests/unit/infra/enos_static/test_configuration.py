@@ -1,7 +1,9 @@
 from typing import MutableMapping
+from unittest.mock import patch
 
 import jsonschema
 
+from enoslib.infra.configuration import _get_validator
 from enoslib.infra.enos_static.configuration import (
     Configuration,
     MachineConfiguration,
@@ -45,3 +47,17 @@ class TestConfiguration(EnosTest):
         )
         conf.finalize()
         self.assertEqual(1, len(conf.machines))
+
+    def test_validation_cache(self):
+        d: MutableMapping = {"resources": {"machines": [], "networks": []}}
+        Configuration.validate(d)
+
+        cached = _get_validator(Configuration._SCHEMA, None)
+        with patch.object(cached, "validator", wraps=cached.validator) as validator:
+            Configuration.validate(d)
+            validator.iter_errors.assert_not_called()
+            # a different content is validated
+            d["resources"]["machines"].append({"roles": ["r1"]})
+            with self.assertRaises(jsonschema.exceptions.ValidationError):
+                Configuration.validate(d)
+            validator.iter_errors.assert_called_once()
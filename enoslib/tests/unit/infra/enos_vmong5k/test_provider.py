@@ -1,10 +1,13 @@
+import ipaddress
 from unittest import mock
 
+from enoslib.infra.enos_g5k.objects import G5kEnosSubnetNetwork
 from enoslib.infra.enos_vmong5k.configuration import Configuration, MachineConfiguration
 from enoslib.infra.enos_vmong5k.provider import (
     _distribute,
     _do_build_g5k_conf,
     _find_nodes_number,
+    mac_range,
 )
 from enoslib.objects import Host
 from enoslib.tests.unit import EnosTest
@@ -237,6 +240,33 @@ class TestNodesNumber(EnosTest):
         self.assertEqual(1, _find_nodes_number(machine))
 
 
+class TestMacRange(EnosTest):
+    def setUp(self):
+        self.subnets = [
+            G5kEnosSubnetNetwork(ipaddress.ip_network("10.158.4.0/22")),
+            G5kEnosSubnetNetwork(ipaddress.ip_network("10.158.0.0/22")),
+        ]
+
+    def test_mac_range(self):
+        macs = list(mac_range(self.subnets))
+        # first address of each subnet is skipped
+        self.assertEqual(2 * 1021, len(macs))
+        self.assertEqual("00:16:3E:9E:00:02", macs[0])
+        self.assertEqual("00:16:3E:9E:03:FE", macs[1020])
+        self.assertEqual("00:16:3E:9E:04:02", macs[1021])
+
+    def test_mac_range_skip_step(self):
+        macs = list(mac_range(self.subnets, skip=10, step=2))
+        self.assertEqual("00:16:3E:9E:00:0C", macs[0])
+        self.assertEqual("00:16:3E:9E:00:0E", macs[1])
+        self.assertEqual("00:16:3E:9E:04:0C", macs[506])
+
+    def test_mac_range_skip_subnet(self):
+        macs = list(mac_range(self.subnets, skip=1022 + 3))
+        self.assertEqual("00:16:3E:9E:04:05", macs[0])
+        self.assertEqual(1021 - 3, len(macs))
+
+
 class TestDistribute(EnosTest):
     def test_distribute_minimal(self):
 
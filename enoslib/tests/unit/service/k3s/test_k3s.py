@@ -0,0 +1,90 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from enoslib.objects import Host
+from enoslib.service.k3s.k3s import (
+    K3S_STABLE_CHANNEL,
+    REMOTE_ARTIFACTS_DIR,
+    REQUEST_TIMEOUT,
+    K3s,
+)
+from enoslib.tests.unit import EnosTest
+
+
+class TestK3s(EnosTest):
+    def setUp(self):
+        self.master = [Host("1.2.3.4")]
+        self.agents = [Host(f"1.2.4.{i}") for i in range(10)]
+
+    def test_install_cmd(self):
+        k3s = K3s(self.master, self.agents)
+        self.assertEqual(
+            "curl -sfL https://get.k3s.io | A=1 sh", k3s._install_cmd("A=1")
+        )
+        k3s = K3s(self.master, self.agents, airgap=True)
+        self.assertEqual(
+            f"INSTALL_K3S_SKIP_DOWNLOAD=true A=1 sh {REMOTE_ARTIFACTS_DIR}/install.sh",
+            k3s._install_cmd("A=1"),
+        )
+
+    @mock.patch("enoslib.service.k3s.k3s.requests")
+    def test_fetch_artifacts(self, requests):
+        with tempfile.TemporaryDirectory() as tmp:
+            k3s = K3s(
+                self.master,
+                self.agents,
+                version="1.28.5+k3s1",
+                airgap=True,
+                artifacts_dir=tmp,
+                arch="arm64",
+            )
+            artifacts = k3s._artifacts(k3s._release())
+            self.assertEqual(
+                "https://github.com/k3s-io/k3s/releases/download/v1.28.5%2Bk3s1/"
+                "k3s-arm64",
+                artifacts["k3s"],
+            )
+            # only the missing artifacts are downloaded
+            for name in ["install.sh", "k3s"]:
+                (Path(tmp) / name).write_text(name)
+            response = requests.get.return_value.__enter__.return_value
+            response.iter_content.return_value = [b"images"]
+            self.assertEqual(Path(tmp).resolve(), k3s._fetch_artifacts().resolve())
+            requests.get.assert_called_once()
+            self.assertEqual(REQUEST_TIMEOUT, requests.get.call_args[1]["timeout"])
+            images = Path(tmp) / "k3s-airgap-images-arm64.tar.zst"
+            self.assertEqual(b"images", images.read_bytes())
+
+            requests.get.reset_mock()
+            k3s._fetch_artifacts()
+            requests.get.assert_not_called()
+
+    @mock.patch("enoslib.service.k3s.k3s.requests")
+    def test_fetch_latest_artifacts(self, requests):
+        requests.head.return_value.headers = {
+            "location": "https://github.com/k3s-io/k3s/releases/tag/v1.30.0+k3s1"
+        }
+        response = requests.get.return_value.__enter__.return_value
+        response.iter_content.return_value = [b"artifact"]
+        k3s = K3s(self.master, self.agents, airgap=True)
+        with tempfile.TemporaryDirectory() as tmp, mock.patch(
+            "enoslib.service.k3s.k3s.LOCAL_ARTIFACTS_DIR", Path(tmp)
+        ):
+            # cached under the resolved release, not under "latest"
+            self.assertEqual(
+                (Path(tmp) / "v1.30.0+k3s1").resolve(),
+                k3s._fetch_artifacts().resolve(),
+            )
+            requests.head.assert_called_once_with(
+                K3S_STABLE_CHANNEL, allow_redirects=False, timeout=REQUEST_TIMEOUT
+            )
+            self.assertIn("/v1.30.0%2Bk3s1/k3s", requests.get.call_args_list[1][0][0])
+
+    @mock.patch("enoslib.service.k3s.k3s.actions")
+    def test_join_waves(self, actions):
+        k3s = K3s(self.master, self.agents, join_wave=4)
+        k3s._join_agents("")
+        waves = [c[1]["roles"] for c in actions.call_args_list]
+        self.assertEqual([4, 4, 2], [len(w) for w in waves])
+        self.assertCountEqual(self.agents, [h for w in waves for h in w])
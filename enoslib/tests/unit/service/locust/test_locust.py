@@ -0,0 +1,124 @@
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from enoslib.api import STATUS_OK, CommandResult, Results
+from enoslib.objects import Host
+from enoslib.service.locust.locust import (
+    STATS_HISTORY,
+    Locust,
+    _digest_dir,
+    _exceeds,
+)
+from enoslib.tests.unit import EnosTest
+
+HEADER = (
+    "Timestamp,User Count,Type,Name,Requests/s,Failures/s,50%,95%,"
+    "Total Request Count,Total Failure Count"
+)
+
+
+def _row(timestamp, p95, requests, failures, name="Aggregated"):
+    return f"{timestamp},10,,{name},1.0,0.0,10,{p95},{requests},{failures}"
+
+
+@mock.patch("enoslib.service.locust.locust.time.sleep")
+class TestLocustStats(EnosTest):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.locust = Locust(
+            Host("1.2.3.4"), [Host("1.2.3.5")], backup_dir=Path(self._tmp.name)
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _stream(self, polls, **kwargs):
+        with mock.patch.object(
+            self.locust, "_poll_stats", side_effect=polls
+        ) as poll, mock.patch.object(self.locust, "destroy") as destroy:
+            self.locust._stream_stats(
+                1, lambda row: _exceeds(row, kwargs.get("latency"), "95%", None)
+            )
+        return poll, destroy
+
+    def test_stream(self, _):
+        polls = [
+            (True, []),
+            (True, [HEADER, _row(1, 20, 10, 0), "2,10,"]),
+            (False, [_row(2, 25, 20, 0), _row(3, "N/A", 30, 1)]),
+        ]
+        poll, destroy = self._stream(polls)
+        # the partial line is read again
+        self.assertEqual([0, 0, 2], [c[0][0] for c in poll.call_args_list])
+        destroy.assert_not_called()
+        self.assertFalse(self.locust.stopped_early)
+        self.assertEqual(3, len(self.locust.history))
+        self.assertEqual(30.0, self.locust.history[2]["Total Request Count"])
+        self.assertIsNone(self.locust.history[2]["95%"])
+        local = Path(self._tmp.name) / self.locust.bench_id / STATS_HISTORY
+        self.assertEqual(4, len(local.read_text().splitlines()))
+
+    def test_early_stop(self, _):
+        polls = [
+            (True, [HEADER, _row(1, 20, 10, 0), _row(2, 800, 20, 0), "3,"]),
+        ]
+        _, destroy = self._stream(polls, latency=500)
+        destroy.assert_called_once()
+        self.assertTrue(self.locust.stopped_early)
+
+    def test_thresholds(self, _):
+        def parsed(*args, **kwargs):
+            row = dict(zip(HEADER.split(","), _row(*args, **kwargs).split(",")))
+            return {
+                k: float(v) if k[0].isdigit() or "Total" in k else v
+                for k, v in row.items()
+            }
+
+        self.assertTrue(_exceeds(parsed(1, 600, 10, 0), 500, "95%", None))
+        self.assertFalse(_exceeds(parsed(1, 400, 10, 0), 500, "95%", None))
+        self.assertTrue(_exceeds(parsed(1, 10, 10, 2), None, "95%", 0.1))
+        self.assertFalse(_exceeds(parsed(1, 10, 10, 1), None, "95%", 0.1))
+        self.assertFalse(_exceeds(parsed(1, 600, 10, 9, name="/"), 500, "95%", 0.1))
+
+    @mock.patch("enoslib.service.locust.locust.run_command")
+    def test_poll(self, run_command, _):
+        run_command.return_value = Results(
+            [
+                CommandResult(
+                    "1.2.3.4", "poll", STATUS_OK, {"stdout": f"running\n{HEADER}"}
+                )
+            ]
+        )
+        running, lines = self.locust._poll_stats(0)
+        self.assertTrue(running)
+        self.assertEqual([HEADER], lines)
+        self.assertIn("tail -n +1 ", run_command.call_args[0][0])
+
+
+class TestLocustDeployment(EnosTest):
+    def test_digest_dir(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            expe = Path(tmp)
+            (expe / "locustfile.py").write_text("pass")
+            (expe / "lib").mkdir()
+            (expe / "lib" / "a.py").write_text("a = 1")
+            digest = _digest_dir(expe)
+            self.assertEqual(digest, _digest_dir(expe))
+            (expe / "lib" / "a.py").write_text("a = 2")
+            self.assertNotEqual(digest, _digest_dir(expe))
+
+    def test_workers_cmd(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            locust = Locust(
+                Host("1.2.3.4"),
+                [Host("1.2.3.5")],
+                worker_density=4,
+                backup_dir=Path(tmp),
+            )
+        cmd = locust._workers_cmd("/expe/locustfile.py")
+        # a single detached process tree per node
+        self.assertTrue(cmd.startswith("nohup setsid sh -c "))
+        self.assertIn("$(seq 0 3)", cmd)
+        self.assertIn("taskset -c $((i % n))", cmd)
+        self.assertIn("--master-host=1.2.3.4", cmd)
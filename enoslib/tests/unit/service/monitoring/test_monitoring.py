@@ -0,0 +1,226 @@
+import json
+import tempfile
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import List
+from unittest import mock
+
+from enoslib.api import STATUS_OK, CommandResult, Results
+from enoslib.errors import EnosError
+from enoslib.objects import Host
+from enoslib.service.monitoring.monitoring import (
+    INFLUXDB_LAST_BACKUP,
+    PROMETHEUS_MAX_POINTS,
+    QUERY_TIMEOUT,
+    TIGMonitoring,
+    TPGMonitoring,
+)
+from enoslib.tests.unit import EnosTest
+from enoslib.utils import TunnelPool
+
+
+@mock.patch("enoslib.service.monitoring.monitoring.external_pip_deps")
+@mock.patch("enoslib.service.monitoring.monitoring.run_ansible")
+class TestOnlineBackup(EnosTest):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.backup_dir = Path(self._tmp.name)
+        self.collector = Host("1.2.3.4")
+        self.agents = [Host("1.2.3.5")]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _date(self, date):
+        return Results(
+            [
+                CommandResult(
+                    "1.2.3.4",
+                    # the name recorded by Ansible for a task of a role
+                    "influxdb : enoslib_backup_date",
+                    STATUS_OK,
+                    {"stdout": date, "rc": 0},
+                )
+            ]
+        )
+
+    def test_tig_incremental(self, run_ansible, _):
+        tig = TIGMonitoring(self.collector, self.agents, backup_dir=self.backup_dir)
+        run_ansible.return_value = self._date("2024-01-01T00:00:00Z")
+        tig.backup(incremental=True)
+        extra_vars = run_ansible.call_args[1]["extra_vars"]
+        self.assertTrue(extra_vars["backup_incremental"])
+        self.assertEqual("", extra_vars["backup_since"])
+        self.assertEqual(
+            "2024-01-01T00:00:00Z",
+            (self.backup_dir / INFLUXDB_LAST_BACKUP).read_text(),
+        )
+
+        # the next backup starts where the previous one started
+        run_ansible.return_value = self._date("2024-01-01T01:00:00Z")
+        tig.backup(incremental=True)
+        extra_vars = run_ansible.call_args[1]["extra_vars"]
+        self.assertEqual("2024-01-01T00:00:00Z", extra_vars["backup_since"])
+
+        # offline backup
+        tig.backup()
+        extra_vars = run_ansible.call_args[1]["extra_vars"]
+        self.assertNotIn("backup_incremental", extra_vars)
+
+    def test_tpg_incremental(self, run_ansible, _):
+        tpg = TPGMonitoring(self.collector, self.agents, backup_dir=self.backup_dir)
+        tpg.backup(incremental=True)
+        extra_vars = run_ansible.call_args[1]["extra_vars"]
+        self.assertTrue(extra_vars["backup_incremental"])
+        self.assertEqual("", extra_vars["backup_link_dest"])
+
+        snapshots = self.backup_dir / "snapshots"
+        (snapshots / "20240101T000000Z-1").mkdir()
+        (snapshots / "20240101T010000Z-2").mkdir()
+        tpg.backup(incremental=True)
+        extra_vars = run_ansible.call_args[1]["extra_vars"]
+        self.assertEqual(
+            str((snapshots / "20240101T010000Z-2").resolve()),
+            extra_vars["backup_link_dest"],
+        )
+
+
+@mock.patch("enoslib.service.monitoring.monitoring.requests.get")
+@mock.patch("enoslib.service.monitoring.monitoring.forward_port")
+class TestQuery(EnosTest):
+    def setUp(self):
+        self.collector = Host("1.2.3.4")
+        self.agents = [Host("1.2.3.5")]
+
+    def test_tig_rows(self, tunnel, get):
+        tunnel.return_value.__enter__.return_value = ("127.0.0.1", 1234)
+        chunk = {
+            "results": [
+                {
+                    "series": [
+                        {
+                            "name": "cpu",
+                            "tags": {"host": "h1"},
+                            "columns": ["time", "usage"],
+                            "values": [[1000, 1.0], [2000, 2.0]],
+                        }
+                    ]
+                }
+            ]
+        }
+        get.return_value.iter_lines.return_value = [
+            json.dumps(chunk).encode(),
+            b"",
+            json.dumps({"results": [{}]}).encode(),
+        ]
+        tig = TIGMonitoring(self.collector, self.agents)
+        chunks = list(tig._influx_rows("SELECT * FROM cpu", "telegraf", 2))
+        self.assertEqual(
+            [
+                [
+                    dict(measurement="cpu", host="h1", time=1000, usage=1.0),
+                    dict(measurement="cpu", host="h1", time=2000, usage=2.0),
+                ]
+            ],
+            chunks,
+        )
+        tunnel.assert_called_once_with(self.collector, "1.2.3.4", 8086)
+        params = get.call_args[1]["params"]
+        self.assertEqual(QUERY_TIMEOUT, get.call_args[1]["timeout"])
+        self.assertEqual("true", params["chunked"])
+        self.assertEqual("2", params["chunk_size"])
+
+    def test_tig_error(self, tunnel, get):
+        tunnel.return_value.__enter__.return_value = ("127.0.0.1", 1234)
+        get.return_value.iter_lines.return_value = [
+            json.dumps({"results": [{"error": "boom"}]}).encode()
+        ]
+        tig = TIGMonitoring(self.collector, self.agents)
+        with self.assertRaises(EnosError):
+            list(tig._influx_rows("SELECT", "telegraf", 2))
+
+    def test_tig_range_query(self, *_):
+        self.assertEqual(
+            'SELECT * FROM "cpu" WHERE time >= 1000ms AND time < 2000ms',
+            TIGMonitoring.range_query("cpu", 1, 2),
+        )
+        self.assertEqual(
+            'SELECT max("usage") AS "usage" FROM "cpu" '
+            "WHERE time >= 1000ms AND time < 2000ms AND (\"host\" = 'h1') "
+            "GROUP BY time(1m), * fill(none)",
+            TIGMonitoring.range_query(
+                "cpu",
+                datetime.fromtimestamp(1),
+                2,
+                fields=["usage"],
+                every="1m",
+                aggregate="max",
+                where="\"host\" = 'h1'",
+            ),
+        )
+
+    def test_tpg_rows(self, tunnel, get):
+        tunnel.return_value.__enter__.return_value = ("127.0.0.1", 1234)
+        get.return_value.json.return_value = {
+            "status": "success",
+            "data": {"result": [{"metric": {"host": "h1"}, "values": [[1, "0.5"]]}]},
+        }
+        tpg = TPGMonitoring(self.collector, self.agents)
+        # 2 windows of PROMETHEUS_MAX_POINTS steps
+        chunks = list(
+            tpg._prometheus_rows(
+                "cpu", 0, PROMETHEUS_MAX_POINTS * 1.5, 1, ["host"], "avg"
+            )
+        )
+        self.assertEqual([[dict(host="h1", timestamp=1, value=0.5)]] * 2, chunks)
+        self.assertEqual(2, get.call_count)
+        params = [c[1]["params"] for c in get.call_args_list]
+        self.assertEqual(
+            [QUERY_TIMEOUT] * 2, [c[1]["timeout"] for c in get.call_args_list]
+        )
+        self.assertEqual("avg by (host) (cpu)", params[0]["query"])
+        self.assertEqual(str(float(PROMETHEUS_MAX_POINTS)), params[0]["end"])
+        self.assertEqual(str(PROMETHEUS_MAX_POINTS + 1.0), params[1]["start"])
+
+
+@mock.patch("enoslib.service.monitoring.monitoring.requests.get")
+class TestConcurrentQueries(EnosTest):
+    def setUp(self):
+        self.connecting = threading.Event()
+        self.unblock = threading.Event()
+        self.unblocked: List[bool] = []
+
+        def _connect(gateway, *args):
+            # the SSH handshake with 1.2.3.4 hangs until self.unblock is set
+            if gateway == "1.2.3.4":
+                self.connecting.set()
+                self.unblocked.append(self.unblock.wait(5))
+            return mock.Mock()
+
+        pool = TunnelPool()
+        mock.patch.object(pool, "_connect", side_effect=_connect).start()
+        mock.patch("enoslib.utils.POOL", pool).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def _rows(self, collector: str) -> List:
+        tpg = TPGMonitoring(Host(collector), [Host("1.2.3.5")])
+        return list(tpg._prometheus_rows("cpu", 0, 1, 1, None, "avg"))
+
+    def test_different_collectors(self, get):
+        get.return_value.json.return_value = {
+            "status": "success",
+            "data": {"result": [{"metric": {}, "values": [[1, "0.5"]]}]},
+        }
+        slow: List = []
+        thread = threading.Thread(target=lambda: slow.extend(self._rows("1.2.3.4")))
+        thread.start()
+        self.assertTrue(self.connecting.wait(5))
+        # the query to the other collector doesn't wait for the first one
+        self.assertEqual([[dict(timestamp=1, value=0.5)]], self._rows("1.2.3.6"))
+        self.unblock.set()
+        thread.join()
+        self.assertEqual([True], self.unblocked)
+        self.assertEqual([[dict(timestamp=1, value=0.5)]], slow)
@@ -0,0 +1,77 @@
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+
+from enoslib.api import STATUS_OK, CommandResult, Results
+from enoslib.objects import Host
+from enoslib.registry.utils import REMOTE_TIMELINE_DIR
+from enoslib.service.planning.planning import KillEvent, PlanningService, StartEvent
+from enoslib.tests.unit import EnosTest
+
+
+class TestAgentBackend(EnosTest):
+    def setUp(self):
+        self.host = Host("1.2.3.4", alias="h1")
+        self.start = datetime.now() + timedelta(minutes=2)
+        self.planning = PlanningService(backend="agent")
+        self.planning.add_event(
+            StartEvent(date=self.start, host=self.host, cmd="sleep 10", name="p1")
+        )
+        self.planning.add_event(
+            KillEvent(date=self.start + timedelta(seconds=1), host=self.host, name="p1")
+        )
+
+    @mock.patch("enoslib.registry.process.actions")
+    def test_deploy(self, actions):
+        self.planning.deploy()
+        # all the timelines are shipped and started in one play
+        actions.assert_called_once()
+        self.assertEqual([self.host], actions.call_args.kwargs["roles"])
+        p = actions.return_value.__enter__.return_value
+        (start,) = p.shell.call_args_list
+        self.assertIn(f"{REMOTE_TIMELINE_DIR}/{self.planning._key}.json", start[0][0])
+        self.assertTrue(start[1]["background"])
+
+    def test_report_not_deployed(self):
+        with self.assertRaises(ValueError):
+            self.planning.report()
+        with self.assertRaises(ValueError):
+            PlanningService().report()
+
+    @mock.patch("enoslib.registry.process.run_command")
+    @mock.patch("enoslib.registry.process.actions")
+    def test_report(self, _, run_command):
+        self.planning.deploy()
+        at = self.start.timestamp()
+        report = dict(
+            done=False,
+            finished=False,
+            events=[dict(name="p1", type="StartEvent", at=at, start=at + 0.01)],
+        )
+        run_command.return_value = Results(
+            [
+                CommandResult(
+                    host="h1",
+                    task="Collecting the timeline reports",
+                    status=STATUS_OK,
+                    payload=dict(stdout=json.dumps(report), rc=0),
+                )
+            ]
+        )
+        (event,) = self.planning.report()
+        self.assertEqual("h1", event["host"])
+        self.assertAlmostEqual(0.01, event["delay"])
+
+    @mock.patch("enoslib.service.planning.planning.ProcessRegistry")
+    @mock.patch("enoslib.service.planning.planning.actions")
+    def test_destroy(self, actions, registry):
+        self.planning.destroy()
+        p = actions.return_value.__enter__.return_value
+        (stop,) = p.shell.call_args_list
+        # pkill mustn't match the shell running it
+        self.assertEqual(
+            f"pkill -f '[/]{REMOTE_TIMELINE_DIR[1:]}/{self.planning._key}.json'"
+            " || true",
+            stop[0][0],
+        )
+        registry.build.return_value.kill.assert_called_once()
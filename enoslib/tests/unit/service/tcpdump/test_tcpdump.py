@@ -0,0 +1,70 @@
+import tempfile
+from unittest import mock
+
+from enoslib.objects import Host
+from enoslib.service.tcpdump import REMOTE_OUTPUT_DIR, TCPDump
+from enoslib.tests.unit import EnosTest
+
+
+class TestTCPDump(EnosTest):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.hosts = [Host("1.2.3.4", alias="h1")]
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_tcpdump_cmd(self):
+        t = TCPDump(self.hosts, ifnames=["eth0"], backup_dir=self._tmp.name)
+        self.assertEqual(
+            f"tcpdump -w {REMOTE_OUTPUT_DIR}/eth0.pcap -i eth0", t._tcpdump_cmd("eth0")
+        )
+
+        t = TCPDump(
+            self.hosts,
+            ifnames=["eth0"],
+            options="port 80",
+            backup_dir=self._tmp.name,
+            rotate_size=100,
+            rotate_seconds=60,
+            rotate_count=10,
+        )
+        self.assertEqual(
+            f"tcpdump -w {REMOTE_OUTPUT_DIR}/eth0.pcap.%Y%m%d-%H%M%S -i eth0 "
+            "-G 60 -C 100 -W 10 -Z root port 80",
+            t._tcpdump_cmd("eth0"),
+        )
+
+    @mock.patch("enoslib.api.run_play")
+    def test_backup_stream(self, run_play):
+        t = TCPDump(self.hosts, ifnames=["eth0"], backup_dir=self._tmp.name)
+        t.backup(stream=True, completed_only=True)
+        (play_source,), _ = run_play.call_args
+        find, sync = play_source["tasks"]
+        self.assertIn(f"ls -t {REMOTE_OUTPUT_DIR}/$i.pcap*", find["shell"])
+        self.assertEqual("tcpdump_current", find["register"])
+        args = sync["ansible.posix.synchronize"]
+        self.assertEqual("pull", args["mode"])
+        self.assertEqual(f"{REMOTE_OUTPUT_DIR}/", args["src"])
+        self.assertEqual(
+            f"{self._tmp.name}/{{{{ inventory_hostname }}}}/", args["dest"]
+        )
+        self.assertIn("tcpdump_current.stdout_lines", args["rsync_opts"])
+
+        # without completed_only, everything is synchronized
+        t.backup(stream=True)
+        (play_source,), _ = run_play.call_args
+        (sync,) = play_source["tasks"]
+        self.assertEqual([], sync["ansible.posix.synchronize"]["rsync_opts"])
+
+    @mock.patch("enoslib.api.run_play")
+    def test_backup_archive(self, run_play):
+        t = TCPDump(self.hosts, ifnames=["eth0"], backup_dir=self._tmp.name)
+        # the default
+        t.backup()
+        (play_source,), _ = run_play.call_args
+        self.assertEqual(
+            ["shell", "fetch"], [list(task)[1] for task in play_source["tasks"]]
+        )
+        with self.assertRaises(ValueError):
+            t.backup(completed_only=True)
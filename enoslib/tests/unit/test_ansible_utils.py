@@ -1,3 +1,4 @@
+from enoslib.config import config_context
 from enoslib.enos_inventory import EnosInventory
 from enoslib.objects import (
     AliasDevice,
@@ -79,6 +80,18 @@ class TestGenerateInventoryString(EnosTest):
             line,
         )
 
+    def test_ssh_multiplexing(self):
+        h = Host("1.2.3.4", extra={"gateway": "4.3.2.1"})
+        with config_context(ssh_multiplexing=True):
+            enos_inventory = EnosInventory(roles={"r1": [h]})
+        host_vars = enos_inventory.get_host("1.2.3.4").vars
+        control_dir = host_vars["ansible_control_path_dir"]
+        self.assertIn("ControlPersist", host_vars["ansible_ssh_args"])
+        self.assertTrue(host_vars["ansible_ssh_pipelining"])
+        self.assertIn(
+            f"-o ControlPath={control_dir}/", host_vars["ansible_ssh_common_args"]
+        )
+
 
 class TestGetHostNet(EnosTest):
     def test_map_devices_with_secondary_ipv4(self):
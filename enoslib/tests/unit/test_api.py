@@ -1,8 +1,32 @@
+import json
+import tempfile
+from pathlib import Path
 from typing import List, Union
 from unittest import mock
 
-from enoslib.api import STATUS_OK, CommandResult, Results, actions, get_hosts, wait_for
-from enoslib.errors import EnosSSHNotReady, EnosUnreachableHostsError
+from enoslib.api import (
+    STATUS_FAILED,
+    STATUS_OK,
+    CommandResult,
+    HostStatus,
+    Results,
+    SpinnerCallback,
+    _AnsibleExecutionRecord,
+    _dump_trace,
+    _fanout_rounds,
+    _MyCallback,
+    actions,
+    distribute,
+    get_hosts,
+    run_ansible,
+    wait_for,
+)
+from enoslib.config import config_context
+from enoslib.errors import (
+    EnosFailedHostsError,
+    EnosSSHNotReady,
+    EnosUnreachableHostsError,
+)
 from enoslib.objects import Host, Roles
 
 from . import EnosTest
@@ -106,3 +130,238 @@ class TestResultFiltering(EnosTest):
             ]
         )
         results.filter(host="host-3")
+
+
+class TestTiming(EnosTest):
+    def test_callback_records_timestamps(self):
+        storage: List = []
+        callback = _MyCallback(storage)
+        host = mock.Mock()
+        host.get_name.return_value = "host-1"
+        task = mock.Mock(_uuid="uuid-1")
+        task.get_name.return_value = "task-1"
+        result = mock.Mock(_host=host, _task=task, _result={"rc": 0})
+
+        with mock.patch("enoslib.api.time.time", side_effect=[10.0, 12.5]):
+            callback.v2_runner_on_start(host, task)
+            callback.v2_runner_on_ok(result)
+
+        (cr,) = Results.from_ansible(storage)
+        self.assertEqual(10.0, cr.start)
+        self.assertEqual(12.5, cr.end)
+        self.assertEqual(2.5, cr.duration)
+        self.assertEqual(10.0, cr.to_dict()["start"])
+
+    def _results(self):
+        return Results(
+            [
+                CommandResult("h1", "t1", STATUS_OK, {}, start=1.0, end=2.0),
+                CommandResult("h2", "t1", STATUS_OK, {}, start=1.5, end=4.0),
+                CommandResult("h1", "t2", STATUS_FAILED, {}, start=4.0, end=5.0),
+                # no timestamp
+                CommandResult("h3", "t2", STATUS_OK, {}),
+            ]
+        )
+
+    def test_spans(self):
+        results = self._results()
+        self.assertEqual({"t1": (1.0, 4.0), "t2": (4.0, 5.0)}, results.spans(by="task"))
+        self.assertEqual({"h1": (1.0, 5.0), "h2": (1.5, 4.0)}, results.spans("host"))
+
+    def test_dump_chrome_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trace = Path(tmp) / "trace.json"
+            with config_context(ansible_trace=trace):
+                _dump_trace(self._results(), 0, 5)
+                _dump_trace(self._results(), 5, 10)
+            # the closing bracket is optional in the format
+            events = json.loads(trace.read_text().rstrip(",\n") + "]")
+        complete = [e for e in events if e["ph"] == "X"]
+        self.assertEqual(6, len(complete))
+        self.assertEqual(
+            {"name": "t1", "ts": 1500000, "dur": 2500000},
+            {k: complete[1][k] for k in ["name", "ts", "dur"]},
+        )
+        self.assertEqual(4, len([e for e in events if e["ph"] == "M"]))
+
+    def test_dump_otlp_trace(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            trace = Path(tmp) / "trace.jsonl"
+            with config_context(ansible_trace=trace, ansible_trace_format="otlp"):
+                _dump_trace(self._results(), 0, 5)
+                _dump_trace(self._results(), 5, 10)
+            lines = trace.read_text().splitlines()
+        self.assertEqual(2, len(lines))
+        spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        root, *children = spans
+        self.assertEqual("0", root["startTimeUnixNano"])
+        self.assertEqual(3, len(children))
+        self.assertTrue(all(c["parentSpanId"] == root["spanId"] for c in children))
+        self.assertEqual([1, 1, 2], [c["status"]["code"] for c in children])
+
+    @mock.patch("enoslib.api._dump_trace")
+    @mock.patch("enoslib.api.PlaybookExecutor")
+    @mock.patch("enoslib.api._load_defaults")
+    def test_trace_on_failure(self, load_defaults, pbex, dump_trace):
+        load_defaults.return_value = (None, mock.Mock(), None)
+        failed = _AnsibleExecutionRecord("h1", STATUS_FAILED, "t1", {"rc": 1})
+
+        def _run_playbook(*args, **kwargs):
+            # records the failure (through the callback) while running
+            callback = pbex.return_value._tqm._callback_plugins.append.call_args[0][0]
+            callback.storage.append(failed)
+
+        pbex.return_value.run.side_effect = _run_playbook
+        with self.assertRaises(EnosFailedHostsError):
+            run_ansible(["playbook.yml"], roles=[Host("h1")])
+        dump_trace.assert_called_once()
+        (result,) = dump_trace.call_args[0][0]
+        self.assertEqual(("h1", STATUS_FAILED), (result.host, result.status))
+
+    def test_no_trace_by_default(self):
+        with mock.patch.object(Results, "to_chrome_trace") as m:
+            _dump_trace(self._results(), 0, 5)
+            m.assert_not_called()
+
+
+class TestSpinnerCallback(EnosTest):
+    @mock.patch("enoslib.api.Status")
+    def test_summary_large_host_set(self, status_cls):
+        callback = SpinnerCallback()
+        task = mock.Mock()
+        task.get_name.return_value = "task"
+        hosts = [mock.Mock() for _ in range(1000)]
+        for i, host in enumerate(hosts):
+            host.name = f"host-{i}"
+            callback.v2_runner_on_start(host, task)
+        for i, host in enumerate(hosts[:-2]):
+            result = mock.Mock(task_name="task", _host=host)
+            if i % 100 == 0:
+                callback.v2_runner_on_failed(result)
+            else:
+                callback.v2_runner_on_ok(result)
+
+        # redraws are throttled
+        self.assertLess(status_cls.return_value.update.call_count, 100)
+
+        rendered = callback._render("task")
+        self.assertIn("on 1000 hosts", rendered)
+        self.assertIn("2 neutral", rendered)
+        self.assertIn("10 failed", rendered)
+        self.assertIn("slowest: host-998", rendered)
+        self.assertIn("failed (10)[/red]: host-700, host-800, host-900", rendered)
+        self.assertNotIn("host-1 ", rendered)
+
+        statuses = callback.hosts_status("task")
+        self.assertEqual(1000, len(statuses))
+        self.assertEqual(HostStatus.FAILED, statuses["host-0"])
+        self.assertEqual(HostStatus.NEUTRAL, statuses["host-999"])
+
+    @mock.patch("enoslib.api.Status")
+    def test_small_host_set(self, status_cls):
+        callback = SpinnerCallback()
+        task = mock.Mock()
+        task.get_name.return_value = "task"
+        host = mock.Mock()
+        host.name = "host-0"
+        callback.v2_runner_on_start(host, task)
+        callback.v2_runner_on_ok(mock.Mock(task_name="task", _host=host))
+        self.assertEqual(
+            "[bold blue]Running[/bold blue] [magenta]task[/magenta] "
+            "on [green]host-0[/green]",
+            callback._render("task"),
+        )
+
+
+class TestDistribute(EnosTest):
+    def setUp(self):
+        self.hosts = [Host(f"1.2.3.{i}", alias=f"n{i}") for i in range(5)]
+        self._tmp = tempfile.NamedTemporaryFile()
+        self._tmp.write(b"payload")
+        self._tmp.flush()
+        # sha256 of "payload"
+        self.digest = "239f59ed55e737c77147cf55ad0c1b030b6d7ee748a7426952f9b852d5a935e5"
+
+    def tearDown(self):
+        self._tmp.close()
+
+    def test_fanout_rounds(self):
+        rounds = _fanout_rounds(self.hosts[:1], self.hosts[1:], 1)
+        # 1 -> 2 -> 4 -> 5 hosts
+        self.assertEqual([1, 2, 1], [len(r) for r in rounds])
+        served = self.hosts[:1]
+        for r in rounds:
+            # sources already have the file and serve at most 1 peer
+            self.assertTrue(all(source in served for source in r.values()))
+            self.assertEqual(len(r), len(set(r.values())))
+            served.extend(r)
+        self.assertCountEqual(self.hosts, served)
+
+    def _distribute(self, up_to_date, **kwargs):
+        results = Results(
+            [
+                CommandResult(
+                    str(h.alias),
+                    "check",
+                    STATUS_OK,
+                    {"stdout": f"{self.digest}  /dest" if h in up_to_date else ""},
+                )
+                for h in self.hosts
+            ]
+        )
+        with mock.patch("enoslib.api.run_command", return_value=results), mock.patch(
+            "enoslib.api.actions"
+        ) as actions:
+            received = distribute(self._tmp.name, "/dest", self.hosts, **kwargs)
+        self.actions = actions
+        return received, [c[1]["roles"] for c in actions.call_args_list]
+
+    def test_distribute(self):
+        received, plays = self._distribute(self.hosts[:1], fanout=2)
+        self.assertEqual(self.hosts[1:], received)
+        # the up-to-date host serves, no seed is needed
+        self.assertEqual(
+            [self.hosts[:1], self.hosts[1:3], self.hosts[3:], self.hosts], plays
+        )
+
+    def test_distribute_seeds(self):
+        received, plays = self._distribute([], seeds=2, fanout=2)
+        self.assertEqual(self.hosts, received)
+        # copy to the seeds, serve, 1 round, stop
+        self.assertEqual(
+            [self.hosts[:2], self.hosts[:2], self.hosts[2:], self.hosts], plays
+        )
+
+    def test_distribute_up_to_date(self):
+        received, plays = self._distribute(self.hosts)
+        self.assertEqual([], received)
+        self.assertEqual([], plays)
+
+    def test_distribute_kwargs(self):
+        networks = [mock.Mock()]
+        with mock.patch("enoslib.api.get_address", return_value="10.0.0.1") as ga:
+            self._distribute(
+                self.hosts[:1],
+                fanout=4,
+                networks=networks,
+                extra_vars=dict(foo="bar"),
+                gather_facts=True,
+            )
+        ga.assert_called_with(self.hosts[0], networks)
+        for c in self.actions.call_args_list:
+            self.assertFalse(c[1]["gather_facts"])
+            self.assertEqual("bar", c[1]["extra_vars"]["foo"])
+        # the peers reach their source on the given networks
+        sources = self.actions.call_args_list[1][1]["extra_vars"][
+            "enoslib_distribute_sources"
+        ]
+        self.assertEqual({f"n{i}": "10.0.0.1" for i in range(1, 5)}, sources)
+
+    def test_distribute_ipv6(self):
+        with mock.patch("enoslib.api.get_address", return_value="2001:db8::1"):
+            self._distribute(self.hosts[:1], fanout=4)
+        sources = self.actions.call_args_list[1][1]["extra_vars"][
+            "enoslib_distribute_sources"
+        ]
+        # the url of the source is http://[2001:db8::1]:<port>/<digest>
+        self.assertEqual({f"n{i}": "[2001:db8::1]" for i in range(1, 5)}, sources)
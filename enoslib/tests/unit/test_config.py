@@ -0,0 +1,59 @@
+import threading
+
+from enoslib.config import config_context, get_config, set_config
+
+from . import EnosTest
+
+
+class TestConfig(EnosTest):
+    def setUp(self):
+        self.forks = get_config()["ansible_forks"]
+
+    def tearDown(self):
+        set_config(ansible_forks=self.forks)
+
+    def test_read_only(self):
+        with self.assertRaises(TypeError):
+            get_config()["ansible_forks"] = 42  # type: ignore[index]
+        # no copy
+        self.assertIs(get_config(), get_config())
+
+    def test_set_config_is_global(self):
+        set_config(ansible_forks=42)
+        seen = []
+        t = threading.Thread(target=lambda: seen.append(get_config()["ansible_forks"]))
+        t.start()
+        t.join()
+        self.assertEqual([42], seen)
+
+    def test_config_context(self):
+        before = get_config()
+        with config_context(ansible_forks=42, dump_results=None):
+            self.assertEqual(42, get_config()["ansible_forks"])
+            # set_config in a context stays in the context
+            set_config(display="text")
+            self.assertEqual("text", get_config()["display"])
+            with config_context(ansible_forks=43):
+                self.assertEqual(43, get_config()["ansible_forks"])
+            self.assertEqual(42, get_config()["ansible_forks"])
+        self.assertIs(before, get_config())
+
+    def test_config_context_thread_local(self):
+        entered = threading.Event()
+        release = threading.Event()
+        seen = []
+
+        def _in_context():
+            with config_context(ansible_forks=42):
+                entered.set()
+                release.wait(5)
+                seen.append(get_config()["ansible_forks"])
+
+        t = threading.Thread(target=_in_context)
+        t.start()
+        entered.wait(5)
+        # the other thread's context isn't visible here
+        self.assertEqual(self.forks, get_config()["ansible_forks"])
+        release.set()
+        t.join()
+        self.assertEqual([42], seen)
@@ -0,0 +1,40 @@
+import json
+from unittest.mock import patch
+
+from enoslib.api import STATUS_FAILED, STATUS_OK, CommandResult, Results
+from enoslib.docker import get_dockers
+from enoslib.objects import Host, Roles
+
+from . import EnosTest
+
+
+class TestGetDockers(EnosTest):
+    @patch("enoslib.docker.run_command")
+    def test_get_dockers(self, mock_run_command):
+        h1 = Host("1.2.3.4", alias="h1", user="root")
+        h2 = Host("1.2.3.5", alias="h2")
+        h3 = Host("1.2.3.6", alias="h3")
+        roles = Roles(r1=[h1, h2], r2=[h3])
+
+        def _result(host, status, stdout, rc):
+            return CommandResult(
+                host=host,
+                task="docker",
+                status=status,
+                payload=dict(stdout=stdout, rc=rc),
+            )
+
+        mock_run_command.return_value = Results(
+            [
+                _result(
+                    "h1", STATUS_OK, json.dumps([{"Name": "/c1"}, {"Name": "/c2"}]), 0
+                ),
+                # no container
+                _result("h2", STATUS_OK, "", 0),
+                # no docker
+                _result("h3", STATUS_FAILED, "", 127),
+            ]
+        )
+        dockers = get_dockers(roles)
+        self.assertEqual(["/c1-h1", "/c2-h1"], [d.alias for d in dockers])
+        self.assertEqual("root@1.2.3.4", dockers[0].remote)
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+from enoslib.api import _CachedFacts, _skip_cached_facts
+from enoslib.config import config_context
+from enoslib.fact_cache import FactCache, covers, get_fact_cache
+
+from . import EnosTest
+
+
+class TestFactCache(EnosTest):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = FactCache(self._tmp.name, ttl=60)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_get_set(self):
+        self.assertIsNone(self.cache.get("h1"))
+        self.cache.set("h1", {"gather_subset": ["all"], "ansible_hostname": "h1"})
+        facts = self.cache.get("h1")
+        assert facts is not None
+        self.assertEqual("h1", facts["ansible_hostname"])
+        # jsonfile layout: one file per host alias
+        self.assertEqual(["h1"], os.listdir(self._tmp.name))
+
+    def test_ttl(self):
+        self.cache.set("h1", {"gather_subset": ["all"]})
+        past = time.time() - 120
+        os.utime(os.path.join(self._tmp.name, "h1"), (past, past))
+        self.assertIsNone(FactCache(self._tmp.name, ttl=60).get("h1"))
+        # no expiration
+        self.assertIsNotNone(FactCache(self._tmp.name, ttl=0).get("h1"))
+
+    def test_memory(self):
+        self.cache.set("h1", {"gather_subset": ["all"]})
+        cache = FactCache(self._tmp.name, ttl=60)
+        with mock.patch(
+            "pathlib.Path.stat", autospec=True, side_effect=Path.stat
+        ) as stat:
+            self.assertIsNotNone(cache.get("h1"))
+            self.assertIsNotNone(cache.get("h1"))
+            self.assertIsNone(cache.get("h2"))
+            self.assertIsNone(cache.get("h2"))
+        # the entries (even missing) are looked up once
+        self.assertEqual(2, stat.call_count)
+
+    def test_cached_facts(self):
+        self.cache.set("h1", {"gather_subset": ["all"], "ansible_hostname": "h1"})
+        self.cache.set("h2", {"gather_subset": ["all"]})
+        facts = _CachedFacts({"h3": {}}, self.cache)
+        with mock.patch.object(self.cache, "get", wraps=self.cache.get) as get:
+            self.assertEqual("h1", facts.get("h1", {})["ansible_hostname"])
+            facts["h1"].update(ansible_hostname="new")
+            self.assertEqual("new", facts["h1"]["ansible_hostname"])
+            self.assertNotIn("h4", facts)
+            self.assertIsNone(facts.pop("h4", None))
+            self.assertEqual({}, facts["h3"])
+        get.assert_has_calls([mock.call("h1"), mock.call("h4")])
+        self.assertEqual(2, get.call_count)
+        # the cached facts aren't modified in place
+        cached = self.cache.get("h1")
+        assert cached is not None
+        self.assertEqual("h1", cached["ansible_hostname"])
+        self.assertEqual({"h1", "h3"}, set(facts))
+
+    def test_subsets(self):
+        self.assertTrue(covers({"gather_subset": ["all"]}, "network"))
+        self.assertTrue(covers({"gather_subset": ["network", "min"]}, "min,network"))
+        self.assertFalse(covers({"gather_subset": ["min"]}, "all"))
+        self.assertFalse(covers({}, "min"))
+
+        self.cache.set("h1", {"gather_subset": ["network"]})
+        self.assertIsNotNone(self.cache.get("h1", "network"))
+        self.assertIsNone(self.cache.get("h1", "all"))
+
+    def test_invalidate(self):
+        self.cache.set("h1", {"gather_subset": ["network"]})
+        self.cache.set("h2", {"gather_subset": ["hardware"]})
+        self.cache.set("h3", {"gather_subset": ["all"]})
+        self.cache.invalidate(gather_subset="network")
+        self.assertIsNone(self.cache.get("h1"))
+        self.assertIsNotNone(self.cache.get("h2"))
+        self.assertIsNone(self.cache.get("h3"))
+
+        self.cache.invalidate(["h2"])
+        self.assertIsNone(self.cache.get("h2"))
+
+    def test_skip_cached_facts(self):
+        task = dict(name="Gather facts", setup="")
+        self.assertIsNone(get_fact_cache())
+        self.assertEqual(task, _skip_cached_facts(task))
+        with config_context(fact_cache=self._tmp.name, fact_cache_ttl=10):
+            cache = get_fact_cache()
+            assert cache is not None
+            self.assertEqual(10, cache.ttl)
+            # the cache is kept between the calls
+            self.assertIs(cache, get_fact_cache())
+            skipped = _skip_cached_facts(task, "min,network")
+        self.assertIn("['min', 'network'] | difference", skipped["when"])
@@ -1,3 +1,8 @@
+import json
+from typing import Dict
+
+import yaml
+
 from enoslib.docker import DockerHost
 from enoslib.local import LocalHost
 from enoslib.objects import DefaultNetwork, Host, HostsView, IPAddress, NetDevice, Roles
@@ -215,6 +220,30 @@ class TestEqHosts(EnosTest):
 
         self.assertDictEqual(extra, h.reset_extra().get_extra())
 
+    def test_extra_deep_copies(self):
+        extra: Dict = {"key": "value", "nested": {"a": [1]}}
+        h = TestEqHosts._make_host(extra)
+        # a plain dict
+        self.assertIs(dict, type(h.extra))
+        self.assertEqual(extra, json.loads(json.dumps(h.extra)))
+        self.assertEqual(extra, yaml.safe_load(yaml.safe_dump(h.extra)))
+
+        # nested values aren't shared
+        extra["nested"]["a"].append(2)
+        self.assertEqual([1], h.extra["nested"]["a"])
+        h.get_extra()["nested"]["a"].append(3)
+        h.to_dict()["extra"]["nested"]["a"].append(4)
+        self.assertEqual([1], h.extra["nested"]["a"])
+        h.extra["nested"]["a"].append(5)
+        self.assertEqual([1], h.reset_extra().extra["nested"]["a"])
+
+        # the references shared inside the extra vars are kept
+        shared = [1]
+        h = TestEqHosts._make_host(dict(a=shared, b=shared))
+        self.assertIs(h.extra["a"], h.extra["b"])
+        copy = h.get_extra()
+        self.assertIs(copy["a"], copy["b"])
+
     def test_dont_remove_special_host(self):
         localhost = LocalHost()
         extra = dict(ansible_connection="local")
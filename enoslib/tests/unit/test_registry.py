@@ -0,0 +1,152 @@
+import json
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+from enoslib.api import STATUS_OK, CommandResult, Results
+from enoslib.objects import Host
+from enoslib.registry import timeline_agent
+from enoslib.registry.process import (
+    ProcessGroup,
+    ProcessRegistry,
+    collect_timeline_reports,
+)
+from enoslib.registry.utils import State
+
+from . import EnosTest
+
+
+class TestTimelineAgent(EnosTest):
+    def test_timeline(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            timeline_path = Path(tmp_dir) / "timeline.json"
+            report_path = Path(tmp_dir) / "report.json"
+            now = time.time()
+            timeline = [
+                dict(group="b", at=now + 0.2, cmd="exit 3"),
+                dict(group="a", at=now + 0.1, cmd="true"),
+            ]
+            timeline_path.write_text(json.dumps(timeline))
+
+            timeline_agent.main(str(timeline_path), str(report_path))
+
+            report = json.loads(report_path.read_text())
+            self.assertTrue(report["done"])
+            self.assertTrue(report["finished"])
+            events = report["events"]
+            self.assertEqual(["a", "b"], [e["group"] for e in events])
+            self.assertEqual([0, 3], [e["rc"] for e in events])
+            for event in events:
+                self.assertGreaterEqual(event["start"], event["at"])
+                self.assertLess(event["start"] - event["at"], 0.1)
+                self.assertGreaterEqual(event["end"], event["start"])
+
+
+class TestProcessRegistry(EnosTest):
+    def setUp(self):
+        self.host1 = Host("1.2.3.4")
+        self.host2 = Host("1.2.3.5")
+        self.processes = [
+            ProcessGroup("p1", self.host1),
+            ProcessGroup("p2", self.host1),
+            ProcessGroup("p3", self.host2),
+            ProcessGroup("p4", self.host2, state=State.DEAD),
+        ]
+        self.registry = ProcessRegistry(list(self.processes))
+
+    def test_lookup(self):
+        registry = self.registry.lookup([self.host2])
+        self.assertEqual(self.processes[2:], registry.processes)
+        self.assertEqual(2, registry.size)
+
+    @patch("enoslib.registry.process.actions")
+    def test_kill_incr_on_node(self, mock_actions):
+        schedule = self.registry.kill_incr_on_node(
+            number=2, interval=timedelta(milliseconds=500)
+        )
+        self.assertEqual(2, len(schedule))
+        self.assertAlmostEqual(0.5, schedule[1]["at"] - schedule[0]["at"])
+        # only alive processes are killed
+        self.assertNotIn("p4", [s["group"] for s in schedule])
+        # one single play for all the hosts
+        self.assertEqual(1, mock_actions.call_count)
+        hosts = mock_actions.call_args.kwargs["roles"]
+        timelines = mock_actions.call_args.kwargs["extra_vars"]["enoslib_timelines"]
+        for host in hosts:
+            timeline = timelines[host.alias]
+            self.assertTrue(
+                all(e["group"] in [s["group"] for s in schedule] for e in timeline)
+            )
+            # the hosts aren't modified
+            self.assertNotIn("enoslib_timelines", host.extra)
+
+    @patch("enoslib.registry.process.actions")
+    def test_kill_incr_on_node_late(self, mock_actions):
+        with self.assertLogs("enoslib.registry.process", level="WARNING") as logs:
+            self.registry.kill_incr_on_node(number=1, start_in=timedelta(seconds=0))
+        self.assertIn("after their first event", logs.output[0])
+
+    def _report(self, host, finished=True):
+        report = dict(done=True, finished=finished, events=[])
+        return CommandResult(
+            host=host,
+            task="Collecting the timeline reports",
+            status=STATUS_OK,
+            payload=dict(stdout=json.dumps(report), rc=0),
+        )
+
+    @patch("enoslib.registry.process.time.sleep")
+    @patch("enoslib.registry.process.run_command")
+    def test_collect_timeline_reports_wait(self, mock_run_command, _):
+        mock_run_command.side_effect = [
+            # no report yet from 1.2.3.5
+            Results([self._report("1.2.3.4", finished=False)]),
+            Results([self._report("1.2.3.4"), self._report("1.2.3.5")]),
+        ]
+        collect_timeline_reports([self.host1, self.host2], "report", wait=True)
+        self.assertEqual(2, mock_run_command.call_count)
+        # the missing hosts are retried
+        self.assertEqual(
+            [self.host1, self.host2], mock_run_command.call_args.kwargs["roles"]
+        )
+
+    @patch("enoslib.registry.process.time.sleep")
+    @patch("enoslib.registry.process.run_command")
+    def test_collect_timeline_reports_timeout(self, mock_run_command, _):
+        mock_run_command.return_value = Results([self._report("1.2.3.4")])
+        with self.assertLogs("enoslib.registry.process", level="WARNING") as logs:
+            collect_timeline_reports(
+                [self.host1, self.host2], "report", wait=True, timeout=0
+            )
+        self.assertEqual(1, mock_run_command.call_count)
+        self.assertIn("1.2.3.5", logs.output[0])
+
+    @patch("enoslib.registry.process.run_command")
+    @patch("enoslib.registry.process.actions")
+    def test_collect_kill_reports(self, mock_actions, mock_run_command):
+        schedule = self.registry.kill_incr_on_node(
+            number=1, start_in=timedelta(seconds=0)
+        )
+        victim = schedule[0]
+        report = dict(
+            done=True,
+            finished=True,
+            events=[dict(group=victim["group"], at=victim["at"], start=1, end=2, rc=0)],
+        )
+        mock_run_command.return_value = Results(
+            [
+                CommandResult(
+                    host=victim["host"],
+                    task="Collecting the timeline reports",
+                    status=STATUS_OK,
+                    payload=dict(stdout=json.dumps(report), rc=0),
+                )
+            ]
+        )
+        reports = self.registry.collect_kill_reports()
+        self.assertEqual(1, len(reports))
+        self.assertEqual(victim["host"], reports[0]["host"])
+        dead = [p.group for p in self.registry.processes if not p.isalive()]
+        self.assertCountEqual(["p4", victim["group"]], dead)
@@ -7,9 +7,17 @@ from unittest.mock import patch
 import yaml
 from ddt import data, ddt
 
-from enoslib.constants import ENV_FILENAME, SYMLINK_NAME
+from enoslib.config import config_context
+from enoslib.constants import ENV_FILENAME, ENV_STORE_DIRNAME, SYMLINK_NAME
 from enoslib.errors import EnosFilePathError
-from enoslib.task import Environment, _symlink_to, enostask, get_or_create_env
+from enoslib.task import (
+    Environment,
+    LazyEnvironment,
+    _atomic_write,
+    _symlink_to,
+    enostask,
+    get_or_create_env,
+)
 
 from . import EnosTest
 
@@ -199,3 +207,88 @@ class TestEnosTask(EnosTest):
 
         # specifying an env as a string (relative path)
         top_task(env=env_specifier)
+
+
+class TestLazyEnvironment(EnosTest):
+    def test_round_trip(self):
+        with into_tmp_dir():
+            env = LazyEnvironment(Path("xp1"))
+            env["foo"] = {"bar": 1}
+            env.dump()
+            env = Environment.load_from_file(Path("xp1").joinpath(ENV_FILENAME))
+            self.assertIsInstance(env, LazyEnvironment)
+            # nothing is unpickled until accessed
+            self.assertEqual({}, env.data.cache)
+            self.assertIn("foo", env)
+            self.assertEqual({"bar": 1}, env["foo"])
+            self.assertEqual(Path("xp1").resolve(), env["resultdir"])
+
+    def test_only_modified_keys_are_written(self):
+        with into_tmp_dir():
+            env = LazyEnvironment(Path("xp1"))
+            env["foo"] = [1]
+            env["bar"] = [2]
+            env.dump()
+            env = Environment.load_from_file(Path("xp1").joinpath(ENV_FILENAME))
+            with patch(
+                "enoslib.task._atomic_write", wraps=_atomic_write
+            ) as atomic_write:
+                env["foo"].append(3)
+                self.assertEqual([2], env["bar"])
+                env.dump()
+            # foo (in place modification) and the environment file
+            self.assertEqual(2, atomic_write.call_count)
+            env = Environment.load_from_file(Path("xp1").joinpath(ENV_FILENAME))
+            self.assertEqual([1, 3], env["foo"])
+
+    def test_shared_values_are_copied(self):
+        with into_tmp_dir():
+            env = LazyEnvironment(Path("xp1"))
+            shared = [1]
+            env["foo"] = shared
+            env["bar"] = dict(shared=shared)
+            env["both"] = (shared, dict(shared=shared))
+            env.dump()
+            env = Environment.load_from_file(Path("xp1").joinpath(ENV_FILENAME))
+            # each key is pickled separately
+            self.assertIsNot(env["foo"], env["bar"]["shared"])
+            env["foo"].append(2)
+            self.assertEqual([1], env["bar"]["shared"])
+            # the references within a key are kept
+            values, mapping = env["both"]
+            self.assertIs(values, mapping["shared"])
+
+    def test_delete_key(self):
+        with into_tmp_dir():
+            env = LazyEnvironment(Path("xp1"))
+            env["foo"] = "bar"
+            env.dump()
+            store = Path("xp1").joinpath(ENV_STORE_DIRNAME)
+            count = len(list(store.iterdir()))
+            del env["foo"]
+            env.dump()
+            self.assertEqual(count - 1, len(list(store.iterdir())))
+            env = Environment.load_from_file(Path("xp1").joinpath(ENV_FILENAME))
+            self.assertNotIn("foo", env)
+
+    def test_enostask_lazy(self):
+        @enostask(new=True)
+        def create(env=None):
+            self.assertIsInstance(env, LazyEnvironment)
+            env["foo"] = "bar"
+
+        @enostask()
+        def check(env=None):
+            self.assertEqual("bar", env["foo"])
+
+        with into_tmp_dir():
+            with config_context(env_store="lazy"):
+                create(env="xp1")
+            check(env="xp1")
+
+    def test_legacy_env_with_lazy_store(self):
+        with dummy_env("xp1"):
+            with config_context(env_store="lazy"):
+                env = get_or_create_env(False, "xp1")
+            self.assertNotIsInstance(env, LazyEnvironment)
+            self.assertEqual(Path("xp1").resolve(), env["resultdir"])
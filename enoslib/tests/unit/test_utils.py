@@ -1,7 +1,13 @@
+import re
+import socket
+import tempfile
+import threading
 from typing import List, Tuple
+from unittest import mock
 
+from enoslib.objects import Host
 from enoslib.tests.unit import EnosTest
-from enoslib.utils import generate_ssh_option_gateway
+from enoslib.utils import TunnelPool, forward_port, generate_ssh_option_gateway
 
 
 class TestSSHGateways(EnosTest):
@@ -79,3 +85,188 @@ class TestSSHGateways(EnosTest):
             'gwB"',
             result,
         )
+
+    def test_gateways_multiplexing(self):
+        args = [("gwA", "userA", None), ("gwB", "userB", None)]
+        result = generate_ssh_option_gateway(args, control_path_dir="/tmp/cp")
+        paths = re.findall(r"-o ControlPath=(\S+)", result)
+        # one socket per gateway, no ssh token
+        self.assertEqual(2, len(paths))
+        self.assertNotEqual(paths[0], paths[1])
+        for path in paths:
+            self.assertTrue(path.startswith("/tmp/cp/"))
+            self.assertNotIn("%", path)
+        self.assertEqual(2, result.count("-o ControlMaster=auto"))
+        # the same gateways share the same socket
+        self.assertEqual(
+            result, generate_ssh_option_gateway(args, control_path_dir="/tmp/cp")
+        )
+
+
+class TestTunnelPool(EnosTest):
+    def setUp(self):
+        self.remotes: List[Tuple[Tuple[str, int], socket.socket]] = []
+        self.opened = threading.Event()
+
+        def _open_channel(kind, remote, origin):
+            # a socket pair stands for the SSH channel
+            channel, remote_end = socket.socketpair()
+            self.remotes.append((remote, remote_end))
+            self.opened.set()
+            return channel
+
+        self.client = mock.Mock()
+        self.client.get_transport.return_value.open_channel.side_effect = _open_channel
+        self.pool = TunnelPool()
+        self.connect = mock.patch.object(
+            self.pool, "_connect", return_value=self.client
+        ).start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        for _, remote_end in self.remotes:
+            remote_end.close()
+
+    def test_forward(self):
+        f1 = self.pool.add("gw", "user", ("10.0.0.1", 80))
+        f2 = self.pool.add("gw", "user", ("10.0.0.2", 8086))
+        # a single connection to the gateway
+        self.connect.assert_called_once_with("gw", "user", None, None, ())
+        self.assertNotEqual(f1.local_bind_port, f2.local_bind_port)
+
+        with socket.create_connection(f2.local_bind_address) as s:
+            s.sendall(b"ping")
+            self.assertTrue(self.opened.wait(5))
+            remote, remote_end = self.remotes[0]
+            self.assertEqual(("10.0.0.2", 8086), remote)
+            self.assertEqual(b"ping", remote_end.recv(4))
+            remote_end.sendall(b"pong")
+            self.assertEqual(b"pong", s.recv(4))
+
+        f1.stop()
+        # stopping twice doesn't release the connection used by f2
+        f1.stop()
+        self.client.close.assert_not_called()
+        f2.stop()
+        self.client.close.assert_called_once()
+
+    def _slow_connect(self, slow: str):
+        """Makes the connection to slow block until self.unblock is set."""
+        self.connecting = threading.Event()
+        self.unblock = threading.Event()
+
+        self.unblocked: List[bool] = []
+
+        def _connect(gateway, *args):
+            if gateway == slow:
+                self.connecting.set()
+                self.unblocked.append(self.unblock.wait(5))
+            return self.client
+
+        self.connect.side_effect = _connect
+
+    def _add_in_background(self, gateway: str, forwards: List) -> threading.Thread:
+        thread = threading.Thread(
+            target=lambda: forwards.append(
+                self.pool.add(gateway, "user", ("10.0.0.1", 80))
+            )
+        )
+        thread.start()
+        return thread
+
+    def test_connect_concurrently(self):
+        self._slow_connect("slow")
+        forwards: List = []
+        thread = self._add_in_background("slow", forwards)
+        self.assertTrue(self.connecting.wait(5))
+        # the other gateways don't wait for the slow one
+        forwards.append(self.pool.add("fast", "user", ("10.0.0.2", 80)))
+        self.unblock.set()
+        thread.join()
+        self.assertEqual([True], self.unblocked)
+        for forward in forwards:
+            forward.stop()
+
+    def test_connect_once(self):
+        self._slow_connect("gw")
+        forwards: List = []
+        first = self._add_in_background("gw", forwards)
+        self.assertTrue(self.connecting.wait(5))
+        # waits for the connection in progress instead of opening another one
+        second = self._add_in_background("gw", forwards)
+        second.join(0.2)
+        self.assertTrue(second.is_alive())
+        self.unblock.set()
+        first.join()
+        second.join()
+        self.connect.assert_called_once()
+        self.assertEqual(2, len(forwards))
+        for forward in forwards:
+            forward.stop()
+        self.client.close.assert_called_once()
+
+    def test_connect_error(self):
+        self.connect.side_effect = [OSError("unreachable"), self.client]
+        with self.assertRaises(OSError):
+            self.pool.add("gw", "user", ("10.0.0.1", 80))
+        # the failed connection isn't reused
+        self.pool.add("gw", "user", ("10.0.0.1", 80)).stop()
+        self.assertEqual(2, self.connect.call_count)
+
+    @mock.patch("enoslib.utils.paramiko.ProxyCommand")
+    @mock.patch("enoslib.utils.paramiko.SSHClient")
+    def test_ssh_config(self, client, proxy):
+        with tempfile.NamedTemporaryFile("w") as config:
+            config.write(
+                "Host g5k\n"
+                "  HostName access.grid5000.fr\n"
+                "  User jdoe\n"
+                "  Port 2222\n"
+                "  IdentityFile /keys/g5k\n"
+                "  ProxyJump bastion\n"
+            )
+            config.flush()
+            with mock.patch("enoslib.utils.SSH_CONFIG", config.name):
+                TunnelPool()._connect("g5k", None)
+                TunnelPool()._connect("other", "user")
+        proxy.assert_called_once_with("ssh -W access.grid5000.fr:2222 bastion")
+        g5k, other = client.return_value.connect.call_args_list
+        self.assertEqual(("access.grid5000.fr",), g5k[0])
+        self.assertEqual(2222, g5k[1]["port"])
+        self.assertEqual("jdoe", g5k[1]["username"])
+        self.assertEqual(["/keys/g5k"], g5k[1]["key_filename"])
+        self.assertEqual(proxy.return_value, g5k[1]["sock"])
+        self.assertEqual(("other",), other[0])
+        self.assertEqual(dict(port=22, username="user"), other[1])
+
+    @mock.patch("enoslib.utils.paramiko.ProxyCommand")
+    @mock.patch("enoslib.utils.paramiko.SSHClient")
+    def test_gateways(self, client, proxy):
+        with mock.patch("enoslib.utils.SSH_CONFIG", "/nonexistent"):
+            TunnelPool()._connect(
+                "10.0.0.1", "root", 2222, "/keys/id", (("gw", "jdoe", None),)
+            )
+        proxy.assert_called_once_with(
+            "ssh -W 10.0.0.1:2222 -o StrictHostKeyChecking=no "
+            "-o UserKnownHostsFile=/dev/null -l jdoe gw"
+        )
+        client.return_value.connect.assert_called_once_with(
+            "10.0.0.1",
+            port=2222,
+            username="root",
+            key_filename="/keys/id",
+            sock=proxy.return_value,
+        )
+
+    def test_forward_port(self):
+        host = Host(
+            "10.0.0.1", user="root", extra=dict(gateway="gw", gateway_user="jdoe")
+        )
+        with mock.patch("enoslib.utils.POOL", self.pool):
+            with forward_port(host, "127.0.0.1", 8086) as (address, port):
+                self.assertEqual("127.0.0.1", address)
+                self.assertNotEqual(0, port)
+            self.connect.assert_called_once_with(
+                "10.0.0.1", "root", None, None, (("gw", "jdoe", None),)
+            )
+            self.client.close.assert_called_once()
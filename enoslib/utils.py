@@ -1,11 +1,25 @@
+import hashlib
+import logging
 import os
+import re
+import select
+import shlex
+import socketserver
+import threading
 from collections import defaultdict
+from concurrent.futures import Future
+from contextlib import contextmanager
 from ipaddress import IPv6Interface
-from typing import Dict, Iterable, Mapping, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
 
+import paramiko
+
+from enoslib.constants import SSH_CONTROL_PERSIST
 from enoslib.errors import EnosFilePathError
 from enoslib.objects import Host, Network, Roles, RolesLike
 
+logger = logging.getLogger(__name__)
+
 
 def _check_tmpdir(tmpdir):
     if not os.path.exists(tmpdir):
@@ -81,8 +95,55 @@ def get_address(host: Host, networks: Optional[Iterable[Network]] = None) -> str
 
 # Implementation note: we can't simply use "ssh -J gwA,gwB" because we
 # need to disable StrictHostKeyChecking at each hop.
+def _ssh_control_args(control_path_dir: str, *hops) -> List[str]:
+    """SSH options to share the connection through hops (ControlMaster).
+
+    The socket name doesn't use any ssh token (e.g. %C) as they aren't
+    expanded the same way at each level of nested ProxyCommands.
+    """
+    key = hashlib.sha1(repr(hops).encode()).hexdigest()[:16]
+    return [
+        "-o ControlMaster=auto",
+        f"-o ControlPersist={SSH_CONTROL_PERSIST}",
+        f"-o ControlPath={os.path.join(control_path_dir, key)}",
+    ]
+
+
+def host_gateways(host: Host) -> List[Tuple[str, Optional[str], Optional[int]]]:
+    """The SSH gateways to go through to reach a host (outermost first).
+
+    They are read from the ``gateway*`` and ``internal_gateway*`` keys of
+    the host extra vars.
+
+    Returns:
+        A list of (gateway, gateway_user, gateway_port) tuples that can be
+        given to :py:func:`generate_ssh_option_gateway`
+    """
+    gateways = []
+    gateway = host.extra.get("gateway", None)
+    if gateway is not None:
+        gateways.append(
+            (
+                gateway,
+                host.extra.get("gateway_user", host.user),
+                host.extra.get("gateway_port", None),
+            )
+        )
+    internal_gateway = host.extra.get("internal_gateway", None)
+    if internal_gateway is not None:
+        gateways.append(
+            (
+                internal_gateway,
+                host.extra.get("internal_gateway_user", host.user),
+                host.extra.get("internal_gateway_port", None),
+            )
+        )
+    return gateways
+
+
 def generate_ssh_option_gateway(
-    gateways: Iterable[Tuple[str, Optional[str], Optional[int]]]
+    gateways: Iterable[Tuple[str, Optional[str], Optional[int]]],
+    control_path_dir: Optional[str] = None,
 ) -> str:
     """Generates the appropriate SSH options to connect through a list of
     gateways (i.e. SSH jump hosts).
@@ -93,6 +154,8 @@ def generate_ssh_option_gateway(
 
     Args:
         gateways: List of (gateway, gateway_user, gateway_port) tuples
+        control_path_dir: if set, the connections to the gateways are
+            shared (ControlMaster) using sockets in this directory
 
     Returns:
         str: ssh option that can be fed to the "ssh" command
@@ -119,6 +182,8 @@ def generate_ssh_option_gateway(
         inner_proxy_cmd.append(f"-l {inner_gateway_user}")
     if inner_gateway_port is not None:
         inner_proxy_cmd.append(f"-p {inner_gateway_port}")
+    if control_path_dir is not None:
+        inner_proxy_cmd.extend(_ssh_control_args(control_path_dir, *gateways))
     if len(gateways) == 1:
         inner_proxy_cmd.append(inner_gateway)
         final_proxy_cmd = " ".join(inner_proxy_cmd)
@@ -134,6 +199,8 @@ def generate_ssh_option_gateway(
             outer_proxy_cmd.append(f"-l {outer_gateway_user}")
         if outer_gateway_port is not None:
             outer_proxy_cmd.append(f"-p {outer_gateway_port}")
+        if control_path_dir is not None:
+            outer_proxy_cmd.extend(_ssh_control_args(control_path_dir, gateways[0]))
         outer_proxy_cmd.append(outer_gateway)
         final_outer_proxy_cmd = " ".join(outer_proxy_cmd)
         # Integrate in first command
@@ -143,3 +210,276 @@ def generate_ssh_option_gateway(
         return f'-o ProxyCommand="{final_proxy_cmd}"'
     msg = "generate_ssh_option_gateway only supports up to 2 gateways for now"
     raise ValueError(msg)
+
+
+# Port forwarding through shared SSH connections
+#
+# A TunnelPool keeps one SSH connection per endpoint (host and connection
+# parameters) and adds (or removes) local port forwards on it on demand. The
+# connection is reference counted: it is opened with the first forward and
+# closed with the last one. Opening an extra forward only costs a channel
+# open per incoming connection (instead of a new SSH connection and thread).
+
+Address = Tuple[str, int]
+Gateways = Tuple[Tuple[str, Optional[str], Optional[int]], ...]
+# host, user, port, keyfile, gateways
+Endpoint = Tuple[str, Optional[str], Optional[int], Optional[str], Gateways]
+
+# the connections honour the user's ssh config
+SSH_CONFIG = "~/.ssh/config"
+
+
+def _ssh_config() -> paramiko.SSHConfig:
+    path = os.path.expanduser(SSH_CONFIG)
+    if os.path.exists(path):
+        return paramiko.SSHConfig.from_path(path)
+    return paramiko.SSHConfig()
+
+
+def _expand_proxy_command(command: str, hostname: str, port: int) -> str:
+    """Expand the tokens of a ProxyCommand as ssh does."""
+    tokens = {"%": "%", "h": hostname, "p": str(port)}
+    return re.sub("%([%hp])", lambda m: tokens[m.group(1)], command)
+
+
+class _ForwardHandler(socketserver.BaseRequestHandler):
+    server: "_ForwardServer"
+
+    def handle(self):
+        try:
+            channel = self.server.transport.open_channel(
+                "direct-tcpip", self.server.remote, self.request.getpeername()
+            )
+        except Exception as e:
+            logger.error("Unable to open a channel to %s: %s", self.server.remote, e)
+            return
+        try:
+            while True:
+                r, _, _ = select.select([self.request, channel], [], [])
+                if self.request in r:
+                    data = self.request.recv(16384)
+                    if not data:
+                        break
+                    channel.sendall(data)
+                if channel in r:
+                    data = channel.recv(16384)
+                    if not data:
+                        break
+                    self.request.sendall(data)
+        finally:
+            channel.close()
+
+
+class _ForwardServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, local: Address, transport, remote: Address):
+        self.transport = transport
+        self.remote = remote
+        super().__init__(local, _ForwardHandler)
+
+
+class _Connection:
+    def __init__(self):
+        # set by the first user, the others wait for it
+        self.client: "Future[paramiko.SSHClient]" = Future()
+        self.refcount = 0
+
+    @property
+    def transport(self) -> Optional[paramiko.Transport]:
+        return self.client.result().get_transport()
+
+    def is_active(self) -> bool:
+        if not self.client.done():
+            # still connecting
+            return True
+        if self.client.exception() is not None:
+            return False
+        return self.transport is not None and self.transport.is_active()
+
+    def close(self):
+        if self.client.done() and self.client.exception() is None:
+            self.client.result().close()
+
+
+class Forward:
+    """A local port forwarded to a remote address (see :py:class:`TunnelPool`)."""
+
+    def __init__(
+        self,
+        pool: "TunnelPool",
+        endpoint: Endpoint,
+        connection: _Connection,
+        remote: Address,
+        server: _ForwardServer,
+    ):
+        self.pool = pool
+        self.endpoint = endpoint
+        self._connection = connection
+        self.remote = remote
+        self._server = server
+        self.stopped = False
+        self._thread = threading.Thread(target=server.serve_forever, daemon=True)
+        self._thread.start()
+
+    @property
+    def local_bind_address(self) -> Address:
+        host, port = self._server.server_address[:2]
+        return str(host), port
+
+    @property
+    def local_bind_port(self) -> int:
+        return self.local_bind_address[1]
+
+    def stop(self):
+        """Removes this forward (and closes the connection if it's the last one).
+
+        Stopping a forward several times is harmless.
+        """
+        self.pool.remove(self)
+
+    def _shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+class TunnelPool:
+    """SSH connections (one per endpoint) shared by many port forwards."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections: Dict[Endpoint, _Connection] = {}
+
+    def _connect(
+        self,
+        gateway: str,
+        user: Optional[str],
+        port: Optional[int] = None,
+        keyfile: Optional[str] = None,
+        gateways: Gateways = (),
+    ) -> paramiko.SSHClient:
+        logger.debug("Opening a shared SSH connection to %s@%s", user, gateway)
+        # HostName, User, Port, IdentityFile, ProxyCommand/ProxyJump of the
+        # ssh config are used (the explicit parameters take precedence)
+        config = _ssh_config().lookup(gateway)
+        hostname = config.get("hostname", gateway)
+        port = port or int(config.get("port", 22))
+        kwargs: Dict[str, Any] = dict(port=port, username=user or config.get("user"))
+        if keyfile is not None:
+            kwargs.update(key_filename=keyfile)
+        elif "identityfile" in config:
+            kwargs.update(key_filename=config["identityfile"])
+        proxy = config.get("proxycommand")
+        if gateways:
+            # the same jumps as the ones of the ssh command line
+            (option,) = shlex.split(generate_ssh_option_gateway(gateways))[1:]
+            proxy = option[len("ProxyCommand=") :]
+        elif proxy is None and "proxyjump" in config:
+            proxy = f"ssh -W %h:%p {config['proxyjump']}"
+        if proxy is not None and proxy.lower() != "none":
+            proxy = _expand_proxy_command(proxy, hostname, port)
+            kwargs.update(sock=paramiko.ProxyCommand(proxy))
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(hostname, **kwargs)
+        return client
+
+    def add(
+        self,
+        gateway: str,
+        user: Optional[str],
+        remote: Address,
+        local: Address = ("127.0.0.1", 0),
+        port: Optional[int] = None,
+        keyfile: Optional[str] = None,
+        gateways: Iterable[Tuple[str, Optional[str], Optional[int]]] = (),
+    ) -> Forward:
+        """Forwards a local port to remote (as seen from the gateway).
+
+        Args:
+            gateway: the SSH gateway
+            user: the user to connect to the gateway with
+            remote: the (address, port) to forward to
+            local: the local (address, port) to bind (port 0 picks a free one)
+            port: the SSH port of the gateway
+            keyfile: the private key to connect to the gateway with
+            gateways: the SSH gateways to go through to reach the gateway
+                (see :py:func:`generate_ssh_option_gateway`)
+
+        Returns:
+            The forward, call its ``stop`` method to remove it.
+        """
+        endpoint = (gateway, user, port, keyfile, tuple(gateways))
+        with self._lock:
+            connection = self._connections.get(endpoint)
+            connect = connection is None or not connection.is_active()
+            if connect:
+                connection = _Connection()
+                self._connections[endpoint] = connection
+            assert connection is not None
+            connection.refcount += 1
+        # the SSH handshake doesn't hold the pool: only the users of the same
+        # endpoint wait for it
+        try:
+            if connect:
+                try:
+                    connection.client.set_result(self._connect(*endpoint))
+                except BaseException as e:
+                    connection.client.set_exception(e)
+            server = _ForwardServer(local, connection.transport, remote)
+        except BaseException:
+            self._release(endpoint, connection)
+            raise
+        logger.debug(
+            "Forwarding %s to %s via %s", server.server_address, remote, endpoint
+        )
+        return Forward(self, endpoint, connection, remote, server)
+
+    def remove(self, forward: Forward):
+        """Removes a forward (and closes the connection if it's the last one)."""
+        with self._lock:
+            if forward.stopped:
+                return
+            forward.stopped = True
+        forward._shutdown()
+        self._release(forward.endpoint, forward._connection)
+
+    def _release(self, endpoint: Endpoint, connection: _Connection):
+        with self._lock:
+            connection.refcount -= 1
+            if connection.refcount <= 0:
+                logger.debug("Closing the shared SSH connection to %s", endpoint)
+                connection.close()
+                # the connection may have been replaced (if it was lost)
+                if self._connections.get(endpoint) is connection:
+                    del self._connections[endpoint]
+
+
+#: The pool used by the tunnels
+POOL = TunnelPool()
+
+
+@contextmanager
+def forward_port(host: Host, address: str, port: int) -> Iterator[Address]:
+    """Forward a local port to address:port (as seen from host).
+
+    The forward uses the connection of :py:data:`POOL` to the host, opened
+    with the same parameters as Ansible (user, port, key, gateways).
+
+    Returns:
+        The local (address, port) to connect to.
+    """
+    forward = POOL.add(
+        host.address,
+        host.user,
+        (address, port),
+        port=host.port,
+        keyfile=host.keyfile,
+        gateways=host_gateways(host),
+    )
+    try:
+        yield forward.local_bind_address
+    finally:
+        forward.stop()